@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmarks for every generator and the full orchestrator.
+
+Each case runs in a fresh process so that its peak RSS is its own, writes
+into a temporary directory and is timed from the generator's run() to its
+return. Results are written as JSON; pass an earlier result file with
+--compare to see the change of every case.
+
+    python benchmark_generators.py --scales 1k,100k --output bench.json
+    python benchmark_generators.py --scales 1k,100k --compare bench.json
+
+--artists times MusicDataGenerator.run() at fixed catalog sizes instead,
+e.g. before and after a change to the catalog:
+
+    python benchmark_generators.py --benchmarks catalog --artists 1k,10k,100k
+
+The catalog case also runs from a copy of this script placed in an older
+checkout, down to the original generators without a GeneratorContext.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import inspect
+import tempfile
+import resource
+import contextlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Cases in the order they run
+BENCHMARKS = ('genres', 'users', 'catalog', 'followers', 'playlists', 'liked_songs', 'payments',
+              'orchestrator')
+
+DEFAULT_SCALES = '1k,100k'
+
+# Catalog size relative to the number of users; generated catalogs average
+# about ten songs per artist
+USERS_PER_ARTIST = 10
+SONGS_PER_ARTIST = 10
+
+# Fixed seed and reference date, so every run generates the same rows
+SEED = 20250322
+REFERENCE_DATE = datetime.date(2025, 3, 22)
+
+def parse_scale(text):
+    """
+    Parse a scale factor such as '1k', '100k', '1m' or '2500'.
+
+    Args:
+        text (str): Number of users, with an optional k or m suffix
+
+    Returns:
+        int: Number of users
+    """
+    text = text.strip().lower()
+    multiplier = 1
+    if text.endswith('k'):
+        multiplier, text = 1000, text[:-1]
+    elif text.endswith('m'):
+        multiplier, text = 1000 * 1000, text[:-1]
+    return int(float(text) * multiplier)
+
+def format_scale(num_users):
+    """Short label of a scale factor (1k, 100k, 1m)"""
+    if num_users >= 1000 * 1000 and num_users % (1000 * 1000) == 0:
+        return f"{num_users // (1000 * 1000)}m"
+    if num_users >= 1000 and num_users % 1000 == 0:
+        return f"{num_users // 1000}k"
+    return str(num_users)
+
+def catalog_size(num_users):
+    """
+    Artists and songs a run with num_users users draws from.
+
+    Returns:
+        tuple: (number of artists, number of songs)
+    """
+    num_artists = max(100, num_users // USERS_PER_ARTIST)
+    return num_artists, num_artists * SONGS_PER_ARTIST
+
+def build_generator(name, num_users, output_dir, context, output_format, num_artists=None):
+    """
+    Create the generator a benchmark case runs.
+
+    Args:
+        name (str): Case from BENCHMARKS
+        num_users (int): Scale factor
+        output_dir (str): Directory the generator writes to
+        context (GeneratorContext): Context of the case; None in checkouts without one
+        output_format (str): Output format of the files
+        num_artists (int, optional): Catalog size; derived from num_users if omitted
+
+    Returns:
+        object: Generator with a run() method
+    """
+    # Generators import Faker, NumPy and the sinks; keep them out of the parent
+    # process. The catalog imports only its own module, so it runs on older checkouts.
+    if name == 'catalog':
+        from music_data_generator import MusicDataGenerator
+    else:
+        from data_generator_orchestrator import GenreGenerator, DataGeneratorOrchestrator
+        from user_generator import UserGenerator
+        from follower_generator import FollowersGenerator
+        from playlist_generator import PlaylistGenerator
+        from liked_songs_generator import LikedSongsGenerator
+        from payment_generator import PaymentDataGenerator
+
+    if num_artists is None:
+        num_artists, num_songs = catalog_size(num_users)
+    else:
+        num_songs = num_artists * SONGS_PER_ARTIST
+    path = lambda filename: os.path.join(output_dir, filename)
+
+    if name == 'genres':
+        return GenreGenerator(output_file=path('insert_genres.txt'), context=context)
+    if name == 'users':
+        return UserGenerator(num_users=num_users, output_file=path('insert_users.txt'), context=context)
+    if name == 'catalog':
+        options = {}
+        if 'context' in inspect.signature(MusicDataGenerator).parameters:
+            options['context'] = context
+        generator = MusicDataGenerator(num_artists=num_artists, **options)
+        generator.artists_file = path('insert_artists.txt')
+        generator.albums_file = path('insert_albums.txt')
+        generator.songs_file = path('insert_songs.txt')
+        return generator
+    if name == 'followers':
+        return FollowersGenerator(num_users=num_users, num_artists=num_artists,
+                                  output_file=path('insert_followers_artists.txt'), context=context)
+    if name == 'playlists':
+        return PlaylistGenerator(num_users=num_users, num_songs=num_songs,
+                                 playlist_file=path('insert_playlist.txt'),
+                                 playlist_songs_file=path('insert_playlist_songs.txt'), context=context)
+    if name == 'liked_songs':
+        return LikedSongsGenerator(num_users=num_users, num_songs=num_songs,
+                                   output_file=path('insert_liked_songs.txt'), context=context)
+    if name == 'payments':
+        return PaymentDataGenerator(num_users=num_users, output_dir=output_dir, context=context)
+    if name == 'orchestrator':
+        config = {
+            'num_users': num_users,
+            'num_artists': num_artists,
+            'output_dir': output_dir,
+            'output_format': output_format,
+            'seed': SEED,
+            'reference_date': REFERENCE_DATE.isoformat(),
+            'stage_workers': 1,
+            'resume': False,
+        }
+        orchestrator = DataGeneratorOrchestrator(config=config, context=context)
+        orchestrator.run = orchestrator.generate_all_data
+        return orchestrator
+    raise ValueError(f"Unknown benchmark '{name}'")
+
+def directory_bytes(directory):
+    """Total size of the files under a directory"""
+    total = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+def count_insert_rows(directory):
+    """Rows of generators that write one single-row INSERT per line and count nothing themselves"""
+    rows = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            with open(os.path.join(root, filename), 'r', encoding='utf-8', errors='replace') as file:
+                rows += sum(1 for line in file if line.startswith('INSERT INTO'))
+    return rows
+
+def run_case(name, num_users, output_format, work_dir=None, num_artists=None):
+    """
+    Run one benchmark case. Meant to run in a process of its own.
+
+    Args:
+        name (str): Case from BENCHMARKS
+        num_users (int): Scale factor
+        output_format (str): Output format of the files
+        work_dir (str, optional): Directory for the temporary output
+        num_artists (int, optional): Catalog size; derived from num_users if omitted
+
+    Returns:
+        dict: Measurements of the case
+    """
+    try:
+        from generator_context import GeneratorContext, set_context
+    except ImportError:
+        # A checkout from before the shared context: only the catalog case runs there
+        context = None
+    else:
+        context = GeneratorContext(seed=SEED, today=REFERENCE_DATE, output_format=output_format)
+        set_context(context)
+    # Older contexts do not count rows
+    count_rows = getattr(context, 'take_row_counts', None)
+    output_dir = tempfile.mkdtemp(prefix=f'bench-{name}-', dir=work_dir)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            generator = build_generator(name, num_users, output_dir, context, output_format, num_artists)
+            if count_rows:
+                count_rows()
+            started = time.perf_counter()
+            generator.run()
+            wall_seconds = time.perf_counter() - started
+        if count_rows:
+            rows = sum(count_rows().values())
+        else:
+            rows = count_insert_rows(output_dir)
+        if name == 'orchestrator':
+            from run_manifest import RunManifest
+            # Its stages take the row counts themselves and record them in the run manifest
+            rows = sum(sum(entry['rows'].values()) for entry in RunManifest(output_dir).stages.values())
+        bytes_written = directory_bytes(output_dir)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        'benchmark': name,
+        'scale': format_scale(num_users) if num_artists is None else f"{format_scale(num_artists)}-artists",
+        'num_users': num_users,
+        'num_artists': num_artists if num_artists is not None else catalog_size(num_users)[0],
+        'output_format': output_format,
+        'wall_seconds': round(wall_seconds, 4),
+        'rows': rows,
+        'rows_per_second': round(rows / wall_seconds, 1) if wall_seconds else 0.0,
+        'bytes': bytes_written,
+        'bytes_per_second': round(bytes_written / wall_seconds, 1) if wall_seconds else 0.0,
+        'peak_rss_mb': round(peak_rss_mb, 1),
+    }
+
+def run_isolated(name, num_users, output_format, work_dir=None, num_artists=None):
+    """Run a case in a freshly spawned process, so nothing is shared with earlier cases"""
+    spawn = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+        return pool.submit(run_case, name, num_users, output_format, work_dir, num_artists).result()
+
+def git_commit():
+    """Commit of the working tree, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(benchmarks, scales, output_format='sql', repeat=1, work_dir=None, artist_scales=None):
+    """
+    Run every benchmark at every scale.
+
+    Args:
+        benchmarks (list): Cases from BENCHMARKS
+        scales (list): Numbers of users
+        output_format (str): Output format of the files
+        repeat (int): Runs per case; the fastest is kept
+        work_dir (str, optional): Directory for the temporary output
+        artist_scales (list, optional): Numbers of artists; when given, only the
+            catalog case runs, once per catalog size
+
+    Returns:
+        dict: Environment of the run and one result per case
+    """
+    if artist_scales:
+        cases = [('catalog', 0, num_artists) for num_artists in artist_scales]
+    else:
+        cases = [(name, num_users, None) for num_users in scales for name in benchmarks]
+
+    results = []
+    for name, num_users, num_artists in cases:
+        runs = [run_isolated(name, num_users, output_format, work_dir, num_artists)
+                for _ in range(max(1, repeat))]
+        best = min(runs, key=lambda result: result['wall_seconds'])
+        best['repeat'] = len(runs)
+        results.append(best)
+        print(f"  - {name:<13} {best['scale']:>5}  {best['wall_seconds']:9.2f} s  "
+              f"{best['rows_per_second']:>12,.0f} rows/s  {best['bytes_per_second'] / 1e6:8.1f} MB/s  "
+              f"{best['peak_rss_mb']:8.1f} MB peak")
+
+    return {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': SEED,
+        'results': results,
+    }
+
+def compare_results(current, previous, threshold=0.10):
+    """
+    Print the change of every case that appears in both runs.
+
+    Args:
+        current (dict): Result of run_benchmarks
+        previous (dict): Earlier result, e.g. loaded from a JSON file
+        threshold (float): Relative slowdown reported as a regression
+
+    Returns:
+        list: (benchmark, scale) of the cases that slowed down by more than threshold
+    """
+    earlier = {(result['benchmark'], result['scale'], result['output_format']): result
+               for result in previous['results']}
+    regressions = []
+    print(f"Compared with {previous.get('commit') or 'previous run'}:")
+    for result in current['results']:
+        key = (result['benchmark'], result['scale'], result['output_format'])
+        if key not in earlier:
+            continue
+        before = earlier[key]
+        change = result['wall_seconds'] / before['wall_seconds'] - 1 if before['wall_seconds'] else 0.0
+        memory = result['peak_rss_mb'] - before['peak_rss_mb']
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(key[:2])
+        print(f"  - {key[0]:<13} {key[1]:>5}  wall {change:+7.1%}  peak RSS {memory:+8.1f} MB{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data generators")
+    parser.add_argument('--scales', default=DEFAULT_SCALES,
+                        help="Comma-separated numbers of users, e.g. 1k,100k,1m")
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                        help="Comma-separated cases to run")
+    parser.add_argument('--format', default='sql', choices=('sql', 'tsv', 'csv', 'parquet'),
+                        help="Output format of the files")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per case; the fastest is kept")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file for the results")
+    parser.add_argument('--compare', help="Earlier JSON result file to compare with")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Slowdown reported as a regression (0.10 is 10%%)")
+    parser.add_argument('--artists',
+                        help="Comma-separated numbers of artists, e.g. 1k,10k,100k; runs only the "
+                             "catalog case, at these sizes")
+    parser.add_argument('--work-dir', help="Directory for the temporary output (default: system temp)")
+    args = parser.parse_args(argv)
+
+    benchmarks = [name.strip() for name in args.benchmarks.split(',') if name.strip()]
+    unknown = [name for name in benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    scales = [parse_scale(scale) for scale in args.scales.split(',') if scale.strip()]
+    artist_scales = [parse_scale(scale) for scale in (args.artists or '').split(',') if scale.strip()]
+
+    # Read the baseline first, so --compare and --output may name the same file
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            previous = json.load(file)
+
+    if artist_scales:
+        print(f"Benchmarking catalog at {', '.join(map(format_scale, artist_scales))} artists...")
+    else:
+        print(f"Benchmarking {', '.join(benchmarks)} at {', '.join(map(format_scale, scales))} users...")
+    results = run_benchmarks(benchmarks, scales, args.format, args.repeat, args.work_dir, artist_scales)
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+        file.write("\n")
+    print(f"Results saved to '{args.output}'")
+
+    if previous is not None:
+        regressions = compare_results(results, previous, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
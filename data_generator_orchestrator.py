@@ -3,28 +3,42 @@
 # Current User's Login: eduardoconde-bit
 
 import os
-import random
-from faker import Faker
+import datetime
+import functools
+from generator_context import get_context, set_context
+from sql_writer import InsertOptions, format_insert_statement
+from output_sinks import (Compression, write_checksum_manifest, write_load_script,
+                          write_stream_load_script, file_checksum)
+from database_sink import ConnectionPool, DatabaseLoader
+from stage_scheduler import Stage, StageScheduler
+from run_manifest import RunManifest, settings_fingerprint
+from id_offsets import read_max_ids
+from stage_metrics import StageMetrics, print_metrics, write_metrics, peak_rss_mb
 
 # Import all the generator classes
 from user_generator import UserGenerator
-from music_data_generator import MusicDataGenerator
+from music_data_generator import MusicDataGenerator, Artist, Album, Song
 from follower_generator import FollowersGenerator
 from playlist_generator import PlaylistGenerator
 from liked_songs_generator import LikedSongsGenerator
+from payment_generator import PaymentDataGenerator
 
 class GenreGenerator:
     """Class responsible for generating genre data"""
     
-    def __init__(self, num_genres=177, output_file='insert_genres.txt'):
+    COLUMNS = ('genre_id', 'name', 'description')
+    
+    def __init__(self, num_genres=177, output_file='insert_genres.txt', context=None):
         """
         Initialize the GenreGenerator with configuration parameters.
         
         Args:
             num_genres (int): Number of genres to generate
             output_file (str): File path to save the SQL insert statements
+            context (GeneratorContext, optional): Shared generator context
         """
-        self.fake = Faker()
+        self.context = context or get_context()
+        self.fake = self.context.faker
         self.num_genres = num_genres
         self.output_file = output_file
         
@@ -46,8 +60,9 @@ class GenreGenerator:
         ]
         
         # If we need more genres than names, we'll add numbered varieties
+        rng = self.context.rng('genres', 'names')
         while len(self.genre_names) < self.num_genres:
-            base_name = random.choice(self.genre_names[:50])
+            base_name = rng.choice(self.genre_names[:50])
             self.genre_names.append(f"{base_name} Fusion")
             self.genre_names.append(f"Modern {base_name}")
             self.genre_names.append(f"Alternative {base_name}")
@@ -56,11 +71,14 @@ class GenreGenerator:
     
     def create_insert_statement(self, genre_id, name, description):
         """Create SQL INSERT statement for a genre"""
-        return f"INSERT INTO genres (genre_id, name, description) VALUES ({genre_id}, '{name}', '{description}');\n"
+        return format_insert_statement('genres', self.COLUMNS, (genre_id, name, description))
     
     def generate_genres(self):
         """Generate genre data and write to file"""
-        with open(self.output_file, 'w') as file:
+        # Descriptions come from Faker, drawing from the genres stream
+        self.context.rng('genres')
+        
+        with self.context.open_sink(self.output_file, 'genres', self.COLUMNS) as writer:
             for genre_id in range(1, self.num_genres + 1):
                 if genre_id <= len(self.genre_names):
                     name = self.genre_names[genre_id - 1]
@@ -69,45 +87,76 @@ class GenreGenerator:
                 
                 description = self.fake.sentence(nb_words=10)
                 
-                insert_statement = self.create_insert_statement(genre_id, name, description)
-                file.write(insert_statement)
+                writer.write_row((genre_id, name, description))
     
     def run(self):
         """Execute the genre generation process"""
         print(f"Generating {self.num_genres} music genres...")
-        self.generate_genres()
+        with self.context.profile('genres'):
+            self.generate_genres()
         print(f"Genres saved to '{self.output_file}'")
 
 
-class MusicDataTrackerMixin:
-    """Mixin class to track and count the songs generated"""
-    
-    @classmethod
-    def count_songs_in_file(cls, filename):
-        """Count the number of INSERT statements in a songs file"""
-        if not os.path.exists(filename):
-            return 0
-            
-        try:
-            with open(filename, 'r') as file:
-                return sum(1 for line in file if line.strip().startswith("INSERT INTO songs"))
-        except Exception as e:
-            print(f"Error counting songs: {e}")
-            return 0
+# (table, file name, columns) in the foreign-key-safe order of ordem.txt
+LOAD_ORDER = (
+    ('genres', 'insert_genres.txt', GenreGenerator.COLUMNS),
+    ('users', 'insert_users.txt', UserGenerator.COLUMNS),
+    ('artists', 'insert_artists.txt', Artist.COLUMNS),
+    ('albums', 'insert_albums.txt', Album.COLUMNS),
+    ('songs', 'insert_songs.txt', Song.COLUMNS),
+    ('artists_followers', 'insert_followers_artists.txt', FollowersGenerator.COLUMNS),
+    ('playlists', 'insert_playlist.txt', PlaylistGenerator.PLAYLIST_COLUMNS),
+    ('playlist_songs', 'insert_playlist_songs.txt', PlaylistGenerator.PLAYLIST_SONG_COLUMNS),
+    ('liked_songs', 'insert_liked_songs.txt', LikedSongsGenerator.COLUMNS),
+    ('plans', 'insert_plans.txt', PaymentDataGenerator.PLAN_COLUMNS),
+    ('subscriptions', 'insert_subscriptions.txt', PaymentDataGenerator.SUBSCRIPTION_COLUMNS),
+    ('payment_methods', 'insert_payment_methods.txt', PaymentDataGenerator.PAYMENT_METHOD_COLUMNS),
+    ('member_subscription', 'insert_member_subscription.txt', PaymentDataGenerator.MEMBER_SUBSCRIPTION_COLUMNS),
+    ('orders', 'insert_orders.txt', PaymentDataGenerator.ORDER_COLUMNS),
+)
 
+# Tables written by each stage
+STAGE_TABLES = {
+    'genres': ('genres',),
+    'users': ('users',),
+    'catalog': ('artists', 'albums', 'songs'),
+    'followers': ('artists_followers',),
+    'playlists': ('playlists', 'playlist_songs'),
+    'liked_songs': ('liked_songs',),
+    'payments': ('plans', 'subscriptions', 'payment_methods', 'member_subscription', 'orders'),
+}
 
-class DataGeneratorOrchestrator(MusicDataTrackerMixin):
+# Config keys each stage's output depends on, besides OUTPUT_CONFIG_KEYS and its parents
+STAGE_CONFIG_KEYS = {
+    'genres': ('num_genres',),
+    'users': ('num_users',),
+    'catalog': ('num_artists', 'stream_skew'),
+    'followers': ('num_users', 'num_artists', 'follow_skew'),
+    'playlists': ('num_users', 'playlist_skew'),
+    'liked_songs': ('num_users', 'like_skew'),
+    'payments': ('num_users', 'subscription_history_days'),
+}
+
+# Config keys that change the output of every stage
+OUTPUT_CONFIG_KEYS = ('output_format', 'batch_size', 'max_statement_bytes', 'use_transactions',
+                      'disable_foreign_key_checks', 'parquet_row_group_size', 'compression',
+                      'compression_level')
+
+
+class DataGeneratorOrchestrator:
     """
-    Main class that orchestrates the sequential execution of all data generators.
-    Ensures that data is generated in the correct order to maintain referential integrity.
+    Main class that orchestrates the execution of all data generators.
+    Ensures that every table is generated after the tables it references, running
+    independent generators concurrently.
     """
     
-    def __init__(self, config=None):
+    def __init__(self, config=None, context=None):
         """
         Initialize the orchestrator with configuration parameters.
         
         Args:
             config (dict, optional): Configuration dictionary with customizable parameters
+            context (GeneratorContext, optional): Shared generator context for all generators
         """
         # Default configuration
         self.config = {
@@ -115,140 +164,436 @@ class DataGeneratorOrchestrator(MusicDataTrackerMixin):
             'num_users': 100,
             'num_artists': 1000,
             'output_dir': 'generated_data',
-            'create_output_dir': True
+            'create_output_dir': True,
+            'batch_size': 1000,                    # Rows per INSERT statement
+            'max_statement_bytes': 1024 * 1024,    # Keep below the server's max_allowed_packet
+            'use_transactions': True,              # Wrap each file in START TRANSACTION/COMMIT
+            'disable_foreign_key_checks': False,   # Add SET foreign_key_checks=0 to each file
+            'stream_catalog': True,                # Write artists/albums/songs as they are generated
+            'catalog_workers': 1,                  # Processes for artist/album/song generation
+            'stage_workers': None,                 # Processes running independent stages; None uses every CPU
+            'subscription_history_days': 547,      # Subscriptions start up to this many days ago
+            'stream_skew': 1.0,                    # Zipf exponents of artist and song popularity, for
+            'follow_skew': 1.0,                    # stream counts and each relationship; 0 picks
+            'like_skew': 1.0,                      # uniformly
+            'playlist_skew': 1.0,
+            'seed': None,                          # Root seed; None picks a random one
+            'reference_date': None,                # "Today" for ages and subscription dates (YYYY-MM-DD)
+            'output_format': 'sql',                # 'sql' INSERT scripts, 'tsv' / 'csv' for LOAD DATA INFILE,
+                                                   # 'parquet' columnar files, or 'database'
+            'parquet_row_group_size': 128 * 1024,  # Rows per Parquet row group (bounds memory per table)
+            'compression': None,                   # 'gzip' or 'zstd' to compress the output files
+            'compression_level': None,             # None uses the codec's default level
+            'compression_threads': None,           # Compression threads per file; None uses every CPU
+            'progress_interval': 5.0,              # Minimum seconds between two progress lines of a loop
+            'profile': None,                       # 'cprofile' or 'sampling' to profile every stage
+            'profile_top_n': 20,                   # Functions listed in each profile summary
+            'profile_interval': 0.005,             # Seconds between stack samples (both modes)
+            'db_connect': None,                    # Callable returning a DB-API connection ('database' format)
+            'db_pool_size': 8,                     # Connections shared by the table loaders
+            'db_commit_rows': 50000,               # Rows per transaction when loading a table
+            'resume': True,                        # Skip stages the run manifest records as unchanged
+            'verify_checksums': True,              # Re-hash a skipped stage's files before trusting them
+            'delta_from': None                     # Existing dataset (output directory, run manifest or SQL
+                                                   # dump) to append to; counts are then of new rows only
         }
         
         # Override defaults with provided config
         if config:
             self.config.update(config)
         
+        # One context (and therefore one Faker) shared by every generator
+        self.context = context or get_context()
+        self.context.insert_options = InsertOptions(
+            batch_size=self.config['batch_size'],
+            max_statement_bytes=self.config['max_statement_bytes'],
+            use_transaction=self.config['use_transactions'],
+            disable_foreign_key_checks=self.config['disable_foreign_key_checks']
+        )
+        self.context.output_format = self.config['output_format']
+        self.context.row_group_size = self.config['parquet_row_group_size']
+        self.context.progress_interval = self.config['progress_interval']
+        # Profiles go next to the data: profile_<stage>.pstats / .collapsed / .txt
+        self.context.profile_mode = self.config['profile']
+        self.context.profile_dir = self.config['output_dir']
+        self.context.profile_top_n = self.config['profile_top_n']
+        self.context.profile_interval = self.config['profile_interval']
+        if self.config['compression']:
+            self.context.compression = Compression(self.config['compression'],
+                                                   level=self.config['compression_level'],
+                                                   threads=self.config['compression_threads'])
+        if self.config['output_format'] == 'database':
+            self.context.database = self.create_database_loader()
+        self.context.set_seed(self.config['seed'])
+        if self.config['reference_date']:
+            self.context.today = datetime.date.fromisoformat(str(self.config['reference_date']))
+        
+        # Largest existing ID of every table; new rows continue after them
+        self.id_offsets = {}
+        if self.config['delta_from']:
+            self.id_offsets = read_max_ids(self.config['delta_from'], LOAD_ORDER)
+        
         # Ensure output directory exists
         if self.config['create_output_dir'] and not os.path.exists(self.config['output_dir']):
             os.makedirs(self.config['output_dir'])
     
+    def create_database_loader(self):
+        """Build the loader that inserts rows directly, from the db_* settings"""
+        if self.config['db_connect'] is None:
+            raise ValueError("The 'database' output format needs a 'db_connect' callable")
+        
+        check_foreign_keys = not self.config['disable_foreign_key_checks']
+        init_statements = () if check_foreign_keys else ('SET foreign_key_checks=0',)
+        pool = ConnectionPool(self.config['db_connect'], size=self.config['db_pool_size'],
+                              init_statements=init_statements)
+        return DatabaseLoader(pool, batch_size=self.config['batch_size'],
+                              commit_rows=self.config['db_commit_rows'],
+                              check_foreign_keys=check_foreign_keys)
+    
+    def first_id(self, table):
+        """First ID of the new rows of a table (1 unless appending to an existing dataset)"""
+        return self.id_offsets.get(table, 0) + 1
+    
     def get_output_path(self, filename):
         """Get full path for an output file"""
         return os.path.join(self.config['output_dir'], filename)
     
-    def generate_all_data(self):
-        """Execute all data generators in the correct sequence"""
-        # Track timing and progress
-        print(f"\n{'='*80}")
-        print(f"Starting data generation with configuration:")
-        print(f"  - Genres: {self.config['num_genres']}")
-        print(f"  - Users: {self.config['num_users']}")
-        print(f"  - Artists: {self.config['num_artists']}")
-        print(f"  - Output directory: {self.config['output_dir']}")
-        print(f"{'='*80}\n")
+    def write_load_script(self):
+        """
+        Write load.sql, loading every delimited table file present in the
+        output directory in foreign-key-safe order.
+        
+        Compressed INSERT scripts and delimited files also get load.sh,
+        which streams them into the mariadb client without unpacking them
+        on disk; load.sql then names the pipes load.sh decompresses into.
+        
+        Returns:
+            str: Path of the script to run, or None when there is nothing to load
+        """
+        data_format = self.context.data_format
+        compression = self.context.compression
+        if self.context.output_format in ('parquet', 'database'):
+            return None
+        if data_format is None and compression is None:
+            return None
         
-        # Step 1: Generate Genres
+        tables = []
+        for table, filename, columns in LOAD_ORDER:
+            filename = self.context.output_path(filename)
+            if os.path.exists(self.get_output_path(filename)):
+                tables.append((table, filename, columns))
+        
+        if data_format is not None:
+            load_tables = tables
+            run_through = None
+            if compression is not None:
+                load_tables = [(table, filename[:-len(compression.suffix)], columns)
+                               for table, filename, columns in tables]
+                run_through = 'load.sh'
+            script_path = write_load_script(self.config['output_dir'], load_tables, data_format,
+                                            self.context.insert_options, run_through=run_through)
+        if compression is not None:
+            script_path = write_stream_load_script(self.config['output_dir'], tables, compression,
+                                                   data_format)
+        return script_path
+    
+    def print_step(self, title):
+        """Print the banner that starts a generation step"""
         print(f"\n{'-'*40}")
-        print("STEP 1: Generating Genres")
+        print(title)
         print(f"{'-'*40}")
+    
+    def generate_genres(self, inputs):
+        """Stage: genres"""
+        self.print_step("STEP 1: Generating Genres")
         genre_generator = GenreGenerator(
             num_genres=self.config['num_genres'],
-            output_file=self.get_output_path('insert_genres.txt')
+            output_file=self.get_output_path('insert_genres.txt'),
+            context=self.context
         )
         genre_generator.run()
-        
-        # Step 2: Generate Users
-        print(f"\n{'-'*40}")
-        print("STEP 2: Generating Users")
-        print(f"{'-'*40}")
+    
+    def generate_users(self, inputs):
+        """Stage: users"""
+        self.print_step("STEP 2: Generating Users")
         user_generator = UserGenerator(
             num_users=self.config['num_users'],
-            output_file=self.get_output_path('insert_users.txt')
+            output_file=self.get_output_path('insert_users.txt'),
+            context=self.context,
+            first_user_id=self.first_id('users')
         )
         user_generator.run()
-        
-        # Step 3: Generate Artists, Albums and Songs
-        print(f"\n{'-'*40}")
-        print("STEP 3: Generating Artists, Albums and Songs")
-        print(f"{'-'*40}")
-        
-        music_generator = MusicDataGenerator(num_artists=self.config['num_artists'])
+    
+    def generate_catalog(self, inputs):
+        """Stage: artists, albums and songs"""
+        self.print_step("STEP 3: Generating Artists, Albums and Songs")
+        music_generator = MusicDataGenerator(
+            num_artists=self.config['num_artists'],
+            context=self.context,
+            streaming=self.config['stream_catalog'],
+            workers=self.config['catalog_workers'],
+            first_artist_id=self.first_id('artists'),
+            first_album_id=self.first_id('albums'),
+            first_song_id=self.first_id('songs'),
+            stream_skew=self.config['stream_skew']
+        )
         # Adjust file paths to use our output directory
         music_generator.artists_file = self.get_output_path('insert_artists.txt')
         music_generator.albums_file = self.get_output_path('insert_albums.txt')
         music_generator.songs_file = self.get_output_path('insert_songs.txt')
         music_generator.run()
-        
-        # Get the actual number of songs by counting the INSERT statements in the songs file
-        actual_songs = self.count_songs_in_file(music_generator.songs_file)
-        print(f"Actual number of songs generated: {actual_songs}")
-        
-        # Step 4: Generate Artist Followers
-        print(f"\n{'-'*40}")
-        print("STEP 4: Generating Artist Followers")
-        print(f"{'-'*40}")
+    
+    def generate_followers(self, inputs):
+        """Stage: artist followers"""
+        self.print_step("STEP 4: Generating Artist Followers")
         followers_generator = FollowersGenerator(
             num_users=self.config['num_users'],
-            num_artists=self.config['num_artists'],
-            output_file=self.get_output_path('insert_followers_artists.txt')
+            num_artists=self.id_offsets.get('artists', 0) + self.config['num_artists'],
+            output_file=self.get_output_path('insert_followers_artists.txt'),
+            context=self.context,
+            first_user_id=self.first_id('users'),
+            skew=self.config['follow_skew']
         )
         followers_generator.run()
-        
-        # Step 5: Generate Playlists and Playlist Songs
-        print(f"\n{'-'*40}")
-        print("STEP 5: Generating Playlists and Playlist Songs")
-        print(f"{'-'*40}")
-        
-        # Modified PlaylistGenerator class that respects song ID limits
-        class SafePlaylistGenerator(PlaylistGenerator):
-            def generate_playlist_songs(self, playlist_id):
-                """Modified to ensure song IDs are within valid range"""
-                num_playlist_songs = min(random.choice([5, 10, 15, 20]), self.num_songs)
-                
-                songs = set()
-                while len(songs) < num_playlist_songs and len(songs) < self.num_songs:
-                    # Ensure we only use song IDs that exist
-                    songs.add(random.randint(1, self.num_songs))
-                
-                return songs
-        
-        playlist_generator = SafePlaylistGenerator(
+    
+    def generate_playlists(self, inputs):
+        """Stage: playlists and playlist songs"""
+        self.print_step("STEP 5: Generating Playlists and Playlist Songs")
+        playlist_generator = PlaylistGenerator(
             num_users=self.config['num_users'],
-            num_songs=actual_songs,  # Use actual count of songs
+            num_songs=self.total_songs(inputs),
             playlist_file=self.get_output_path('insert_playlist.txt'),
-            playlist_songs_file=self.get_output_path('insert_playlist_songs.txt')
+            playlist_songs_file=self.get_output_path('insert_playlist_songs.txt'),
+            context=self.context,
+            first_user_id=self.first_id('users'),
+            first_playlist_id=self.first_id('playlists'),
+            skew=self.config['playlist_skew']
         )
         playlist_generator.run()
-        
-        # Step 6: Generate Liked Songs
-        print(f"\n{'-'*40}")
-        print("STEP 6: Generating Liked Songs")
-        print(f"{'-'*40}")
-        
-        # Modified LikedSongsGenerator class that respects song ID limits
-        class SafeLikedSongsGenerator(LikedSongsGenerator):
-            def generate_user_likes(self, user_id):
-                """Modified to ensure song IDs are within valid range"""
-                num_songs_to_like = min(random.randint(1, 7), self.num_songs)
-                
-                liked_songs = set()
-                while len(liked_songs) < num_songs_to_like and len(liked_songs) < self.num_songs:
-                    # Ensure we only use song IDs that exist
-                    liked_songs.add(random.randint(1, self.num_songs))
-                    
-                return liked_songs
-        
-        liked_songs_generator = SafeLikedSongsGenerator(
+    
+    def generate_liked_songs(self, inputs):
+        """Stage: liked songs"""
+        self.print_step("STEP 6: Generating Liked Songs")
+        liked_songs_generator = LikedSongsGenerator(
             num_users=self.config['num_users'],
-            num_songs=actual_songs,  # Use actual count of songs
-            output_file=self.get_output_path('insert_liked_songs.txt')
+            num_songs=self.total_songs(inputs),
+            output_file=self.get_output_path('insert_liked_songs.txt'),
+            context=self.context,
+            first_user_id=self.first_id('users'),
+            skew=self.config['like_skew']
         )
         liked_songs_generator.run()
+    
+    def generate_payments(self, inputs):
+        """Stage: plans, subscriptions, payment methods and orders"""
+        self.print_step("STEP 7: Generating Subscriptions, Payment Methods and Orders")
+        payment_generator = PaymentDataGenerator(
+            num_users=self.config['num_users'],
+            output_dir=self.config['output_dir'],
+            context=self.context,
+            history_days=self.config['subscription_history_days'],
+            first_user_id=self.first_id('users'),
+            first_sub_id=self.first_id('subscriptions'),
+            first_method_id=self.first_id('payment_methods'),
+            first_order_id=self.first_id('orders'),
+            include_plans=not self.id_offsets
+        )
+        payment_generator.run()
+    
+    def total_songs(self, inputs):
+        """Existing songs plus the songs the catalog stage actually wrote"""
+        return self.id_offsets.get('songs', 0) + inputs['catalog']['rows']['songs']
+    
+    def build_stages(self):
+        """
+        Dependency graph of the generation run.
+        
+        Genres, users and the catalog are independent of each other; every
+        other stage only waits for the tables it draws IDs from. A delta on
+        top of an existing dataset reuses its genres.
+        
+        Returns:
+            list: Stage objects
+        """
+        stages = (
+            ('genres', self.generate_genres, ()),
+            ('users', self.generate_users, ()),
+            ('catalog', self.generate_catalog, ()),
+            ('followers', self.generate_followers, ('users', 'catalog')),
+            ('playlists', self.generate_playlists, ('users', 'catalog')),
+            ('liked_songs', self.generate_liked_songs, ('users', 'catalog')),
+            ('payments', self.generate_payments, ('users',)),
+        )
+        return [
+            Stage(name, functools.partial(self.run_stage, name, function), depends_on=depends_on)
+            for name, function, depends_on in stages
+            if not (self.id_offsets and name == 'genres')
+        ]
+    
+    def run_stage(self, name, function, inputs):
+        """
+        Run a stage and describe its output for the run manifest.
+        
+        Args:
+            name (str): Stage name
+            function (callable): Generation step, called with the parents' results
+            inputs (dict): Results of the stage's parents
+            
+        Returns:
+            dict: 'rows' written to each table, 'files' checksums by file name
+                and the stage's 'metrics'
+        """
+        metrics = StageMetrics(name)
+        self.context.take_row_counts()
+        with self.context.profile(name):
+            function(inputs)
+        rows = self.context.take_row_counts()
+        
+        files = {}
+        bytes_written = 0
+        if self.context.output_format != 'database':
+            for table, filename, columns in LOAD_ORDER:
+                filename = self.context.output_path(filename)
+                if table in STAGE_TABLES[name] and os.path.exists(self.get_output_path(filename)):
+                    files[filename] = file_checksum(self.get_output_path(filename))
+                    bytes_written += os.path.getsize(self.get_output_path(filename))
+        metrics.finish(rows, bytes_written)
+        return {'rows': rows, 'files': files, 'metrics': metrics.to_dict()}
+    
+    def stage_settings(self, scheduler):
+        """
+        Settings every stage's output depends on, including its parents' fingerprints.
+        
+        Args:
+            scheduler (StageScheduler): Scheduler holding the stages
+            
+        Returns:
+            dict: (settings, fingerprint) by stage name
+        """
+        common = {key: self.config[key] for key in OUTPUT_CONFIG_KEYS}
+        common['seed'] = self.context.seed
+        common['reference_date'] = self.context.today.isoformat()
+        if self.id_offsets:
+            common['id_offsets'] = self.id_offsets
+        
+        settings = {}
+        for name in scheduler.order:
+            stage_settings = dict(common, stage=name)
+            stage_settings.update({key: self.config[key] for key in STAGE_CONFIG_KEYS[name]})
+            stage_settings['parents'] = {
+                parent: settings[parent][1] for parent in scheduler.stages[name].depends_on
+            }
+            settings[name] = (stage_settings, settings_fingerprint(stage_settings))
+        return settings
+    
+    def completed_stages(self, manifest, settings):
+        """
+        Stages that can be skipped because the manifest records them with the same settings.
+        
+        Rows already loaded by the 'database' format cannot be checked, so
+        that format never skips a stage.
+        
+        Returns:
+            dict: Result of every skippable stage, by stage name
+        """
+        if not self.config['resume'] or self.context.output_format == 'database':
+            return {}
+        
+        completed = {}
+        for name, (stage_settings, fingerprint) in settings.items():
+            entry = manifest.completed_stage(name, fingerprint, self.config['verify_checksums'])
+            if entry is not None:
+                completed[name] = {'rows': entry['rows'], 'files': entry['files']}
+        return completed
+    
+    def stage_workers(self):
+        """
+        Number of processes running stages concurrently.
+        
+        The 'database' format writes through connections owned by this
+        process, so its stages always run here, one at a time.
+        """
+        if self.context.output_format == 'database':
+            return 1
+        return self.config['stage_workers'] or os.cpu_count() or 1
+    
+    def generate_all_data(self):
+        """Execute all data generators, each stage as soon as the stages it depends on are done"""
+        # Track timing and progress
+        print(f"\n{'='*80}")
+        print(f"Starting data generation with configuration:")
+        print(f"  - Genres: {self.config['num_genres']}")
+        print(f"  - Users: {self.config['num_users']}")
+        print(f"  - Artists: {self.config['num_artists']}")
+        print(f"  - Output directory: {self.config['output_dir']}")
+        if self.id_offsets:
+            print(f"  - Appending to: {self.config['delta_from']} (after user {self.id_offsets.get('users', 0)}, "
+                  f"song {self.id_offsets.get('songs', 0)})")
+        print(f"  - Seed: {self.context.seed} (reference date {self.context.today})")
+        print(f"{'='*80}\n")
+        
+        # Worker processes install the context once, like the catalog's shard workers
+        scheduler = StageScheduler(self.build_stages(), workers=self.stage_workers(),
+                                   initializer=set_context, initargs=(self.context,))
+        
+        # Stages recorded in the run manifest with unchanged settings and files are skipped,
+        # so a run that died part way resumes after its last completed stage
+        manifest = RunManifest(self.config['output_dir'])
+        settings = self.stage_settings(scheduler)
+        completed = self.completed_stages(manifest, settings)
+        if completed:
+            print(f"Skipping stages unchanged since the last run: {', '.join(completed)}")
+        
+        def record_stage(name, result):
+            stage_settings, fingerprint = settings[name]
+            manifest.record_stage(name, fingerprint, stage_settings, result['rows'], result['files'])
+        
+        results = scheduler.run(completed=completed, on_complete=record_stage)
         
         # Final summary
         print(f"\n{'='*80}")
         print("DATA GENERATION COMPLETE!")
         print(f"{'='*80}")
+        scheduler.print_report()
+        stage_metrics = {name: results[name].get('metrics') for name in scheduler.order}
+        print_metrics(stage_metrics)
         print("Generated files:")
-        for file in os.listdir(self.config['output_dir']):
+        generated_files = []
+        for file in sorted(os.listdir(self.config['output_dir'])):
             if file.startswith('insert_'):
+                generated_files.append(file)
                 file_path = os.path.join(self.config['output_dir'], file)
                 file_size = os.path.getsize(file_path) / 1024  # size in KB
                 print(f"  - {file:<30} {file_size:.2f} KB")
+        
+        load_script = self.write_load_script()
+        if load_script:
+            print(f"Load script saved to '{load_script}'")
+        
+        if self.context.database is not None:
+            self.context.database.close()
+            print("Rows were loaded directly into the database")
+        
+        # Checksums make regressions between two seeded runs easy to spot
+        if generated_files:
+            manifest_path = write_checksum_manifest(self.config['output_dir'], generated_files,
+                                                    known_checksums=manifest.checksums())
+            print(f"Checksums saved to '{manifest_path}'")
+        
+        path, seconds = scheduler.critical_path()
+        run_metrics = {
+            'wall_seconds': round(scheduler.wall_time, 4),
+            'stage_workers': scheduler.workers,
+            'critical_path': path,
+            'critical_path_seconds': round(seconds, 4),
+            'total_rows': sum(sum(result['rows'].values()) for result in results.values()),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'seed': self.context.seed,
+            'reference_date': self.context.today.isoformat(),
+            'output_format': self.config['output_format'],
+        }
+        metrics_path = write_metrics(self.config['output_dir'], run_metrics, stage_metrics)
+        print(f"Metrics saved to '{metrics_path}'")
         print(f"{'='*80}\n")
 
 
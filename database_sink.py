@@ -0,0 +1,446 @@
+import sys
+import queue
+import threading
+
+# Rows per executemany call
+DEFAULT_BATCH_SIZE = 1000
+
+# Rows a loader inserts before committing its transaction
+DEFAULT_COMMIT_ROWS = 50000
+
+# Batches a table may have waiting for its loader before the generator blocks
+DEFAULT_QUEUE_BATCHES = 8
+
+# Tables each table references through a foreign key (see spotify_dump.sql)
+TABLE_PARENTS = {
+    'artists': ('genres',),
+    'albums': ('genres', 'artists'),
+    'songs': ('genres', 'artists', 'albums'),
+    'artists_followers': ('users', 'artists'),
+    'liked_songs': ('users', 'songs'),
+    'playlists': ('users',),
+    'playlist_songs': ('playlists', 'songs'),
+    'subscriptions': ('plans',),
+    'member_subscription': ('users', 'subscriptions'),
+    'payment_methods': ('users',),
+    'orders': ('users', 'plans', 'payment_methods'),
+}
+
+# Sentinels understood by a loader thread besides row batches
+_COMMIT = object()
+_STOP = object()
+
+def detect_paramstyle(connection):
+    """
+    Find the DB-API parameter style of the driver a connection comes from.
+
+    Args:
+        connection: Open DB-API connection
+
+    Returns:
+        str: The driver module's paramstyle, 'format' if it cannot be found
+    """
+    module = sys.modules.get(type(connection).__module__.split('.')[0])
+    return getattr(module, 'paramstyle', 'format')
+
+def insert_statement(table, columns, paramstyle):
+    """
+    Parameterised single-row INSERT statement for executemany.
+
+    Args:
+        table (str): Target table name
+        columns (tuple): Column names, in the order rows are given
+        paramstyle (str): DB-API parameter style of the driver
+
+    Returns:
+        str: The statement
+    """
+    if paramstyle == 'qmark':
+        placeholders = ['?'] * len(columns)
+    elif paramstyle == 'numeric':
+        placeholders = [f":{index}" for index in range(1, len(columns) + 1)]
+    elif paramstyle in ('format', 'pyformat'):
+        placeholders = ['%s'] * len(columns)
+    else:
+        raise ValueError(f"Unsupported DB-API paramstyle '{paramstyle}'")
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
+
+def parse_tsv_row(line):
+    """
+    Turn a line written by output_sinks.TSV back into a row of parameters.
+
+    Values come back as strings (None for NULL); the database converts them
+    to the column types on insert.
+
+    Args:
+        line (str): Line without its terminator
+
+    Returns:
+        tuple: Field values
+    """
+    values = []
+    for field in line.split('\t'):
+        if field == '\\N':
+            values.append(None)
+        elif '\\' in field:
+            values.append(_unescape(field))
+        else:
+            values.append(field)
+    return tuple(values)
+
+_UNESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', '0': '\0', 'Z': '\x1a'}
+
+def _unescape(field):
+    """Undo the backslash escapes of a delimited field"""
+    chars = []
+    escaped = False
+    for char in field:
+        if escaped:
+            chars.append(_UNESCAPES.get(char, char))
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        else:
+            chars.append(char)
+    return ''.join(chars)
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of DB-API connections.
+
+    Connections are opened on first use and handed out one at a time; a
+    caller asking for one while all are in use waits for one to come back.
+    """
+
+    def __init__(self, connect, size=8, init_statements=()):
+        """
+        Initialize the ConnectionPool.
+
+        Args:
+            connect (callable): Returns a new DB-API connection, e.g.
+                functools.partial(pymysql.connect, host=..., database=...)
+            size (int): Maximum number of open connections
+            init_statements (tuple): Statements run on every new connection
+        """
+        self.connect = connect
+        self.size = size
+        self.init_statements = init_statements
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if the pool is not full"""
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            can_open = self.opened < self.size
+            if can_open:
+                self.opened += 1
+        if not can_open:
+            return self.idle.get()
+
+        try:
+            connection = self.connect()
+            cursor = connection.cursor()
+            for statement in self.init_statements:
+                cursor.execute(statement)
+            cursor.close()
+        except Exception:
+            with self.lock:
+                self.opened -= 1
+            raise
+        return connection
+
+    def release(self, connection):
+        """Return a connection to the pool"""
+        self.idle.put(connection)
+
+    def close(self):
+        """Close the idle connections; the pool opens new ones if used again"""
+        while True:
+            try:
+                connection = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self.lock:
+                self.opened -= 1
+
+
+class DatabaseLoader:
+    """
+    Loads generated rows straight into a database instead of INSERT files.
+
+    Every open table gets a DatabaseTableSink with its own loader thread and
+    pooled connection, so all tables being generated load in parallel with
+    each other and with generation. Foreign keys stay valid because a batch
+    is only inserted once the parent tables have committed every row that
+    was generated before it; parents that are already closed are fully
+    loaded.
+
+    The pool needs a connection for every table open at the same time (three
+    for the catalog). Single-writer databases such as SQLite also need
+    commit_rows=1, so that every batch commits at once and no loader keeps
+    the write lock between batches.
+    """
+
+    def __init__(self, pool, batch_size=DEFAULT_BATCH_SIZE, commit_rows=DEFAULT_COMMIT_ROWS,
+                 paramstyle=None, check_foreign_keys=True, queue_batches=DEFAULT_QUEUE_BATCHES):
+        """
+        Initialize the DatabaseLoader.
+
+        Args:
+            pool (ConnectionPool): Connections the loader threads insert through
+            batch_size (int): Rows per executemany call
+            commit_rows (int): Rows inserted per transaction
+            paramstyle (str, optional): Driver parameter style, detected if omitted
+            check_foreign_keys (bool): Order batches so parent rows commit first;
+                not needed when the connections disable foreign key checks
+            queue_batches (int): Batches buffered per table
+        """
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.commit_rows = max(1, commit_rows)
+        self.paramstyle = paramstyle
+        self.check_foreign_keys = check_foreign_keys
+        self.queue_batches = queue_batches
+        self.open_sinks = {}
+        self.lock = threading.Lock()
+
+    def open_sink(self, table, columns):
+        """
+        Create the sink for a table.
+
+        Args:
+            table (str): Target table name
+            columns (tuple): Column names, in the order rows are given
+
+        Returns:
+            DatabaseTableSink: Sink to be used as a context manager
+        """
+        return DatabaseTableSink(self, table, columns)
+
+    def statement(self, table, columns, connection):
+        """INSERT statement for a table, in the driver's parameter style"""
+        if self.paramstyle is None:
+            self.paramstyle = detect_paramstyle(connection)
+        return insert_statement(table, columns, self.paramstyle)
+
+    def register(self, sink):
+        """Track an open sink and return the open sinks of its parent tables"""
+        with self.lock:
+            self.open_sinks[sink.table] = sink
+            if not self.check_foreign_keys:
+                return []
+            return [self.open_sinks[parent] for parent in TABLE_PARENTS.get(sink.table, ())
+                    if parent in self.open_sinks]
+
+    def unregister(self, sink):
+        """Forget a closed sink"""
+        with self.lock:
+            if self.open_sinks.get(sink.table) is sink:
+                del self.open_sinks[sink.table]
+
+    def close(self):
+        """Close the pool's idle connections"""
+        self.pool.close()
+
+
+class DatabaseTableSink:
+    """
+    Output for a single table that inserts rows through a pooled connection.
+
+    Has the same interface as output_sinks.TableSink. Rows are grouped into
+    batches of batch_size and handed to a loader thread, which inserts them
+    with executemany and commits every commit_rows rows. Closing the sink
+    waits for the loader to insert and commit everything; like TableSink, it
+    does so even if the body of the with statement raises.
+    """
+
+    def __init__(self, loader, table, columns):
+        """
+        Initialize the DatabaseTableSink.
+
+        Args:
+            loader (DatabaseLoader): Loader the sink belongs to
+            table (str): Target table name
+            columns (tuple): Column names, in the order rows are given
+        """
+        self.loader = loader
+        self.table = table
+        self.columns = columns
+        self.path = f"{table} table"
+        self.parents = []
+        self.pending = []
+        self.rows_queued = 0
+        self.rows_committed = 0
+        self.batches = queue.Queue(maxsize=loader.queue_batches)
+        self.committed = threading.Condition()
+        self.thread = None
+        self.error = None
+
+    @property
+    def rows_written(self):
+        """Number of rows written to the sink so far"""
+        return self.rows_queued + len(self.pending)
+
+    def open(self):
+        """Start the table's loader thread"""
+        self.parents = self.loader.register(self)
+        self.thread = threading.Thread(target=self._load, name=f"load-{self.table}", daemon=True)
+        self.thread.start()
+        return self
+
+    def write_row(self, values):
+        """
+        Add a row to the table.
+
+        Args:
+            values (tuple): Values in the same order as the sink's columns
+        """
+        self.pending.append(values)
+        if len(self.pending) >= self.loader.batch_size:
+            self.flush()
+
+    def write_formatted_row(self, row):
+        """Add a row read back from a rows-only (TSV) part file"""
+        self.write_row(parse_tsv_row(row))
+
+    def write_rows(self, rows):
+        """Add several rows to the table"""
+        for values in rows:
+            self.write_row(values)
+
+    def write_columns(self, *columns):
+        """Add rows given column by column as integer arrays"""
+        self.write_rows(zip(*(column.tolist() for column in columns)))
+
+    def append_part(self, part_path):
+        """Add the rows of a rows-only (TSV) part file, in order"""
+        with open(part_path, 'r', encoding='utf-8') as part:
+            for line in part:
+                self.write_formatted_row(line.rstrip('\n'))
+
+    def flush(self):
+        """Hand the pending rows to the loader thread as one batch"""
+        if not self.pending:
+            return
+
+        # Parent rows generated so far must be committed before this batch
+        watermarks = []
+        for parent in self.parents:
+            parent.flush()
+            watermarks.append((parent, parent.rows_queued))
+
+        self._put((self.pending, watermarks))
+        self.rows_queued += len(self.pending)
+        self.pending = []
+
+    def close(self):
+        """Insert and commit the remaining rows, then stop the loader thread"""
+        if self.thread is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._put(_STOP)
+            self.thread.join()
+            self.thread = None
+            self.loader.unregister(self)
+        if self.error is not None:
+            raise self.error
+
+    def wait_committed(self, rows):
+        """
+        Block until the first `rows` rows of this table are committed.
+
+        Called from the loader threads of child tables.
+        """
+        if self.rows_committed >= rows:
+            return
+        self._put(_COMMIT)
+        with self.committed:
+            while self.rows_committed < rows and self.error is None:
+                self.committed.wait()
+        if self.error is not None:
+            raise RuntimeError(f"Loading parent table '{self.table}' failed") from self.error
+
+    def _put(self, item):
+        """Queue an item for the loader, failing instead of blocking if it died"""
+        while True:
+            if self.error is not None and item is not _STOP:
+                raise self.error
+            try:
+                self.batches.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self.thread is None or not self.thread.is_alive():
+                    if item is _STOP:
+                        return
+                    raise self.error or RuntimeError(f"Loader for '{self.table}' stopped")
+
+    def _load(self):
+        """Loader thread: insert queued batches until the sink closes"""
+        connection = None
+        uncommitted = 0
+        try:
+            connection = self.loader.pool.acquire()
+            statement = self.loader.statement(self.table, self.columns, connection)
+            cursor = connection.cursor()
+            while True:
+                item = self.batches.get()
+                if item is _STOP:
+                    break
+                if item is _COMMIT:
+                    if uncommitted:
+                        self._commit(connection, uncommitted)
+                        uncommitted = 0
+                    continue
+
+                rows, watermarks = item
+                for parent, rows_needed in watermarks:
+                    # Never hold a transaction open while blocked on another table
+                    if uncommitted and parent.rows_committed < rows_needed:
+                        self._commit(connection, uncommitted)
+                        uncommitted = 0
+                    parent.wait_committed(rows_needed)
+                cursor.executemany(statement, rows)
+                uncommitted += len(rows)
+                if uncommitted >= self.loader.commit_rows:
+                    self._commit(connection, uncommitted)
+                    uncommitted = 0
+
+            if uncommitted:
+                self._commit(connection, uncommitted)
+            cursor.close()
+        except Exception as error:
+            self.error = error
+            if connection is not None:
+                connection.rollback()
+            # Keep draining so the generator is never stuck on a full queue
+            while self.batches.get() is not _STOP:
+                pass
+        finally:
+            with self.committed:
+                self.committed.notify_all()
+            if connection is not None:
+                self.loader.pool.release(connection)
+
+    def _commit(self, connection, rows):
+        """Commit the loader's transaction and wake tables waiting on it"""
+        connection.commit()
+        with self.committed:
+            self.rows_committed += rows
+            self.committed.notify_all()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
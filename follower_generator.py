@@ -1,8 +1,10 @@
 # Current Date and Time (UTC): 2025-03-22 19:15:31
 # Current User's Login: eduardoconde-bit
 
-from faker import Faker
-import random
+from generator_context import get_context
+from sql_writer import format_insert_statement
+from relationship_sampler import expand_sources
+from popularity_model import DEFAULT_SKEW
 
 class FollowersGenerator:
     """
@@ -10,7 +12,10 @@ class FollowersGenerator:
     Generates data for the artists_followers table, representing which users follow which artists.
     """
     
-    def __init__(self, num_users=100, num_artists=1000, output_file='insert_followers_artists.txt'):
+    COLUMNS = ('user_id', 'artist_id')
+    
+    def __init__(self, num_users=100, num_artists=1000, output_file='insert_followers_artists.txt', context=None,
+                 first_user_id=1, skew=DEFAULT_SKEW):
         """
         Initialize the FollowersGenerator with configuration parameters.
         
@@ -18,32 +23,34 @@ class FollowersGenerator:
             num_users (int): Number of users for which to generate relationships
             num_artists (int): Total number of artists available in the database
             output_file (str): File path to save the SQL insert statements
+            context (GeneratorContext, optional): Shared generator context
+            first_user_id (int): ID of the first user to generate relationships for
+            skew (float): Zipf exponent of artist popularity; 0 picks artists uniformly
         """
-        self.fake = Faker()
+        self.context = context or get_context()
+        self.fake = self.context.faker
         self.num_users = num_users
+        self.first_user_id = first_user_id
         self.num_artists = num_artists
         self.output_file = output_file
+        # Popular artists gather most of the follows
+        self.popularity = self.context.popularity('artists', num_artists, skew)
         
-    def generate_user_follows(self, user_id):
+    def generate_block_follows(self, user_ids, numbers):
         """
-        Generate the list of artists that a specific user follows.
+        Generate the artists followed by a block of users.
         
         Args:
-            user_id (int): The ID of the user
+            user_ids (range): IDs of the users in the block
+            numbers (numpy.random.Generator): Random stream of the block
             
         Returns:
-            set: A set of artist IDs that the user follows
+            tuple: (user IDs, artist IDs) arrays, one entry per follow relationship
         """
-        # Determine how many artists this user will follow (1 to 5)
-        num_artists_to_follow = random.randint(1, 5)
-        
-        # Generate a set of unique artist IDs to follow
-        artist_list = set()
-        while len(artist_list) < num_artists_to_follow:
-            artist_list.add(random.randint(1, self.num_artists))
-            
-        print(f"User {user_id} follows artists: {artist_list}")
-        return artist_list
+        # Every user follows 1 to 5 distinct artists
+        num_follows = numbers.integers(1, 6, size=len(user_ids))
+        num_follows, artist_ids = self.popularity.sample(numbers, num_follows)
+        return expand_sources(user_ids, num_follows), artist_ids
     
     def create_insert_statement(self, user_id, artist_id):
         """
@@ -56,31 +63,31 @@ class FollowersGenerator:
         Returns:
             str: SQL INSERT statement
         """
-        return (
-            f"INSERT INTO artists_followers (user_id, artist_id) VALUES ("
-            f"{user_id}, {artist_id});\n"
-        )
+        return format_insert_statement('artists_followers', self.COLUMNS, (user_id, artist_id))
     
     def generate_all_follows(self):
         """
         Generate follow relationships for all users and write INSERT statements to a file.
         """
-        # Open file for writing (or create it if it doesn't exist)
-        with open(self.output_file, 'w') as file:
-            # For each user
-            for user_id in range(1, self.num_users + 1):
-                # Get the set of artists this user follows
-                followed_artists = self.generate_user_follows(user_id)
+        # Open the output sink for the whole run
+        with self.context.open_sink(self.output_file, 'artists_followers', self.COLUMNS) as writer:
+            # For each block of users, with its own random stream
+            last_user_id = self.first_user_id + self.num_users - 1
+            progress = self.context.progress("Artist follows", self.num_users, unit='users')
+            for user_ids, _ in self.context.iter_blocks('followers', self.first_user_id, last_user_id):
+                numbers = self.context.block_numpy_rng('followers', user_ids.start)
+                followers, artist_ids = self.generate_block_follows(user_ids, numbers)
+                
+                # Write a row for each relationship
+                writer.write_columns(followers, artist_ids)
                 
-                # Create and write insert statements for each relationship
-                for artist_id in followed_artists:
-                    insert_statement = self.create_insert_statement(user_id, artist_id)
-                    file.write(insert_statement)
+                progress.update(user_ids.stop - self.first_user_id)
     
     def run(self):
         """Execute the followers generation process."""
         print(f"Generating artist follow relationships for {self.num_users} users...")
-        self.generate_all_follows()
+        with self.context.profile('followers'):
+            self.generate_all_follows()
         print(f"Completed! Follow relationships saved to '{self.output_file}'.")
 
 
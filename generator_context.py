@@ -0,0 +1,377 @@
+import os
+import random
+import hashlib
+import datetime
+import numpy
+from faker import Faker
+from sql_writer import InsertOptions
+import contextlib
+from stage_metrics import ProgressReporter, DEFAULT_PROGRESS_INTERVAL
+from stage_profiler import StageProfiler, DEFAULT_TOP_N, DEFAULT_SAMPLE_INTERVAL
+from popularity_model import PopularityModel
+from output_sinks import (TableSink, DelimitedTableSink, ParquetTableSink, DELIMITED_FORMATS, TSV,
+                          DEFAULT_FLUSH_BYTES, DEFAULT_ROW_GROUP_SIZE)
+
+# Entities per independent random stream. Streams depend only on the seed, the
+# stage and the block index, never on which process or shard draws from them.
+RNG_BLOCK_SIZE = 1000
+
+# Values accepted for the output_format setting
+OUTPUT_FORMATS = ('sql', 'tsv', 'csv', 'parquet', 'database')
+
+class GeneratorContext:
+    """
+    Shared state used by every data generator and music entity.
+
+    Building a Faker instance loads all of its providers, which costs far more
+    than generating a single row. The context builds the provider once per
+    process and hands the same instance to every consumer.
+
+    All randomness is derived from a single root seed: every stage, and every
+    block of RNG_BLOCK_SIZE entity IDs within a stage, gets its own stream, and
+    the shared Faker draws from whichever stream is current.
+    """
+
+    def __init__(self, locale=None, faker=None, insert_options=None, flush_bytes=DEFAULT_FLUSH_BYTES,
+                 seed=None, today=None, output_format='sql', database=None,
+                 row_group_size=DEFAULT_ROW_GROUP_SIZE, compression=None,
+                 progress_interval=DEFAULT_PROGRESS_INTERVAL, profile_mode=None, profile_dir='.',
+                 profile_top_n=DEFAULT_TOP_N, profile_interval=DEFAULT_SAMPLE_INTERVAL):
+        """
+        Initialize the GeneratorContext.
+
+        Args:
+            locale (str, optional): Faker locale used when building the provider
+            faker (Faker, optional): Pre-built provider to use instead of building one
+            insert_options (InsertOptions, optional): How INSERT scripts are batched
+            flush_bytes (int): Buffered output size at which table sinks write to disk
+            seed (int, optional): Root seed; a random one is picked if omitted
+            today (datetime.date, optional): Reference date for ages and subscription dates
+            output_format (str): 'sql' for INSERT scripts, 'tsv' / 'csv' for LOAD DATA files,
+                'parquet' for columnar files, or 'database' to insert through the database loader
+            database (DatabaseLoader, optional): Loader used by the 'database' output format
+            row_group_size (int): Rows per row group of the 'parquet' output format
+            compression (Compression, optional): Compression of the output files; part
+                files and the 'database' format are never compressed
+            progress_interval (float): Minimum seconds between two progress lines of a loop
+            profile_mode (str, optional): 'cprofile' or 'sampling' to profile every
+                stage and generator run; None disables profiling
+            profile_dir (str): Directory the profiles are written to
+            profile_top_n (int): Functions listed in each profile summary
+            profile_interval (float): Seconds between two stack samples; the sampler runs
+                in both modes and writes the collapsed stacks
+        """
+        self.locale = locale
+        self._faker = faker
+        self.insert_options = insert_options or InsertOptions()
+        self.flush_bytes = flush_bytes
+        self.set_seed(seed)
+        self.today = today or datetime.date.today()
+        self.output_format = output_format
+        self.database = database
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.progress_interval = progress_interval
+        self.profile_mode = profile_mode
+        self.profile_dir = profile_dir
+        self.profile_top_n = profile_top_n
+        self.profile_interval = profile_interval
+        # True while a profiler is running in this process
+        self.profiling = False
+        # Table sinks opened since the last take_row_counts call
+        self.table_sinks = []
+        # Popularity models built in this process, by (kind, population, skew)
+        self.popularity_models = {}
+
+    @property
+    def faker(self):
+        """Faker provider, built on first use"""
+        if self._faker is None:
+            self._faker = Faker(self.locale) if self.locale else Faker()
+        return self._faker
+
+    def set_seed(self, seed):
+        """
+        Set the root seed of every random stream.
+
+        Args:
+            seed (int, optional): Root seed; None picks a fresh random one
+        """
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(63)
+
+    def derive_seed(self, *keys):
+        """
+        Derive an independent seed from the root seed and a list of keys.
+
+        Returns:
+            int: 64-bit seed
+        """
+        text = ':'.join(str(key) for key in (self.seed,) + keys)
+        return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def rng(self, stage, *keys):
+        """
+        Create the random stream for a stage and make the shared Faker draw from it.
+
+        Args:
+            stage (str): Stage name, e.g. 'users'
+            *keys: Extra keys identifying a sub-stream within the stage
+
+        Returns:
+            random.Random: The stream
+        """
+        stream = random.Random(self.derive_seed(stage, *keys))
+        self.faker.random = stream
+        return stream
+
+    def numpy_rng(self, stage, *keys):
+        """
+        Create a NumPy generator for drawing whole columns of values at once.
+
+        Its seed is derived like rng()'s, but it is a separate stream, so
+        vectorised columns do not shift the values drawn one at a time.
+
+        Returns:
+            numpy.random.Generator: The stream
+        """
+        return numpy.random.default_rng(self.derive_seed(stage, 'numpy', *keys))
+
+    def block_keys(self, entity_id):
+        """
+        Seed keys of the ID block starting at entity_id.
+
+        A block that starts part way, as when appending to an existing
+        dataset, gets its own stream instead of replaying the rows already
+        drawn from the start of the block.
+        """
+        block, offset = divmod(entity_id - 1, RNG_BLOCK_SIZE)
+        return ('block', block) if offset == 0 else ('block', block, 'from', offset)
+
+    def block_rng(self, stage, entity_id):
+        """Random stream of the ID block starting at entity_id"""
+        return self.rng(stage, *self.block_keys(entity_id))
+
+    def block_numpy_rng(self, stage, entity_id):
+        """NumPy generator of the ID block starting at entity_id"""
+        return self.numpy_rng(stage, *self.block_keys(entity_id))
+
+    def iter_blocks(self, stage, first_id, last_id):
+        """
+        Split an ID range at RNG block boundaries.
+
+        Args:
+            stage (str): Stage name
+            first_id (int): First ID of the range
+            last_id (int): Last ID of the range (inclusive)
+
+        Yields:
+            tuple: (range of IDs, random stream for those IDs)
+        """
+        block_start = first_id
+        while block_start <= last_id:
+            block_end = ((block_start - 1) // RNG_BLOCK_SIZE + 1) * RNG_BLOCK_SIZE
+            block_stop = min(block_end, last_id) + 1
+            yield range(block_start, block_stop), self.block_rng(stage, block_start)
+            block_start = block_stop
+
+    def popularity(self, kind, population, skew):
+        """
+        Popularity model of a population, built once per process.
+
+        The ranks are permuted with a key derived from kind and population
+        only, so every stage and process drawing from the same population
+        ranks it the same way, whatever skew it uses.
+
+        Args:
+            kind (str): What the IDs are, e.g. 'songs'
+            population (int): Number of IDs, which run from 1 to population
+            skew (float): Zipf exponent; 0 makes every ID equally popular
+
+        Returns:
+            PopularityModel: The model
+        """
+        key = (kind, population, skew)
+        if key not in self.popularity_models:
+            permutation_key = self.derive_seed('popularity', kind, population)
+            self.popularity_models[key] = PopularityModel(permutation_key, population, skew)
+        return self.popularity_models[key]
+
+    def progress(self, label, total, unit='rows'):
+        """
+        Create a reporter printing a loop's progress at most once per progress_interval.
+
+        Args:
+            label (str): What is being generated
+            total (int): Units the loop will process
+            unit (str): Name of the units
+
+        Returns:
+            ProgressReporter: The reporter
+        """
+        return ProgressReporter(label, total, unit, self.progress_interval)
+
+    @contextlib.contextmanager
+    def profile(self, name):
+        """
+        Profile the body of a with block when profiling is enabled.
+
+        Profiles do not nest: inside an orchestrator stage, the generator's
+        own run() is part of the stage's profile.
+
+        Args:
+            name (str): Stage or generator name, used in the file names
+        """
+        if self.profile_mode is None or self.profiling:
+            yield
+            return
+        self.profiling = True
+        try:
+            with StageProfiler(name, self.profile_dir, self.profile_mode, self.profile_top_n,
+                               self.profile_interval):
+                yield
+        finally:
+            self.profiling = False
+
+    def date_of_birth(self, rng, minimum_age=0, maximum_age=115):
+        """
+        Random date of birth relative to the context's reference date.
+
+        Faker's date_of_birth uses the wall clock, which would make the output
+        change from one day to the next.
+
+        Args:
+            rng (random.Random): Stream to draw from
+            minimum_age (int): Minimum age in years
+            maximum_age (int): Maximum age in years
+
+        Returns:
+            datetime.date: Date of birth
+        """
+        youngest = int(minimum_age * 365.25)
+        oldest = int((maximum_age + 1) * 365.25) - 1
+        return self.today - datetime.timedelta(days=rng.randint(youngest, oldest))
+
+    def __getstate__(self):
+        # Worker processes build their own provider instead of unpickling one,
+        # and only write part files, so they need no database connections
+        state = self.__dict__.copy()
+        state['_faker'] = None
+        state['database'] = None
+        state['table_sinks'] = []
+        state['popularity_models'] = {}
+        return state
+
+    @property
+    def data_format(self):
+        """DelimitedFormat of the output, or None for the other output formats"""
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{self.output_format}'")
+        return DELIMITED_FORMATS.get(self.output_format)
+
+    def output_path(self, path):
+        """
+        Path a table file is actually written to.
+
+        Generators name their files for INSERT scripts (insert_users.txt);
+        delimited and Parquet files keep the name but take the format's extension.
+        Compressed files add the codec's suffix, except Parquet files, which
+        compress their column chunks instead.
+        """
+        if self.output_format == 'database':
+            return path
+        if self.output_format != 'sql':
+            path = os.path.splitext(path)[0] + '.' + self.output_format
+        if self.compression is not None and self.output_format != 'parquet':
+            path += self.compression.suffix
+        return path
+
+    def open_sink(self, path, table, columns, options=None, rows_only=False):
+        """
+        Create the output sink for a table.
+
+        Rows-only sinks write intermediate part files, so their path is used
+        as given; other paths go through output_path. With the 'database'
+        format, part files are TSV and everything else goes to the database.
+        Table sinks are remembered until take_row_counts.
+
+        Args:
+            path (str): Output file path
+            table (str): Target table name
+            columns (tuple): Column names, in the order rows are given
+            options (InsertOptions, optional): Overrides the context's insert options
+            rows_only (bool): Write bare formatted rows for a later merge
+
+        Returns:
+            TableSink: Sink to be used as a context manager
+        """
+        sink = self._create_sink(path, table, columns, options, rows_only)
+        if not rows_only:
+            self.table_sinks.append(sink)
+        return sink
+
+    def _create_sink(self, path, table, columns, options, rows_only):
+        if self.output_format == 'database':
+            if rows_only:
+                return DelimitedTableSink(path, table, columns, TSV, flush_bytes=self.flush_bytes)
+            if self.database is None:
+                raise ValueError("The 'database' output format needs a DatabaseLoader")
+            return self.database.open_sink(table, columns)
+        if self.output_format == 'parquet':
+            # Parquet part files are merged row group by row group
+            if rows_only:
+                return ParquetTableSink(path, table, columns, self.row_group_size)
+            return ParquetTableSink(self.output_path(path), table, columns, self.row_group_size,
+                                    compression=self.compression)
+        # Part files are read back for merging, so only final files are compressed
+        compression = None
+        if not rows_only:
+            path = self.output_path(path)
+            compression = self.compression
+        if self.data_format is not None:
+            return DelimitedTableSink(path, table, columns, self.data_format, flush_bytes=self.flush_bytes,
+                                      rows_only=rows_only, compression=compression)
+        return TableSink(path, table, columns, options or self.insert_options,
+                         flush_bytes=self.flush_bytes, rows_only=rows_only, compression=compression)
+
+    def take_row_counts(self):
+        """
+        Rows written to each table by the table sinks opened since the last call.
+
+        Returns:
+            dict: Row count by table name
+        """
+        counts = {}
+        for sink in self.table_sinks:
+            counts[sink.table] = counts.get(sink.table, 0) + sink.rows_written
+        self.table_sinks = []
+        return counts
+
+
+_current_context = None
+
+def get_context():
+    """
+    Get the process-wide generator context, creating it on first use.
+
+    Returns:
+        GeneratorContext: The shared context
+    """
+    global _current_context
+    if _current_context is None:
+        _current_context = GeneratorContext()
+    return _current_context
+
+def set_context(context):
+    """
+    Replace the process-wide generator context (e.g. to inject a stub provider in tests).
+
+    Args:
+        context (GeneratorContext): The context to install, or None to reset
+
+    Returns:
+        GeneratorContext: The previously installed context
+    """
+    global _current_context
+    previous = _current_context
+    _current_context = context
+    return previous
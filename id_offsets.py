@@ -0,0 +1,227 @@
+import os
+import re
+from output_sinks import DELIMITED_FORMATS, COMPRESSION_CODECS, open_text
+from run_manifest import RunManifest, MANIFEST_NAME
+
+try:
+    import pyarrow.parquet
+    import pyarrow.compute
+except ImportError:
+    pyarrow = None
+
+# Integer primary key of every table that has one (see spotify_dump.sql)
+ID_COLUMNS = {
+    'genres': 'genre_id',
+    'users': 'user_id',
+    'artists': 'artist_id',
+    'albums': 'album_id',
+    'songs': 'song_id',
+    'playlists': 'playlist_id',
+    'plans': 'plan_id',
+    'subscriptions': 'sub_id',
+    'payment_methods': 'method_id',
+    'orders': 'order_id',
+}
+
+# Start of an INSERT statement, and of the first value of each of its rows
+# (the dump quotes some integer IDs)
+_INSERT_PATTERN = re.compile(r"INSERT INTO (\w+) \(([^)]*)\) VALUES \(")
+_FIRST_VALUE_PATTERN = re.compile(r"\(?'?(-?\d+)'?\s*[,)]")
+
+def _update(max_ids, table, value):
+    if value > max_ids.get(table, 0):
+        max_ids[table] = value
+
+def _existing_file(path):
+    # The file itself, or its compressed version
+    for candidate in [path] + [path + suffix for suffix, _, _ in COMPRESSION_CODECS.values()]:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def max_ids_from_sql(path, max_ids=None):
+    """
+    Find the largest ID of every table in an SQL script.
+
+    Reads INSERT scripts written by the generators and dumps such as
+    spotify_dump.sql: one statement per line, or multi-row statements with
+    one row per line. When the ID column is the first column of the
+    statement its largest value is taken; otherwise the database assigns
+    IDs with AUTO_INCREMENT, so the rows are counted.
+
+    Args:
+        path (str): SQL file to scan, possibly compressed
+        max_ids (dict, optional): IDs found so far, updated in place
+
+    Returns:
+        dict: Largest ID by table name
+    """
+    max_ids = {} if max_ids is None else max_ids
+    counted = {}
+    table = None
+    explicit = False
+
+    with open_text(path) as file:
+        for line in file:
+            match = _INSERT_PATTERN.match(line)
+            if match:
+                table = match.group(1)
+                columns = [column.strip() for column in match.group(2).split(',')]
+                explicit = bool(columns) and columns[0] == ID_COLUMNS.get(table)
+                row = line[match.end() - 1:]
+            elif table is not None and line.startswith('('):
+                row = line
+            else:
+                continue
+
+            if table not in ID_COLUMNS:
+                continue
+            if explicit:
+                value = _FIRST_VALUE_PATTERN.match(row)
+                if value:
+                    _update(max_ids, table, int(value.group(1)))
+            else:
+                counted[table] = counted.get(table, 0) + 1
+
+    for table, rows in counted.items():
+        _update(max_ids, table, rows)
+    return max_ids
+
+def max_ids_from_delimited(path, table, columns, data_format, max_ids=None):
+    """
+    Find the largest ID of a table in a TSV or CSV file.
+
+    Args:
+        path (str): File to scan, possibly compressed
+        table (str): Table the file holds
+        columns (tuple): Columns of the file, in order
+        data_format (DelimitedFormat): Layout of the file
+        max_ids (dict, optional): IDs found so far, updated in place
+
+    Returns:
+        dict: Largest ID by table name
+    """
+    max_ids = {} if max_ids is None else max_ids
+    explicit = columns[0] == ID_COLUMNS[table]
+    largest = 0
+    rows = 0
+
+    with open_text(path) as file:
+        for line in file:
+            rows += 1
+            if explicit:
+                first = line.split(data_format.delimiter, 1)[0].strip(data_format.enclosure)
+                largest = max(largest, int(first))
+
+    _update(max_ids, table, largest if explicit else rows)
+    return max_ids
+
+def max_ids_from_parquet(path, table, max_ids=None):
+    """
+    Find the largest ID of a table in a Parquet file.
+
+    Args:
+        path (str): File to scan
+        table (str): Table the file holds
+        max_ids (dict, optional): IDs found so far, updated in place
+
+    Returns:
+        dict: Largest ID by table name
+    """
+    if pyarrow is None:
+        raise ImportError("Reading Parquet files needs pyarrow (pip install pyarrow)")
+    max_ids = {} if max_ids is None else max_ids
+    parquet_file = pyarrow.parquet.ParquetFile(path)
+    id_column = ID_COLUMNS[table]
+
+    if id_column in parquet_file.schema_arrow.names:
+        ids = parquet_file.read(columns=[id_column]).column(id_column)
+        largest = pyarrow.compute.max(ids).as_py() or 0
+    else:
+        largest = parquet_file.metadata.num_rows
+    _update(max_ids, table, largest)
+    return max_ids
+
+def max_ids_from_directory(directory, load_order):
+    """
+    Find the largest ID of every table in a directory of generated files.
+
+    Tables without an ID column are counted, so the directory must hold a
+    whole dataset rather than a delta; deltas are chained through their
+    run manifests instead.
+
+    Args:
+        directory (str): Output directory of an earlier run
+        load_order (tuple): (table, file name, columns) of every table file
+
+    Returns:
+        dict: Largest ID by table name
+    """
+    max_ids = {}
+    for table, filename, columns in load_order:
+        if table not in ID_COLUMNS:
+            continue
+        base = os.path.join(directory, os.path.splitext(filename)[0])
+        if _existing_file(base + '.txt'):
+            max_ids_from_sql(_existing_file(base + '.txt'), max_ids)
+        elif os.path.exists(base + '.parquet'):
+            max_ids_from_parquet(base + '.parquet', table, max_ids)
+        else:
+            for name, data_format in DELIMITED_FORMATS.items():
+                path = _existing_file(base + '.' + name)
+                if path:
+                    max_ids_from_delimited(path, table, columns, data_format, max_ids)
+                    break
+    return max_ids
+
+def max_ids_from_manifest(path):
+    """
+    Largest ID of every table after the run a manifest describes.
+
+    Each stage records the ID offsets it started from and the rows it
+    wrote, so this also works for a chain of delta runs.
+
+    Args:
+        path (str): Run manifest, or the directory holding it
+
+    Returns:
+        dict: Largest ID by table name
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST_NAME)
+    manifest = RunManifest(os.path.dirname(path), os.path.basename(path))
+
+    max_ids = {}
+    for entry in manifest.stages.values():
+        offsets = entry['settings'].get('id_offsets', {})
+        for table, offset in offsets.items():
+            _update(max_ids, table, offset)
+        for table, rows in entry['rows'].items():
+            if table in ID_COLUMNS:
+                _update(max_ids, table, offsets.get(table, 0) + rows)
+    return max_ids
+
+def read_max_ids(source, load_order):
+    """
+    Largest ID of every table of an existing dataset.
+
+    Args:
+        source (str): A run manifest, an output directory (its run manifest
+            is used when it has one) or an SQL dump
+        load_order (tuple): (table, file name, columns) of every table file
+
+    Returns:
+        dict: Largest ID by table name; tables without rows are left out
+
+    Raises:
+        FileNotFoundError: If source does not exist
+    """
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"No existing dataset at '{source}'")
+    if os.path.isdir(source):
+        if os.path.exists(os.path.join(source, MANIFEST_NAME)):
+            return max_ids_from_manifest(source)
+        return max_ids_from_directory(source, load_order)
+    if source.endswith('.json'):
+        return max_ids_from_manifest(source)
+    return max_ids_from_sql(source)
@@ -1,8 +1,10 @@
 # Current Date and Time (UTC): 2025-03-22 19:20:27
 # Current User's Login: eduardoconde-bit
 
-import random
-from faker import Faker
+from generator_context import get_context
+from sql_writer import format_insert_statement
+from relationship_sampler import expand_sources
+from popularity_model import DEFAULT_SKEW
 
 class LikedSongsGenerator:
     """
@@ -10,7 +12,10 @@ class LikedSongsGenerator:
     Generates data for the liked_songs table, representing which users like which songs.
     """
     
-    def __init__(self, num_users=100, num_songs=5135, output_file='insert_liked_songs.txt'):
+    COLUMNS = ('user_id', 'song_id')
+    
+    def __init__(self, num_users=100, num_songs=5135, output_file='insert_liked_songs.txt', context=None,
+                 first_user_id=1, skew=DEFAULT_SKEW):
         """
         Initialize the LikedSongsGenerator with configuration parameters.
         
@@ -18,31 +23,34 @@ class LikedSongsGenerator:
             num_users (int): Total number of users in the database
             num_songs (int): Total number of songs available in the database
             output_file (str): File path to save the SQL insert statements
+            context (GeneratorContext, optional): Shared generator context
+            first_user_id (int): ID of the first user to generate relationships for
+            skew (float): Zipf exponent of song popularity; 0 picks songs uniformly
         """
-        self.fake = Faker()
+        self.context = context or get_context()
+        self.fake = self.context.faker
         self.num_users = num_users
+        self.first_user_id = first_user_id
         self.num_songs = num_songs
         self.output_file = output_file
+        # Popular songs gather most of the likes
+        self.popularity = self.context.popularity('songs', num_songs, skew)
         
-    def generate_user_likes(self, user_id):
+    def generate_block_likes(self, user_ids, numbers):
         """
-        Generate the set of songs that a specific user likes.
+        Generate the songs liked by a block of users.
         
         Args:
-            user_id (int): The ID of the user
+            user_ids (range): IDs of the users in the block
+            numbers (numpy.random.Generator): Random stream of the block
             
         Returns:
-            set: A set of song IDs that the user likes
+            tuple: (user IDs, song IDs) arrays, one entry per like relationship
         """
-        # Determine how many songs this user will like (1 to 7)
-        num_songs_to_like = random.randint(1, 7)
-        
-        # Generate a set of unique song IDs to like
-        liked_songs = set()
-        while len(liked_songs) < num_songs_to_like:
-            liked_songs.add(random.randint(1, self.num_songs))
-            
-        return liked_songs
+        # Every user likes 1 to 7 distinct songs (fewer if there are fewer songs)
+        num_likes = numbers.integers(1, 8, size=len(user_ids))
+        num_likes, song_ids = self.popularity.sample(numbers, num_likes)
+        return expand_sources(user_ids, num_likes), song_ids
     
     def create_insert_statement(self, user_id, song_id):
         """
@@ -55,32 +63,31 @@ class LikedSongsGenerator:
         Returns:
             str: SQL INSERT statement
         """
-        return f"INSERT INTO liked_songs (user_id, song_id) VALUES ('{user_id}', '{song_id}');\n"
+        return format_insert_statement('liked_songs', self.COLUMNS, (user_id, song_id))
     
     def generate_all_likes(self):
         """
         Generate like relationships for all users and write INSERT statements to a file.
         """
-        # Open file for writing
-        with open(self.output_file, 'w') as file:
-            # Process each user
-            for user_id in range(1, self.num_users + 1):
-                # Get the set of songs this user likes
-                liked_songs = self.generate_user_likes(user_id)
+        # Open the output sink for the whole run
+        with self.context.open_sink(self.output_file, 'liked_songs', self.COLUMNS) as writer:
+            # Process each block of users, with its own random stream
+            last_user_id = self.first_user_id + self.num_users - 1
+            progress = self.context.progress("Liked songs", self.num_users, unit='users')
+            for user_ids, _ in self.context.iter_blocks('liked_songs', self.first_user_id, last_user_id):
+                numbers = self.context.block_numpy_rng('liked_songs', user_ids.start)
+                users, song_ids = self.generate_block_likes(user_ids, numbers)
                 
-                # Create and write insert statements for each relationship
-                for song_id in liked_songs:
-                    insert_statement = self.create_insert_statement(user_id, song_id)
-                    file.write(insert_statement)
+                # Write a row for each relationship
+                writer.write_columns(users, song_ids)
                 
-                # Print progress every 10 users
-                if user_id % 10 == 0:
-                    print(f"Generated likes for {user_id}/{self.num_users} users...")
+                progress.update(user_ids.stop - self.first_user_id)
     
     def run(self):
         """Execute the liked songs generation process."""
         print(f"Generating liked songs relationships for {self.num_users} users...")
-        self.generate_all_likes()
+        with self.context.profile('liked_songs'):
+            self.generate_all_likes()
         print(f"Completed! Liked songs relationships saved to '{self.output_file}'.")
 
 
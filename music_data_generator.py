@@ -1,49 +1,74 @@
-from faker import Faker
 import random
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+from generator_context import RNG_BLOCK_SIZE, get_context, set_context
+from sql_writer import format_insert_statement
+from output_sinks import merge_row_files
+from weighted_sampler import AliasSampler
+from popularity_model import DEFAULT_SKEW
 
 class MusicEntity:
     """Base class for music-related entities"""
-    def __init__(self):
-        self.fake = Faker()
+    TABLE = None
+    COLUMNS = ()
     
-    def create_insert_statement(self):
-        """Method to be implemented by subclasses"""
+    def __init__(self, context=None, rng=None):
+        # Reuse the shared Faker instead of building one per entity
+        self.context = context or get_context()
+        self.fake = self.context.faker
+        # Random stream of the entity's ID block (the random module if not given)
+        self.rng = rng or random
+    
+    def to_row(self):
+        """Method to be implemented by subclasses, returning values in COLUMNS order"""
         raise NotImplementedError("Subclasses must implement this method")
+    
+    def create_insert_statement(self):
+        """Create SQL INSERT statement for this entity"""
+        return format_insert_statement(self.TABLE, self.COLUMNS, self.to_row())
 
 class Song(MusicEntity):
     """Class representing a song entity"""
-    def __init__(self, artist_id, genre_id, album_id):
-        super().__init__()
+    TABLE = 'songs'
+    COLUMNS = ('title', 'duration', 'artist_id', 'genre_id', 'album_id', 'streams')
+    DURATION_RANGE = (60000, 600000)  # Duration in milliseconds
+    STREAMS_RANGE = (0, 1000000)
+    # Streams every song expects on top of its share of popularity
+    STREAMS_BASELINE = 100
+    
+    def __init__(self, artist_id, genre_id, album_id, context=None, rng=None, duration=None, streams=None):
+        super().__init__(context, rng)
         self.title = self._generate_title()
-        self.duration = random.randint(60000, 600000)  # Duration in milliseconds
+        # Bulk generation passes values drawn as whole columns
+        self.duration = duration if duration is not None else self.rng.randint(*self.DURATION_RANGE)
         self.artist_id = artist_id
         self.genre_id = genre_id
         self.album_id = album_id
-        self.streams = random.randint(0, 1000000)
+        self.streams = streams if streams is not None else self.rng.randint(*self.STREAMS_RANGE)
     
     def _generate_title(self):
         """Generate a creative song title"""
         return (
-            random.choice([self.fake.word(), ' ']) +
+            self.rng.choice([self.fake.word(), ' ']) +
             self.fake.color_name() +
-            random.choice([self.fake.word(), ' '])
+            self.rng.choice([self.fake.word(), ' '])
         ).strip()
     
-    def create_insert_statement(self):
-        """Create SQL INSERT statement for this song"""
-        return (
-            f"INSERT INTO songs (title, duration, artist_id, genre_id, album_id, streams) VALUES ("
-            f"'{self.title}', {self.duration}, {self.artist_id}, {self.genre_id}, {self.album_id}, {self.streams});\n"
-        )
+    def to_row(self):
+        """Values for the songs table"""
+        return (self.title, self.duration, self.artist_id, self.genre_id, self.album_id, self.streams)
 
 class Album(MusicEntity):
     """Class representing an album entity"""
-    def __init__(self, album_id, artist_id, genre_id):
-        super().__init__()
+    TABLE = 'albums'
+    COLUMNS = ('title', 'release_date', 'type', 'image', 'genre_id', 'artist_id')
+    SONG_COUNT_CHOICES = AliasSampler((3, 4, 5, 8))
+    
+    def __init__(self, album_id, artist_id, genre_id, context=None, rng=None):
+        super().__init__(context, rng)
         self.album_id = album_id
         self.title = self._generate_title()
-        self.release_date = self.fake.date_of_birth(minimum_age=18, maximum_age=65)
+        self.release_date = self.context.date_of_birth(self.rng, minimum_age=18, maximum_age=65)
         self.type = 'album'
         self.image = self.fake.url()
         self.genre_id = genre_id
@@ -53,61 +78,78 @@ class Album(MusicEntity):
     def _generate_title(self):
         """Generate a creative album title"""
         return (
-            random.choice([self.fake.word(), ' ']) +
+            self.rng.choice([self.fake.word(), ' ']) +
             self.fake.color_name() +
-            random.choice([self.fake.word(), ''])
+            self.rng.choice([self.fake.word(), ''])
         ).strip()
     
-    def generate_songs(self, num_songs=None):
-        """Generate songs for this album"""
+    def generate_songs(self, num_songs=None, durations=None, streams=None):
+        """
+        Generate songs for this album.
+        
+        Args:
+            num_songs (int, optional): Number of songs, drawn at random if omitted
+            durations (list, optional): Pre-drawn duration of every song
+            streams (list, optional): Pre-drawn stream count of every song
+        """
         if num_songs is None:
-            num_songs = random.choice([3, 4, 5, 8])
+            num_songs = self.SONG_COUNT_CHOICES.draw(self.rng)
         
-        for _ in range(num_songs):
-            song = Song(self.artist_id, self.genre_id, self.album_id)
+        for i in range(num_songs):
+            song = Song(self.artist_id, self.genre_id, self.album_id, self.context, self.rng,
+                        duration=durations[i] if durations else None,
+                        streams=streams[i] if streams else None)
             self.songs.append(song)
         
         return self.songs
     
-    def create_insert_statement(self):
-        """Create SQL INSERT statement for this album"""
-        return (
-            f"INSERT INTO albums (title, release_date, type, image, genre_id, artist_id) VALUES ("
-            f"'{self.title}', '{self.release_date}', '{self.type}', '{self.image}', {self.genre_id}, {self.artist_id});\n"
-        )
+    def to_row(self):
+        """Values for the albums table"""
+        return (self.title, self.release_date, self.type, self.image, self.genre_id, self.artist_id)
 
 class Artist(MusicEntity):
     """Class representing an artist entity"""
-    def __init__(self, artist_id, country_list, genres):
-        super().__init__()
+    TABLE = 'artists'
+    COLUMNS = ('artist_id', 'name', 'bio', 'country', 'date_of_birth', 'genre_id')
+    ALBUM_COUNT_CHOICES = AliasSampler((1, 2, 3))
+    
+    def __init__(self, artist_id, countries, genres, context=None, rng=None, genre_id=None):
+        super().__init__(context, rng)
         self.artist_id = artist_id
         self.name = self.fake.name()
         self.bio = self.fake.text(max_nb_chars=50)
-        self.country = random.choice(country_list)
-        self.date_of_birth = self.fake.date_of_birth(minimum_age=18, maximum_age=100)
-        self.genre_id = random.choice(genres)
+        self.country = countries.draw(self.rng)
+        self.date_of_birth = self.context.date_of_birth(self.rng, minimum_age=18, maximum_age=100)
+        self.genre_id = genre_id if genre_id is not None else genres.draw(self.rng)
         self.albums = []
     
-    def generate_albums(self, num_albums=None):
-        """Generate albums for this artist"""
+    def generate_albums(self, num_albums=None, first_album_id=None):
+        """
+        Generate albums for this artist.
+        
+        Args:
+            num_albums (int, optional): Number of albums, drawn at random if omitted
+            first_album_id (int, optional): First ID of a reserved block of album IDs;
+                IDs come from the global counter if omitted
+        """
         if num_albums is None:
-            num_albums = random.choice([1, 2, 3])
+            num_albums = self.ALBUM_COUNT_CHOICES.draw(self.rng)
         
         album_ids = []
         for i in range(num_albums):
-            album_id = MusicDataGenerator.get_next_album_id()
-            album = Album(album_id, self.artist_id, self.genre_id)
+            if first_album_id is None:
+                album_id = MusicDataGenerator.get_next_album_id()
+            else:
+                album_id = first_album_id + i
+            album = Album(album_id, self.artist_id, self.genre_id, self.context, self.rng)
             self.albums.append(album)
             album_ids.append(album_id)
         
         return self.albums
     
-    def create_insert_statement(self):
-        """Create SQL INSERT statement for this artist"""
-        return (
-            f"INSERT INTO artists (artist_id, name, bio, country, date_of_birth, genre_id) VALUES ("
-            f"'{self.artist_id}', '{self.name}', '{self.bio}', '{self.country}', '{self.date_of_birth}', {self.genre_id});\n"
-        )
+    def to_row(self):
+        """Values for the artists table"""
+        return (self.artist_id, self.name, self.bio, self.country, self.date_of_birth, self.genre_id)
 
 class MusicDataGenerator:
     """Class that manages generation of music data and writing to files"""
@@ -120,14 +162,32 @@ class MusicDataGenerator:
         cls._album_id_counter += 1
         return cls._album_id_counter
     
-    def __init__(self, num_artists=1000):
+    def __init__(self, num_artists=1000, context=None, streaming=True, workers=1,
+                 first_artist_id=1, first_album_id=1, first_song_id=1, stream_skew=DEFAULT_SKEW):
         """
         Initialize the MusicDataGenerator with configuration parameters.
         
         Args:
             num_artists (int): Number of artists to generate
+            context (GeneratorContext, optional): Shared generator context
+            streaming (bool): Write each artist's albums and songs as soon as they are
+                generated instead of keeping the whole catalog in self.artists
+            workers (int): Number of processes; more than 1 generates the catalog in shards
+            first_artist_id (int): ID of the first artist
+            first_album_id (int): ID the database will give the first album (AUTO_INCREMENT)
+            first_song_id (int): ID the database will give the first song (AUTO_INCREMENT)
+            stream_skew (float): Zipf exponent of song popularity, which stream counts are
+                drawn around; 0 draws them uniformly from Song.STREAMS_RANGE
         """
+        self.context = context or get_context()
         self.num_artists = num_artists
+        self.first_artist_id = first_artist_id
+        self.last_artist_id = first_artist_id + num_artists - 1
+        self.first_album_id = first_album_id
+        self.first_song_id = first_song_id
+        self.stream_skew = stream_skew
+        self.streaming = streaming
+        self.workers = workers
         self.artists = []
         self.country_list = ['BR', 'US', 'FR', 'DE', 'IT', 'AF', 'CA', 'GB', 'ES', 'JP', 'CN', 'IN', 'AU', 'RU', 'MX', 
                             'AR', 'ZA', 'PT', 'NL', 'SE', 'CH', 'KR', 'TR', 'NZ', 'AE', 'SA', 'EG', 'TH', 'SG', 'MY', 
@@ -139,58 +199,273 @@ class MusicDataGenerator:
                             'ER', 'GM', 'LR', 'TG', 'BJ', 'MW', 'MZ', 'BW', 'NA', 'SZ', 'LS', 'ZW', 'ZM', 'AO', 'MZ', 
                             'BW', 'NA', 'SZ', 'LS', 'ZW', 'ZM']
         self.genres = [num for num in range(1, 177)]
+        self.country_sampler = AliasSampler(self.country_list)
+        self.genre_sampler = AliasSampler(self.genres)
         
         # File paths for insert statements
         self.artists_file = 'insert_artists.txt'
         self.albums_file = 'insert_albums.txt'
         self.songs_file = 'insert_songs.txt'
+        
+        # Number of songs written by the last run
+        self.song_count = 0
     
     def generate_artists(self):
-        """Generate artists data"""
-        self.artists = []
-        for artist_id in range(1, self.num_artists + 1):
-            artist = Artist(artist_id, self.country_list, self.genres)
-            self.artists.append(artist)
-            print(f"Generated artist {artist_id}/{self.num_artists}")
+        """Generate artists data, keeping every artist with its albums and songs"""
+        self.artists = list(self.iter_artists())
         return self.artists
     
-    def save_all_data(self):
-        """Save all generated data to files"""
-        # Initialize files
-        with open(self.artists_file, 'w') as f:
-            pass
-        with open(self.albums_file, 'w') as f:
-            pass
-        with open(self.songs_file, 'w') as f:
-            pass
-        
-        # Generate and save data for each artist
-        for artist in self.artists:
-            # Save artist data
-            with open(self.artists_file, 'a') as f:
-                f.write(artist.create_insert_statement())
+    def iter_artists(self, shard=None):
+        """
+        Yield artists one at a time, with their albums and songs generated.
+        
+        Passing this to save_all_data keeps a single artist, with its albums
+        and songs, in memory at any time, whatever num_artists is. Every block
+        of RNG_BLOCK_SIZE artists draws from its own random stream, so an
+        artist is identical whichever shard or process generates it.
+        
+        Numeric columns (artist genres, song durations and stream counts) are
+        drawn for a whole block at once as NumPy arrays; only the text
+        columns are generated entity by entity. Stream counts follow song
+        popularity, the same ranking liked songs and playlists draw from.
+        
+        Args:
+            shard (dict, optional): Shard to generate, defaults to the whole catalog
             
-            # Generate albums for this artist
-            albums = artist.generate_albums()
+        Yields:
+            Artist: The next artist
+        """
+        label = "Artists"
+        if shard is None:
+            shard = self.build_shards(*self.plan_catalog(), num_shards=1)[0]
+        else:
+            label = f"Artists (shard {shard['index']})"
+        
+        first_artist_id = shard['first_artist_id']
+        last_artist_id = first_artist_id + len(shard['album_counts']) - 1
+        album_counts = shard['album_counts']
+        song_counts = shard['song_counts']
+        album_id = shard['first_album_id']
+        song_id = shard['first_song_id']
+        album_index = 0
+        popularity = None
+        if self.stream_skew:
+            popularity = self.context.popularity('songs', shard['total_songs'], self.stream_skew)
+        progress = self.context.progress(label, len(album_counts), unit='artists')
+        
+        for artist_ids, rng in self.context.iter_blocks('catalog', first_artist_id, last_artist_id):
+            # Draw the block's numeric columns in one go
+            block_albums = sum(album_counts[artist_ids.start - first_artist_id:artist_ids.stop - first_artist_id])
+            block_songs = sum(song_counts[album_index:album_index + block_albums])
+            numbers = self.context.block_numpy_rng('catalog', artist_ids.start)
+            genre_ids = self.genre_sampler.draw_many(numbers, len(artist_ids)).tolist()
+            durations = numbers.integers(Song.DURATION_RANGE[0], Song.DURATION_RANGE[1] + 1,
+                                         size=block_songs).tolist()
+            if popularity is None:
+                streams = numbers.integers(Song.STREAMS_RANGE[0], Song.STREAMS_RANGE[1] + 1,
+                                           size=block_songs).tolist()
+            else:
+                # The most popular song expects the most streams, and the rest fall off by score
+                streams = popularity.draw_amounts(numbers, range(song_id, song_id + block_songs),
+                                                  Song.STREAMS_RANGE[1], Song.STREAMS_BASELINE).tolist()
+            song_id += block_songs
+            song_index = 0
             
-            # Save album data and generate songs
-            for album in albums:
-                with open(self.albums_file, 'a') as f:
-                    f.write(album.create_insert_statement())
+            for position, artist_id in enumerate(artist_ids):
+                num_albums = album_counts[artist_id - first_artist_id]
+                artist = Artist(artist_id, self.country_sampler, self.genre_sampler, self.context, rng,
+                                genre_id=genre_ids[position])
+                for album in artist.generate_albums(num_albums, first_album_id=album_id):
+                    num_songs = song_counts[album_index]
+                    end = song_index + num_songs
+                    album.generate_songs(num_songs, durations[song_index:end], streams[song_index:end])
+                    album_index += 1
+                    song_index = end
+                album_id += num_albums
                 
-                # Generate songs for this album
-                songs = album.generate_songs()
+                yield artist
+            
+            progress.update(artist_ids.stop - first_artist_id)
+    
+    def write_catalog(self, artists, paths, rows_only=False):
+        """
+        Write artists, their albums and their songs to the three output files.
+        
+        Args:
+            artists (iterable): Artists to write; albums and songs are generated
+                for any artist that does not have them yet
+            paths (tuple): Artists, albums and songs file paths
+            rows_only (bool): Write bare rows to part files instead of INSERT scripts
+            
+        Returns:
+            int: Number of songs written
+        """
+        artists_path, albums_path, songs_path = paths
+        
+        # Each sink is opened once for the whole run
+        with self.context.open_sink(artists_path, Artist.TABLE, Artist.COLUMNS,
+                                    rows_only=rows_only) as artist_writer, \
+                self.context.open_sink(albums_path, Album.TABLE, Album.COLUMNS,
+                                       rows_only=rows_only) as album_writer, \
+                self.context.open_sink(songs_path, Song.TABLE, Song.COLUMNS,
+                                       rows_only=rows_only) as song_writer:
+            # Save data for each artist
+            for artist in artists:
+                # Save artist data
+                artist_writer.write_row(artist.to_row())
                 
-                # Save song data
-                with open(self.songs_file, 'a') as f:
-                    for song in songs:
-                        f.write(song.create_insert_statement())
+                # Save album data and the album's songs
+                for album in artist.albums or artist.generate_albums():
+                    album_writer.write_row(album.to_row())
+                    songs = album.songs or album.generate_songs()
+                    song_writer.write_rows(song.to_row() for song in songs)
+        
+        return song_writer.rows_written
+    
+    def save_all_data(self, artists=None):
+        """
+        Save all generated data to files.
+        
+        Args:
+            artists (iterable, optional): Artists to write, defaults to self.artists
+        """
+        if artists is None:
+            artists = self.artists
+        
+        paths = (self.artists_file, self.albums_file, self.songs_file)
+        self.song_count = self.write_catalog(artists, paths)
+    
+    def plan_catalog(self):
+        """
+        Draw the number of albums of every artist and of songs of every album.
+        
+        Knowing every count up front lets each shard get exact, contiguous
+        album and song ID blocks before any of them starts.
+        
+        Returns:
+            tuple: (album counts per artist, song counts per album) as bytearrays
+        """
+        album_counts = bytearray()
+        song_counts = bytearray()
+        
+        for artist_ids, rng in self.context.iter_blocks('catalog-plan', self.first_artist_id, self.last_artist_id):
+            for _ in artist_ids:
+                num_albums = Artist.ALBUM_COUNT_CHOICES.draw(rng)
+                album_counts.append(num_albums)
+                song_counts.extend(Album.SONG_COUNT_CHOICES.draw(rng) for _ in range(num_albums))
+        
+        return album_counts, song_counts
+    
+    def build_shards(self, album_counts, song_counts, num_shards):
+        """
+        Split the artist range into shards with reserved album and song ID blocks.
+        
+        Shard boundaries fall on RNG block boundaries, so the output does not
+        depend on the number of shards.
+        
+        Args:
+            album_counts (bytearray): Number of albums of each artist
+            song_counts (bytearray): Number of songs of each album
+            num_shards (int): Number of shards to create
+            
+        Returns:
+            list: One dict per shard, in ID order
+        """
+        # RNG blocks are counted in artist IDs, which need not start at 1
+        first_block = (self.first_artist_id - 1) // RNG_BLOCK_SIZE
+        last_block = (max(self.last_artist_id, self.first_artist_id) - 1) // RNG_BLOCK_SIZE
+        num_blocks = last_block - first_block + 1
+        num_shards = max(1, min(num_shards, num_blocks))
+        shards = []
+        first_album = 0
+        first_song = 0
+        # Every song the dataset will hold, which stream counts are ranked among
+        total_songs = self.first_song_id - 1 + sum(song_counts)
+        
+        def artist_index(block):
+            # Position, among the generated artists, of the first artist of a block
+            artist_id = (first_block + block) * RNG_BLOCK_SIZE + 1
+            return min(max(artist_id - self.first_artist_id, 0), self.num_artists)
+        
+        for index in range(num_shards):
+            artist_start = artist_index(index * num_blocks // num_shards)
+            artist_stop = artist_index((index + 1) * num_blocks // num_shards)
+            num_albums = sum(album_counts[artist_start:artist_stop])
+            shard_song_counts = bytes(song_counts[first_album:first_album + num_albums])
+            
+            shards.append({
+                'index': index,
+                'first_artist_id': self.first_artist_id + artist_start,
+                'album_counts': bytes(album_counts[artist_start:artist_stop]),
+                'first_album_id': self.first_album_id + first_album,
+                'song_counts': shard_song_counts,
+                'first_song_id': self.first_song_id + first_song,
+                'total_songs': total_songs,
+            })
+            first_album += num_albums
+            first_song += sum(shard_song_counts)
+        
+        return shards
+    
+    def part_path(self, path, index):
+        """Path of a shard's part file for one of the output files"""
+        return f"{path}.part{index:04d}"
+    
+    def write_shard(self, shard):
+        """
+        Generate one shard of the catalog into its own part files.
+        
+        Args:
+            shard (dict): Shard description from build_shards
+            
+        Returns:
+            int: Number of songs written
+        """
+        paths = tuple(
+            self.part_path(path, shard['index'])
+            for path in (self.artists_file, self.albums_file, self.songs_file)
+        )
+        # Part files hold bare rows; merge_parts batches them into statements
+        return self.write_catalog(self.iter_artists(shard), paths, rows_only=True)
+    
+    def merge_parts(self, num_parts):
+        """Merge the shards' part files, in ID order, into the final output files"""
+        outputs = (
+            (self.artists_file, Artist),
+            (self.albums_file, Album),
+            (self.songs_file, Song),
+        )
+        for path, entity in outputs:
+            part_paths = [self.part_path(path, index) for index in range(num_parts)]
+            with self.context.open_sink(path, entity.TABLE, entity.COLUMNS) as sink:
+                merge_row_files(sink, part_paths)
+    
+    def save_all_data_parallel(self):
+        """Generate and save the catalog in shards spread over a process pool"""
+        album_counts, song_counts = self.plan_catalog()
+        # Several shards per worker keeps every process busy until the end
+        shards = self.build_shards(album_counts, song_counts, self.workers * 4)
+        print(f"Generating {len(shards)} shards on {self.workers} worker processes...")
+        
+        # Each worker installs the context once and builds its own Faker on first use
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=set_context,
+                                 initargs=(self.context,)) as pool:
+            song_totals = list(pool.map(generate_catalog_shard, [self] * len(shards), shards))
+        
+        self.merge_parts(len(shards))
+        self.song_count = sum(song_totals)
     
     def run(self):
         """Execute the entire data generation process"""
         print(f"Starting generation of {self.num_artists} artists...")
-        self.generate_artists()
-        self.save_all_data()
+        with self.context.profile('catalog'):
+            if self.workers > 1:
+                self.save_all_data_parallel()
+            elif self.streaming:
+                self.save_all_data(self.iter_artists())
+            else:
+                self.generate_artists()
+                self.save_all_data()
         print(f"{'-'*50}")
         print(f"{self.num_artists} artists were generated and saved to '{self.artists_file}'.")
         print(f"Albums were saved to '{self.albums_file}'.")
@@ -198,6 +473,12 @@ class MusicDataGenerator:
         print(f"{'-'*50}")
 
 
+def generate_catalog_shard(generator, shard):
+    """Process pool entry point: generate one shard with the worker's own context"""
+    generator.context = get_context()
+    return generator.write_shard(shard)
+
+
 if __name__ == "__main__":
     # Create an instance of MusicDataGenerator and run it
     generator = MusicDataGenerator(num_artists=1000)
@@ -0,0 +1,828 @@
+import io
+import os
+import time
+import zlib
+import gzip
+import datetime
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from sql_writer import BatchedInsertWriter, InsertOptions, sql_literal
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Only needed for the 'parquet' output format
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:  # Only needed for 'zstd' compression
+    zstandard = None
+
+# Size of the underlying file object's I/O buffer
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+# Completed statements are kept in memory until this many bytes are pending
+DEFAULT_FLUSH_BYTES = 8 * 1024 * 1024
+
+# Rows per Parquet row group; also the most rows a Parquet sink holds in memory
+DEFAULT_ROW_GROUP_SIZE = 128 * 1024
+
+# Uncompressed bytes per independently compressed block of a compressed file
+DEFAULT_COMPRESSION_BLOCK_SIZE = 4 * 1024 * 1024
+
+# File suffix, default level and shell command decompressing to stdout, by codec
+COMPRESSION_CODECS = {
+    'gzip': ('.gz', 6, 'gzip -dc'),
+    'zstd': ('.zst', 3, 'zstd -dc'),
+}
+
+# Arrow types of the non-string columns, matching spotify_dump.sql
+ARROW_COLUMN_TYPES = {
+    'genre_id': 'int32', 'artist_id': 'int32', 'album_id': 'int32', 'song_id': 'int32',
+    'user_id': 'int32', 'playlist_id': 'int32', 'plan_id': 'int32', 'sub_id': 'int32',
+    'method_id': 'int32', 'order_id': 'int32', 'duration': 'int32', 'streams': 'int32',
+    'max_member': 'uint8',
+    'date_of_birth': 'date32', 'release_date': 'date32', 'date_start': 'date32',
+    'date_finish': 'date32', 'expiry_date': 'date32',
+    'created_at': 'timestamp',
+    'recorrency': 'bool',
+    'price': 'decimal', 'amount': 'decimal',
+}
+
+class Compression:
+    """
+    Settings of compressed output files.
+
+    A file is cut into blocks of block_size bytes and every block is
+    compressed on its own, as a gzip member or a zstd frame, on a pool of
+    threads while generation goes on. Concatenated members and frames are
+    valid streams, so `gzip -dc` / `zstd -dc` read the files as usual and
+    the output depends only on the data, never on the number of threads.
+    """
+
+    def __init__(self, codec='gzip', level=None, threads=None, block_size=DEFAULT_COMPRESSION_BLOCK_SIZE):
+        """
+        Initialize the Compression.
+
+        Args:
+            codec (str): 'gzip' or 'zstd'
+            level (int, optional): Compression level; the codec's default if omitted
+            threads (int, optional): Compression threads per file; None uses every CPU
+            block_size (int): Uncompressed bytes per block
+
+        Raises:
+            ValueError: If the codec is unknown
+            ImportError: If the codec needs a module that is not installed
+        """
+        if codec not in COMPRESSION_CODECS:
+            raise ValueError(f"Unknown compression '{codec}'")
+        if codec == 'zstd' and zstandard is None:
+            raise ImportError("'zstd' compression requires zstandard (pip install zstandard)")
+        self.codec = codec
+        self.suffix, default_level, self.decompress_command = COMPRESSION_CODECS[codec]
+        self.level = default_level if level is None else level
+        self.threads = max(1, threads or os.cpu_count() or 1)
+        self.block_size = max(1, block_size)
+
+    def compress(self, data):
+        """
+        Compress a block into a self-contained gzip member or zstd frame.
+
+        Both codecs release the GIL while they work, so blocks compress in
+        parallel on the pool's threads.
+
+        Args:
+            data (bytes): Uncompressed block
+
+        Returns:
+            bytes: The compressed block
+        """
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        # wbits=31 writes a gzip header with no timestamp, so reruns are identical
+        return zlib.compress(data, self.level, wbits=31)
+
+    def open(self, path, mode='rt'):
+        """
+        Open a file written with this codec for reading.
+
+        Args:
+            path (str): Compressed file
+            mode (str): 'rt' for text or 'rb' for bytes
+
+        Returns:
+            file: Decompressing file object
+        """
+        if self.codec == 'gzip':
+            return gzip.open(path, mode, encoding='utf-8' if 't' in mode else None)
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True,
+                                                            closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8') if 't' in mode else reader
+
+
+class CompressedFile:
+    """
+    Write-only text file that compresses its contents on worker threads.
+
+    Text is encoded and cut into blocks of the compression's block_size;
+    each full block goes to a thread pool and compressed blocks are written
+    in order. At most two blocks per thread are in flight, which bounds
+    memory and lets a slow disk or codec hold back the generator.
+    """
+
+    def __init__(self, path, compression, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        Initialize the CompressedFile, creating the file.
+
+        Args:
+            path (str): Output file path
+            compression (Compression): Codec and threading settings
+            buffer_size (int): I/O buffer size of the output file
+        """
+        self.path = path
+        self.compression = compression
+        self.file = open(path, 'wb', buffering=buffer_size)
+        self.pool = ThreadPoolExecutor(max_workers=compression.threads,
+                                       thread_name_prefix='compress')
+        self.pending = bytearray()
+        self.in_flight = deque()
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        # Seconds the threads spent compressing, summed over threads
+        self.compress_seconds = 0.0
+        self.opened = time.perf_counter()
+
+    def _compress(self, data):
+        start = time.perf_counter()
+        compressed = self.compression.compress(data)
+        return compressed, time.perf_counter() - start
+
+    def _submit(self, data):
+        self.in_flight.append(self.pool.submit(self._compress, data))
+        self.raw_bytes += len(data)
+        while len(self.in_flight) > 2 * self.compression.threads:
+            self._write_next()
+
+    def _write_next(self):
+        compressed, seconds = self.in_flight.popleft().result()
+        self.file.write(compressed)
+        self.compressed_bytes += len(compressed)
+        self.compress_seconds += seconds
+
+    def write(self, text):
+        """Encode text and send every full block to the compression threads"""
+        self.pending += text.encode('utf-8')
+        block_size = self.compression.block_size
+        if len(self.pending) >= block_size:
+            view = memoryview(self.pending)
+            full = len(self.pending) - len(self.pending) % block_size
+            for start in range(0, full, block_size):
+                self._submit(bytes(view[start:start + block_size]))
+            view.release()
+            del self.pending[:full]
+
+    def flush(self):
+        """Write the blocks already compressed; a partial block waits for more text"""
+        while self.in_flight and self.in_flight[0].done():
+            self._write_next()
+        self.file.flush()
+
+    def close(self):
+        """Compress the last partial block, write every block and close the file"""
+        if self.file is None:
+            return
+        try:
+            if self.pending:
+                self._submit(bytes(self.pending))
+                self.pending = bytearray()
+            while self.in_flight:
+                self._write_next()
+        finally:
+            for future in self.in_flight:
+                future.cancel()
+            self.pool.shutdown(wait=True)
+            self.file.close()
+            self.file = None
+        self.report()
+
+    def report(self):
+        """Print the compression ratio and throughput of the file"""
+        ratio = self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 0.0
+        throughput = self.raw_bytes / self.compress_seconds / 1e6 if self.compress_seconds else 0.0
+        elapsed = time.perf_counter() - self.opened
+        print(f"Compressed '{os.path.basename(self.path)}': {self.raw_bytes / 1e6:.1f} MB -> "
+              f"{self.compressed_bytes / 1e6:.1f} MB ({ratio:.1f}x), {throughput:.0f} MB/s per thread "
+              f"on {self.compression.threads} thread(s), open for {elapsed:.1f} s")
+
+
+def open_output(path, buffer_size=DEFAULT_BUFFER_SIZE, compression=None):
+    """
+    Create a text output file, compressed if a compression is given.
+
+    Args:
+        path (str): Output file path
+        buffer_size (int): I/O buffer size of the output file
+        compression (Compression, optional): Compression settings
+
+    Returns:
+        file: Object with write, flush and close
+    """
+    if compression is None:
+        return open(path, 'w', buffering=buffer_size, encoding='utf-8')
+    return CompressedFile(path, compression, buffer_size)
+
+def open_text(path):
+    """
+    Open a generated text file for reading, decompressing it if its suffix says so.
+
+    Args:
+        path (str): File to read
+
+    Returns:
+        file: Text file object
+    """
+    for codec, (suffix, _, _) in COMPRESSION_CODECS.items():
+        if path.endswith(suffix):
+            return Compression(codec).open(path)
+    return open(path, 'r', encoding='utf-8')
+
+
+class TableSink:
+    """
+    Output for a single table that stays open for a whole generation run.
+
+    Rows are batched into INSERT statements by a BatchedInsertWriter. Only
+    complete statements reach the sink's buffer, and the buffer is written to
+    disk once it grows past flush_bytes. Used as a context manager, the sink
+    always finishes the file on exit: if the body raises, the rows generated
+    so far are written as complete statements followed by the usual footer,
+    so the file stays loadable and simply ends at the last generated row.
+
+    With rows_only the sink writes one formatted row per line and no
+    statements at all; such part files are batched later by merge_row_files.
+    """
+
+    def __init__(self, path, table, columns, options=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE, flush_bytes=DEFAULT_FLUSH_BYTES, rows_only=False,
+                 compression=None):
+        """
+        Initialize the TableSink.
+
+        Args:
+            path (str): Output file path
+            table (str): Target table name
+            columns (tuple): Column names, in the order rows are given
+            options (InsertOptions, optional): Batching settings
+            buffer_size (int): I/O buffer size of the output file
+            flush_bytes (int): Pending bytes that trigger a write to disk
+            rows_only (bool): Write bare formatted rows instead of INSERT statements
+            compression (Compression, optional): Compress the file as it is written
+        """
+        self.path = path
+        self.table = table
+        self.columns = columns
+        self.options = options or InsertOptions()
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.flush_bytes = flush_bytes
+        self.rows_only = rows_only
+        self.file = None
+        self.writer = None
+        self.chunks = []
+        self.chunk_bytes = 0
+        self.bytes_written = 0
+        self.raw_rows = 0
+
+    @property
+    def rows_written(self):
+        """Number of rows written to the sink so far"""
+        if self.rows_only:
+            return self.raw_rows
+        return self.writer.rows_written if self.writer else 0
+
+    def open(self):
+        """Create the output file and write the file header"""
+        self.file = open_output(self.path, self.buffer_size, self.compression)
+        self.writer = BatchedInsertWriter(self, self.table, self.columns, self.options)
+        if not self.rows_only:
+            self.writer.write_header()
+        return self
+
+    def write(self, text):
+        """Receive complete statements from the INSERT writer"""
+        self.chunks.append(text)
+        self.chunk_bytes += len(text)
+        if self.chunk_bytes >= self.flush_bytes:
+            self.flush()
+
+    def write_row(self, values):
+        """
+        Add a row to the table.
+
+        Args:
+            values (tuple): Values in the same order as the sink's columns
+        """
+        if self.rows_only:
+            self.write(self.writer.format_row(values) + "\n")
+            self.raw_rows += 1
+        else:
+            self.writer.write_row(values)
+
+    def write_formatted_row(self, row):
+        """Add a row already formatted for this sink"""
+        if self.rows_only:
+            self.write(row + "\n")
+            self.raw_rows += 1
+        else:
+            self.writer.write_formatted_row(row)
+
+    def write_rows(self, rows):
+        """Add several rows to the table"""
+        for values in rows:
+            self.write_row(values)
+
+    def write_columns(self, *columns):
+        """
+        Add rows given column by column as integer arrays.
+
+        Integers need no quoting or escaping, so the rows are formatted
+        without going through sql_literal value by value.
+
+        Args:
+            *columns (numpy.ndarray): One integer array per column, all the same length
+        """
+        rows = zip(*(column.tolist() for column in columns))
+        formatted = ["(" + ", ".join(map(str, row)) + ")" for row in rows]
+        if self.rows_only:
+            self.write("\n".join(formatted) + "\n")
+            self.raw_rows += len(formatted)
+        else:
+            self.writer.write_formatted_rows(formatted)
+
+    def append_part(self, part_path):
+        """Add the rows of a rows-only part file, in order"""
+        with open(part_path, 'r', encoding='utf-8') as part:
+            for line in part:
+                self.write_formatted_row(line.rstrip('\n'))
+
+    def flush(self):
+        """Write the buffered statements to disk"""
+        if self.chunks:
+            self.file.write(''.join(self.chunks))
+            self.bytes_written += self.chunk_bytes
+            self.chunks = []
+            self.chunk_bytes = 0
+        self.file.flush()
+
+    def close(self):
+        """Write pending rows and the file footer, then close the file"""
+        if self.file is None:
+            return
+        try:
+            if not self.rows_only:
+                self.writer.write_footer()
+            self.flush()
+        finally:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class DelimitedFormat:
+    """
+    Field and line layout of a file read by MariaDB's LOAD DATA INFILE.
+
+    NULL is written as \\N and special characters are backslash-escaped,
+    matching LOAD DATA's default ESCAPED BY '\\'. Lines end with '\\n', so a
+    row always fits on one line.
+    """
+
+    def __init__(self, name, delimiter, enclosure=''):
+        """
+        Initialize the DelimitedFormat.
+
+        Args:
+            name (str): Format name, also used as the file extension
+            delimiter (str): Field separator
+            enclosure (str): Quote character around string fields ('' for none)
+        """
+        self.name = name
+        self.delimiter = delimiter
+        self.enclosure = enclosure
+        escapes = {
+            '\\': '\\\\',
+            '\t': '\\t',
+            '\n': '\\n',
+            '\r': '\\r',
+            '\0': '\\0',
+            '\x1a': '\\Z',
+        }
+        if enclosure:
+            escapes[enclosure] = '\\' + enclosure
+        elif delimiter not in escapes:
+            escapes[delimiter] = '\\' + delimiter
+        self.escapes = str.maketrans(escapes)
+
+    def format_field(self, value):
+        """Convert a Python value into a single field"""
+        if value is None:
+            return "\\N"
+        if isinstance(value, bool):
+            return "1" if value else "0"
+        if isinstance(value, (int, float, Decimal, datetime.date, datetime.datetime)):
+            return str(value)
+        return self.enclosure + str(value).translate(self.escapes) + self.enclosure
+
+    def format_row(self, values):
+        """Format a row as one line, without the line terminator"""
+        return self.delimiter.join(self.format_field(value) for value in values)
+
+    def load_statement(self, filename, table, columns, local=True):
+        """
+        LOAD DATA statement for a file written in this format.
+
+        Args:
+            filename (str): Data file, relative to the directory the client runs in
+            table (str): Target table name
+            columns (tuple): Column names, in file order
+            local (bool): Read the file from the client instead of the server
+
+        Returns:
+            str: The statement
+        """
+        terminator = "'\\t'" if self.delimiter == '\t' else sql_literal(self.delimiter)
+        fields = f"FIELDS TERMINATED BY {terminator}"
+        if self.enclosure:
+            fields += f" OPTIONALLY ENCLOSED BY {sql_literal(self.enclosure)}"
+        fields += " ESCAPED BY '\\\\'"
+        return (
+            f"LOAD DATA {'LOCAL ' if local else ''}INFILE {sql_literal(filename)}\n"
+            f"INTO TABLE {table}\n"
+            f"CHARACTER SET utf8mb4\n"
+            f"{fields}\n"
+            f"LINES TERMINATED BY '\\n'\n"
+            f"({', '.join(columns)});\n"
+        )
+
+
+TSV = DelimitedFormat('tsv', '\t')
+CSV = DelimitedFormat('csv', ',', enclosure='"')
+
+# Output formats other than 'sql', by name
+DELIMITED_FORMATS = {
+    TSV.name: TSV,
+    CSV.name: CSV,
+}
+
+
+class DelimitedTableSink(TableSink):
+    """
+    Output for a single table written as a LOAD DATA INFILE-ready file.
+
+    Uses the same buffering as TableSink, but writes one line per row and no
+    statements, header or footer. Rows-only part files therefore have the same
+    layout as the final file.
+    """
+
+    def __init__(self, path, table, columns, data_format=TSV,
+                 buffer_size=DEFAULT_BUFFER_SIZE, flush_bytes=DEFAULT_FLUSH_BYTES, rows_only=False,
+                 compression=None):
+        """
+        Initialize the DelimitedTableSink.
+
+        Args:
+            path (str): Output file path
+            table (str): Target table name
+            columns (tuple): Column names, in the order rows are given
+            data_format (DelimitedFormat): Field and line layout
+            buffer_size (int): I/O buffer size of the output file
+            flush_bytes (int): Pending bytes that trigger a write to disk
+            rows_only (bool): Accepted for compatibility with TableSink; has no effect
+            compression (Compression, optional): Compress the file as it is written
+        """
+        super().__init__(path, table, columns, buffer_size=buffer_size,
+                         flush_bytes=flush_bytes, rows_only=True, compression=compression)
+        self.data_format = data_format
+
+    def open(self):
+        """Create the output file"""
+        self.file = open_output(self.path, self.buffer_size, self.compression)
+        return self
+
+    def write_row(self, values):
+        """
+        Add a row to the table.
+
+        Args:
+            values (tuple): Values in the same order as the sink's columns
+        """
+        self.write(self.data_format.format_row(values) + "\n")
+        self.raw_rows += 1
+
+    def write_formatted_row(self, row):
+        """Add a row already formatted for this sink"""
+        self.write(row + "\n")
+        self.raw_rows += 1
+
+    def write_columns(self, *columns):
+        """Add rows given column by column as integer arrays"""
+        delimiter = self.data_format.delimiter
+        for row in zip(*(column.tolist() for column in columns)):
+            self.write(delimiter.join(map(str, row)) + "\n")
+        self.raw_rows += len(columns[0])
+
+
+def arrow_type(column):
+    """
+    Arrow type of a generated column.
+
+    Args:
+        column (str): Column name
+
+    Returns:
+        pyarrow.DataType: Type from ARROW_COLUMN_TYPES, string for anything else
+    """
+    name = ARROW_COLUMN_TYPES.get(column, 'string')
+    if name == 'timestamp':
+        return pyarrow.timestamp('ms')
+    if name == 'decimal':
+        # DECIMAL(4, 2) in the schema
+        return pyarrow.decimal128(4, 2)
+    return pyarrow.type_for_alias(name)
+
+
+class ParquetTableSink:
+    """
+    Output for a single table written as a Parquet file.
+
+    Has the same interface as TableSink. Rows are collected into columns and
+    written out one row group of row_group_size rows at a time, so memory
+    stays bounded whatever the table size. Row group boundaries depend only
+    on the row count, so merged shard outputs are identical to a serial run.
+    """
+
+    def __init__(self, path, table, columns, row_group_size=DEFAULT_ROW_GROUP_SIZE, compression=None):
+        """
+        Initialize the ParquetTableSink.
+
+        Args:
+            path (str): Output file path
+            table (str): Table name, stored in the file's metadata
+            columns (tuple): Column names, in the order rows are given
+            row_group_size (int): Rows per row group
+            compression (Compression, optional): Codec and level of the column
+                chunks, instead of Parquet's default (snappy)
+        """
+        if pyarrow is None:
+            raise ImportError("The 'parquet' output format requires pyarrow (pip install pyarrow)")
+        self.path = path
+        self.table = table
+        self.columns = columns
+        self.row_group_size = max(1, row_group_size)
+        self.compression = compression
+        self.schema = pyarrow.schema([(column, arrow_type(column)) for column in columns],
+                                     metadata={'table': table})
+        self.writer = None
+        self.rows = []
+        self.tables = []
+        self.table_rows = 0
+        self.rows_written = 0
+
+    def open(self):
+        """Create the output file"""
+        options = {}
+        if self.compression is not None:
+            options = {'compression': self.compression.codec,
+                       'compression_level': self.compression.level}
+        self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema, **options)
+        return self
+
+    def write_row(self, values):
+        """
+        Add a row to the table.
+
+        Args:
+            values (tuple): Values in the same order as the sink's columns
+        """
+        self.rows.append(values)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def write_rows(self, rows):
+        """Add several rows to the table"""
+        for values in rows:
+            self.write_row(values)
+
+    def write_columns(self, *columns):
+        """Add rows given column by column as integer arrays"""
+        self._collect_rows()
+        arrays = [pyarrow.array(column, field.type) for field, column in zip(self.schema, columns)]
+        self._add_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+        self._write_row_groups(final=False)
+
+    def append_part(self, part_path):
+        """Add the rows of a Parquet part file, in order"""
+        self._collect_rows()
+        part = pyarrow.parquet.ParquetFile(part_path)
+        for index in range(part.num_row_groups):
+            self._add_table(part.read_row_group(index).replace_schema_metadata(self.schema.metadata))
+
+    def flush(self):
+        """Write every complete row group collected so far"""
+        self._collect_rows()
+        self._write_row_groups(final=False)
+
+    def close(self):
+        """Write the remaining rows and the file footer, then close the file"""
+        if self.writer is None:
+            return
+        try:
+            self._collect_rows()
+            self._write_row_groups(final=True)
+        finally:
+            self.writer.close()
+            self.writer = None
+
+    def _collect_rows(self):
+        """Turn the pending rows into an Arrow table"""
+        if not self.rows:
+            return
+        arrays = []
+        for field, values in zip(self.schema, zip(*self.rows)):
+            if pyarrow.types.is_decimal(field.type):
+                # Prices are generated as floats
+                arrays.append(pyarrow.array(values, pyarrow.float64()).cast(field.type))
+            else:
+                arrays.append(pyarrow.array(values, field.type))
+        self._add_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+        self.rows = []
+
+    def _add_table(self, table):
+        self.tables.append(table)
+        self.table_rows += table.num_rows
+
+    def _write_row_groups(self, final):
+        """Write full row groups, and on close whatever is left"""
+        if not self.tables or (self.table_rows < self.row_group_size and not final):
+            return
+        pending = pyarrow.concat_tables(self.tables)
+        offset = 0
+        while pending.num_rows - offset >= self.row_group_size or (final and offset < pending.num_rows):
+            group = pending.slice(offset, self.row_group_size)
+            self.writer.write_table(group, row_group_size=self.row_group_size)
+            self.rows_written += group.num_rows
+            offset += group.num_rows
+        rest = pending.slice(offset)
+        self.tables = [rest] if rest.num_rows else []
+        self.table_rows = rest.num_rows
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def merge_row_files(sink, part_paths):
+    """
+    Append the rows of several rows-only part files, in order, to an open sink.
+
+    An INSERT sink batches the rows as if they had been written directly, so
+    statement boundaries are the same however the rows were split across part
+    files. The part files are removed once merged.
+
+    Args:
+        sink (TableSink): Open sink of the final output file
+        part_paths (list): Part files written with rows_only, in row order
+
+    Returns:
+        int: Number of rows in the sink
+    """
+    for part_path in part_paths:
+        sink.append_part(part_path)
+        os.remove(part_path)
+    return sink.rows_written
+
+def write_load_script(directory, tables, data_format, options=None, local=True,
+                      script_name='load.sql', run_through=None):
+    """
+    Write a script that loads delimited table files with LOAD DATA INFILE.
+
+    Args:
+        directory (str): Directory containing the data files
+        tables (list): (table, filename, columns) tuples in foreign-key-safe order
+        data_format (DelimitedFormat): Layout the files were written in
+        options (InsertOptions, optional): Transaction and foreign key settings
+        local (bool): Use LOAD DATA LOCAL INFILE
+        script_name (str): Name of the script file
+        run_through (str, optional): Shell script that feeds the files through
+            named pipes and runs this script
+
+    Returns:
+        str: Path of the script
+    """
+    options = options or InsertOptions()
+    script_path = os.path.join(directory, script_name)
+    with open(script_path, 'w', encoding='utf-8') as script:
+        if run_through:
+            script.write(f"-- Reads the named pipes set up by {run_through}; run that script instead\n")
+        else:
+            script.write(f"-- Run from this directory, e.g. mariadb --local-infile=1 spotify < {script_name}\n")
+        script.write(options.file_header())
+        for table, filename, columns in tables:
+            script.write(data_format.load_statement(filename, table, columns, local))
+        script.write(options.file_footer())
+    return script_path
+
+def write_stream_load_script(directory, tables, compression, data_format=None,
+                             script_name='load.sh', sql_script_name='load.sql'):
+    """
+    Write a shell script that streams compressed table files into the mariadb client.
+
+    INSERT scripts are decompressed and piped straight into the client.
+    LOAD DATA cannot read compressed files, so each delimited file is
+    decompressed into a named pipe with the name sql_script_name's LOAD DATA
+    statement expects, and the client reads the pipes in load order.
+
+    Args:
+        directory (str): Directory containing the compressed files
+        tables (list): (table, filename, columns) tuples in foreign-key-safe order,
+            filename being the name of the compressed file
+        compression (Compression): Codec the files were written with
+        data_format (DelimitedFormat, optional): Layout of delimited files; None for INSERT scripts
+        script_name (str): Name of the shell script
+        sql_script_name (str): LOAD DATA script run through the pipes
+
+    Returns:
+        str: Path of the script
+    """
+    command = compression.decompress_command
+    script_path = os.path.join(directory, script_name)
+    with open(script_path, 'w', encoding='utf-8') as script:
+        script.write("#!/bin/sh\n")
+        script.write(f"# Arguments are passed to the client, e.g. sh {script_name} spotify\n")
+        script.write("set -e\n")
+        script.write('data_dir=$(cd "$(dirname "$0")" && pwd)\n')
+        if data_format is None:
+            files = " ".join(f'"$data_dir/{filename}"' for _, filename, _ in tables)
+            script.write(f"for file in {files}; do\n")
+            script.write(f'    {command} "$file"\n')
+            script.write('done | mariadb "$@"\n')
+        else:
+            script.write("pipe_dir=$(mktemp -d)\n")
+            script.write("trap 'kill $(jobs -p) 2>/dev/null; rm -rf \"$pipe_dir\"' EXIT\n")
+            script.write('cd "$pipe_dir"\n')
+            for _, filename, _ in tables:
+                pipe = filename[:-len(compression.suffix)]
+                script.write(f'mkfifo "{pipe}"\n')
+                script.write(f'{command} "$data_dir/{filename}" > "{pipe}" &\n')
+            script.write(f'mariadb --local-infile=1 "$@" < "$data_dir/{sql_script_name}"\n')
+            script.write("wait\n")
+    return script_path
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """
+    Compute the SHA-256 checksum of a file.
+
+    Args:
+        path (str): File to hash
+        chunk_size (int): Bytes read per iteration
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def write_checksum_manifest(directory, filenames, manifest_name='SHA256SUMS', known_checksums=None):
+    """
+    Write a checksum manifest for output files, in the format `sha256sum -c` reads.
+
+    Args:
+        directory (str): Directory containing the files
+        filenames (list): Names of the files to include
+        manifest_name (str): Name of the manifest file
+        known_checksums (dict, optional): Checksums already computed, by file name
+
+    Returns:
+        str: Path of the manifest
+    """
+    manifest_path = os.path.join(directory, manifest_name)
+    with open(manifest_path, 'w') as manifest:
+        for filename in sorted(filenames):
+            checksum = (known_checksums or {}).get(filename) or file_checksum(os.path.join(directory, filename))
+            manifest.write(f"{checksum}  {filename}\n")
+    return manifest_path
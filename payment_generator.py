@@ -4,12 +4,13 @@
 
 import os
 import random
-import string
 import datetime
-import calendar
-import uuid
 from decimal import Decimal
-from faker import Faker
+import numpy
+from generator_context import get_context, RNG_BLOCK_SIZE
+from relationship_sampler import partition_population
+from weighted_sampler import AliasSampler
+from token_factory import TokenFactory
 
 class PaymentDataGenerator:
     """
@@ -19,17 +20,59 @@ class PaymentDataGenerator:
     Each user will be part of EXACTLY ONE subscription (either as owner or member).
     """
     
-    def __init__(self, num_users=100, output_dir='spotify_db_data'):
+    PLAN_COLUMNS = ('plan_id', 'plan', 'description', 'max_member', 'price')
+    SUBSCRIPTION_COLUMNS = ('sub_id', 'date_start', 'date_finish', 'recorrency', 'status', 'plan_id')
+    MEMBER_SUBSCRIPTION_COLUMNS = ('user_id', 'sub_id', 'role')
+    PAYMENT_METHOD_COLUMNS = ('method_id', 'user_id', 'method_type', 'card_brand',
+                              'card_last4', 'expiry_date', 'token')
+    ORDER_COLUMNS = ('order_id', 'user_id', 'plan_id', 'method_id',
+                     'amount', 'status', 'transaction_id', 'created_at')
+    
+    # Categorical distributions, each built once
+    METHOD_COUNTS = AliasSampler((1, 2), (0.8, 0.2))
+    METHOD_TYPES = AliasSampler(('credit_card', 'google_pay'), (0.75, 0.25))
+    ORDER_STATUSES = AliasSampler(('pending', 'completed', 'failed', 'refunded'),
+                                  (0.03, 0.95, 0.015, 0.005))
+    
+    # Key of the permutation behind transaction IDs. It is fixed instead of
+    # being derived from the run's seed, so a run appending orders to a
+    # dataset made with another seed never repeats a transaction ID
+    TRANSACTION_ID_KEY = 0x5E2C91B7D40A8F33
+    
+    def __init__(self, num_users=100, output_dir='spotify_db_data', context=None, history_days=547,
+                 first_user_id=1, first_sub_id=1, first_method_id=1, first_order_id=1, include_plans=True):
         """
         Initialize the PaymentDataGenerator with configuration parameters.
         
         Args:
             num_users (int): Number of users in the database
             output_dir (str): Directory to save output files
+            context (GeneratorContext, optional): Shared generator context
+            history_days (int): Subscriptions start up to this many days ago (18 months by default)
+            first_user_id (int): ID of the first user to create subscriptions for
+            first_sub_id (int): ID of the first subscription
+            first_method_id (int): ID of the first payment method
+            first_order_id (int): ID of the first order
+            include_plans (bool): Write the plans table; a delta on top of an
+                existing dataset leaves it out
         """
-        self.fake = Faker()
+        self.context = context or get_context()
+        self.fake = self.context.faker
+        # Random stream of the current stage or ID block
+        self.rng = random
         self.num_users = num_users
         self.output_dir = output_dir
+        self.history_days = history_days
+        self.include_plans = include_plans
+        
+        # Per-user arrays are indexed by user_id - user_offset, per-subscription
+        # arrays by sub_id - sub_offset - 1
+        self.user_offset = first_user_id - 1
+        self.sub_offset = first_sub_id - 1
+        self.first_method_id = first_method_id
+        self.first_order_id = first_order_id
+        # A delta draws its own whole-run streams; a run from ID 1 keeps the original ones
+        self.stream_keys = () if first_user_id == 1 else ('from', first_user_id)
         
         # Ensure output directory exists
         if not os.path.exists(self.output_dir):
@@ -44,13 +87,21 @@ class PaymentDataGenerator:
         
         # Data structures to track generated entities
         self.plans = []
-        self.subscriptions = []
-        self.payment_methods = []
-        self.member_subscriptions = []
-        self.orders = []
         
-        # Track which users are assigned to subscriptions
-        self.user_subscription = {}  # Maps user_id to subscription data
+        # Subscriptions, as arrays filled by assign_users_to_subscriptions
+        self.num_subscriptions = 0
+        self.subscription_plan_ids = None
+        self.subscription_owners = None
+        self.subscription_users = None
+        self.subscription_offsets = None
+        self.subscription_starts = None
+        self.subscription_finishes = None
+        self.subscription_recorrency = None
+        
+        # Payment methods are streamed to their file; orders only need each
+        # owner's first method_id and method count (methods of a user are consecutive)
+        self.method_first = None
+        self.method_counts = None
         
         # Default plans with max_member field
         self.plans_data = [
@@ -60,42 +111,29 @@ class PaymentDataGenerator:
             {'plan_id': 4, 'plan': 'Student', 'price': 4.99, 'description': 'Discounted plan for verified students', 'max_member': 1},
             {'plan_id': 5, 'plan': 'Free', 'price': 0.00, 'description': 'Free plan with advertisements', 'max_member': 1}
         ]
+        self.plans_by_id = {plan['plan_id']: plan for plan in self.plans_data}
         
         # Credit card brands
         self.card_brands = ['Visa', 'MasterCard', 'American Express', 'Discover', 'JCB']
+        self.card_brand_sampler = AliasSampler(self.card_brands)
     
-    def add_months(self, sourcedate, months):
+    def plan_prices(self):
         """
-        Add a specified number of months to a date safely, handling month transitions.
+        Prices of the plans as an array indexed by plan_id.
         
-        Args:
-            sourcedate (datetime.date): The original date
-            months (int): Number of months to add
-            
         Returns:
-            datetime.date: New date with months added
+            numpy.ndarray: Price of every plan
         """
-        month = sourcedate.month - 1 + months
-        year = sourcedate.year + month // 12
-        month = month % 12 + 1
-        
-        # Get the last day of the target month
-        last_day = calendar.monthrange(year, month)[1]
-        
-        # Make sure the day is valid for the new month
-        day = min(sourcedate.day, last_day)
-        
-        return datetime.date(year, month, day)
+        prices = numpy.zeros(max(self.plans_by_id) + 1)
+        for plan in self.plans_data:
+            prices[plan['plan_id']] = plan['price']
+        return prices
     
     def generate_plans(self):
         """Generate plan data and write to file"""
-        with open(self.plans_file, 'w') as file:
+        with self.context.open_sink(self.plans_file, 'plans', self.PLAN_COLUMNS) as writer:
             for plan in self.plans_data:
-                insert_statement = (
-                    f"INSERT INTO plans (plan_id, plan, price, description, max_member) VALUES ("
-                    f"{plan['plan_id']}, '{plan['plan']}', {plan['price']}, '{plan['description']}', {plan['max_member']});\n"
-                )
-                file.write(insert_statement)
+                writer.write_row(tuple(plan[column] for column in self.PLAN_COLUMNS))
                 self.plans.append(plan)
         
         print(f"Generated {len(self.plans)} plans")
@@ -104,12 +142,17 @@ class PaymentDataGenerator:
         """
         Core method that assigns users to subscription groups.
         Each user will be part of exactly one subscription (as owner or member).
+        
+        Plans and dates are drawn for all subscriptions at once and kept in
+        compact arrays indexed by sub_id - sub_offset - 1; the users of the
+        subscription at index i are
+        subscription_users[subscription_offsets[i]:subscription_offsets[i + 1]],
+        the first of them being the owner.
         """
         print("Assigning users to subscription groups...")
         
-        # Start with all users unassigned
-        unassigned_users = list(range(1, self.num_users + 1))
-        random.shuffle(unassigned_users)  # Randomize user order
+        # The whole assignment draws from a single stream
+        numbers = self.context.numpy_rng('subscriptions', *self.stream_keys)
         
         # Plan distribution weights
         plan_weights = {
@@ -119,301 +162,250 @@ class PaymentDataGenerator:
             4: 0.10,  # Student (10%)
             5: 0.10   # Free (10%)
         }
+        available_plans = numpy.array([p['plan_id'] for p in self.plans_data])
+        plan_sizes = [p['max_member'] for p in self.plans_data]
+        weights = [plan_weights[p] for p in available_plans]
         
-        # Initialize subscription ID counter
-        sub_id = 1
+        # Shuffle the users and cut them into consecutive groups, one per subscription;
+        # a Duo or Family plan that does not fit in the users left becomes Individual
+        individual_plan = available_plans.tolist().index(1)
+        plan_choices, users, self.subscription_offsets = partition_population(
+            numbers, self.num_users, plan_sizes, weights, fallback=individual_plan
+        )
+        # Kept for the whole run, so stored in the narrowest types that fit
+        self.subscription_users = (users + self.user_offset).astype(numpy.int32)
+        self.subscription_plan_ids = available_plans[plan_choices].astype(numpy.uint8)
+        self.subscription_owners = self.subscription_users[self.subscription_offsets[:-1]]
+        self.num_subscriptions = len(self.subscription_plan_ids)
         
-        # Continue while there are unassigned users
-        while unassigned_users:
-            # Select a plan type based on weights
-            available_plans = [p['plan_id'] for p in self.plans_data]
-            weights = [plan_weights[p] for p in available_plans]
-            plan_id = random.choices(available_plans, weights=weights)[0]
-            
-            # Get the plan details
-            plan = next(p for p in self.plans_data if p['plan_id'] == plan_id)
-            max_members = plan['max_member']
-            
-            # Calculate how many users to include in this subscription
-            # This is limited by how many unassigned users we have left
-            num_users_for_subscription = min(max_members, len(unassigned_users))
-            
-            # If we don't have enough users for a Duo or Family plan, use Individual plan instead
-            if num_users_for_subscription < max_members and max_members > 1:
-                # Fall back to Individual plan
-                plan_id = 1  # Individual plan
-                plan = next(p for p in self.plans_data if p['plan_id'] == plan_id)
-                max_members = plan['max_member']
-                num_users_for_subscription = 1
-            
-            # Skip if we can't assign any users (shouldn't happen, but just in case)
-            if num_users_for_subscription <= 0:
-                continue
-            
-            # Take users from the unassigned list
-            users_for_subscription = unassigned_users[:num_users_for_subscription]
-            unassigned_users = unassigned_users[num_users_for_subscription:]
-            
-            # The first user is the owner
-            owner_id = users_for_subscription[0]
-            member_ids = users_for_subscription[1:] if len(users_for_subscription) > 1 else []
-            
-            # Subscription start date (between 1 day and 18 months ago)
-            # Convertido para inteiro (547)
-            days_ago = random.randint(1, 547)  # Corrigido: 365 * 1.5 = 547.5, arredondado para 547
-            date_start = (datetime.datetime.now() - datetime.timedelta(days=days_ago)).date()
-            
-            # Determine if subscription is still active
-            is_active = random.random() < 0.85
-            
-            # Determine recurrency
-            recorrency = random.random() < 0.95  # 95% of subscriptions are recurring
-            
-            # Determine finish date if inactive
-            date_finish = None
-            status = 'active'
-            if not is_active:
-                # Inactive subscription ended between 1 day and 6 months ago
-                days_inactive = random.randint(1, 180)
-                date_finish = (datetime.datetime.now() - datetime.timedelta(days=days_inactive)).date()
-                status = 'disabled'
-            
-            # Create subscription
-            subscription = {
-                'sub_id': sub_id,
-                'date_start': date_start,
-                'date_finish': date_finish,
-                'recorrency': recorrency,
-                'status': status,
-                'plan_id': plan_id,
-                'owner_id': owner_id,
-                'member_ids': member_ids
-            }
-            
-            # Track the subscription for each user
-            self.user_subscription[owner_id] = {
-                'sub_id': sub_id,
-                'role': 'owner'
-            }
-            
-            for member_id in member_ids:
-                self.user_subscription[member_id] = {
-                    'sub_id': sub_id,
-                    'role': 'member'
-                }
-            
-            self.subscriptions.append(subscription)
-            sub_id += 1
+        today = numpy.datetime64(self.context.today, 'D')
         
-        # Report on subscription distribution
-        print(f"Created {len(self.subscriptions)} subscriptions for {self.num_users} users")
+        # Subscription start date (between 1 day and history_days ago)
+        days_ago = numbers.integers(1, self.history_days + 1, size=self.num_subscriptions)
+        self.subscription_starts = today - days_ago
         
-        plan_counts = {}
-        for plan in self.plans_data:
-            plan_counts[plan['plan']] = 0
+        # 85% of subscriptions are still active; 95% are recurring
+        is_active = numbers.random(self.num_subscriptions) < 0.85
+        self.subscription_recorrency = numbers.random(self.num_subscriptions) < 0.95
+        
+        # Inactive subscriptions ended between 1 day and 6 months ago
+        days_inactive = numbers.integers(1, 181, size=self.num_subscriptions)
+        self.subscription_finishes = numpy.where(
+            is_active, numpy.datetime64('NaT', 'D'), today - days_inactive
+        )
+        
+        # Report on subscription distribution
+        print(f"Created {self.num_subscriptions} subscriptions for {self.num_users} users")
         
-        for sub in self.subscriptions:
-            plan = next(p for p in self.plans_data if p['plan_id'] == sub['plan_id'])
-            plan_counts[plan['plan']] += 1
+        plan_counts = numpy.bincount(plan_choices, minlength=len(self.plans_data))
         
         print("Subscription plan distribution:")
-        for plan_name, count in plan_counts.items():
-            print(f"  - {plan_name}: {count} subscriptions")
+        for plan, count in zip(self.plans_data, plan_counts.tolist()):
+            print(f"  - {plan['plan']}: {count} subscriptions")
     
     def generate_payment_methods(self):
         """Generate payment methods for users and write to file"""
-        with open(self.payment_methods_file, 'w') as file:
-            method_id = 1
+        # Only subscription owners with paid plans get payment methods
+        plan_prices = self.plan_prices()
+        paying = numpy.zeros(self.num_users + 1, dtype=bool)
+        paying[self.subscription_owners - self.user_offset] = plan_prices[self.subscription_plan_ids] > 0
+        
+        self.method_first = numpy.zeros(self.num_users + 1, dtype=numpy.int32)
+        self.method_counts = numpy.zeros(self.num_users + 1, dtype=numpy.uint8)
+        
+        # Card digits and tokens are cut from large pre-drawn blocks
+        tokens = TokenFactory(self.context.numpy_rng('payment_tokens', *self.stream_keys))
+        
+        with self.context.open_sink(self.payment_methods_file, 'payment_methods', self.PAYMENT_METHOD_COLUMNS) as writer:
+            method_id = self.first_method_id
+            first_user_id = self.user_offset + 1
+            progress = self.context.progress("Payment methods", self.num_users, unit='users')
             
-            for user_id in range(1, self.num_users + 1):
-                # Only create payment methods for subscription owners with paid plans
-                if user_id in self.user_subscription and self.user_subscription[user_id]['role'] == 'owner':
-                    sub_id = self.user_subscription[user_id]['sub_id']
-                    subscription = next(s for s in self.subscriptions if s['sub_id'] == sub_id)
-                    plan = next(p for p in self.plans_data if p['plan_id'] == subscription['plan_id'])
-                    
-                    # Skip free plans
-                    if plan['price'] == 0.00:
-                        continue
-                    
-                    # Generate payment method(s) for this user
-                    # 90% of paid subscription owners have a payment method
-                    if random.random() < 0.90:
-                        # Number of payment methods per user (1-2)
-                        num_methods = random.choices([1, 2], weights=[0.8, 0.2])[0]
-                        
-                        for _ in range(num_methods):
-                            # Method type (credit_card or google_pay)
-                            method_type = random.choices(['credit_card', 'google_pay'], weights=[0.75, 0.25])[0]
-                            
-                            # Card brand
-                            card_brand = random.choice(self.card_brands)
-                            
-                            # Last 4 digits
-                            card_last4 = ''.join(random.choices(string.digits, k=4))
-                            
-                            # Expiry date (1-5 years in future)
-                            current_date = datetime.datetime.now()
-                            years_ahead = random.randint(1, 5)
-                            expiry_date = current_date.replace(
-                                year=current_date.year + years_ahead,
-                                month=random.randint(1, 12),
-                                day=random.randint(1, 28)
-                            ).date()
-                            
-                            # Token (simulated payment token)
-                            token = f"tok_{uuid.uuid4().hex[:20]}"
+            for user_ids, rng in self.context.iter_blocks('payment_methods', first_user_id,
+                                                          self.user_offset + self.num_users):
+                # Every block of users draws its payment methods from its own stream
+                self.rng = rng
+                block_paying = paying[user_ids.start - self.user_offset:user_ids.stop - self.user_offset].tolist()
+                for user_id, user_paying in zip(user_ids, block_paying):
+                    if user_paying:
+                        # Generate payment method(s) for this user
+                        # 90% of paid subscription owners have a payment method
+                        if self.rng.random() < 0.90:
+                            # Number of payment methods per user (1-2)
+                            num_methods = self.METHOD_COUNTS.draw(self.rng)
+                            self.method_first[user_id - self.user_offset] = method_id
+                            self.method_counts[user_id - self.user_offset] = num_methods
                             
-                            payment_method = {
-                                'method_id': method_id,
-                                'user_id': user_id,
-                                'method_type': method_type,
-                                'card_brand': card_brand,
-                                'card_last4': card_last4,
-                                'expiry_date': expiry_date,
-                                'token': token
-                            }
-                            
-                            insert_statement = (
-                                f"INSERT INTO payment_methods (method_id, user_id, method_type, card_brand, "
-                                f"card_last4, expiry_date, token) VALUES ("
-                                f"{method_id}, {user_id}, '{method_type}', '{card_brand}', "
-                                f"'{card_last4}', '{expiry_date}', '{token}');\n"
-                            )
-                            
-                            file.write(insert_statement)
-                            self.payment_methods.append(payment_method)
-                            method_id += 1
+                            for _ in range(num_methods):
+                                # Method type (credit_card or google_pay)
+                                method_type = self.METHOD_TYPES.draw(self.rng)
+                                
+                                # Card brand
+                                card_brand = self.card_brand_sampler.draw(self.rng)
+                                
+                                # Last 4 digits
+                                card_last4 = tokens.digits(4)
+                                
+                                # Expiry date (1-5 years in future)
+                                current_date = self.context.today
+                                years_ahead = self.rng.randint(1, 5)
+                                expiry_date = current_date.replace(
+                                    year=current_date.year + years_ahead,
+                                    month=self.rng.randint(1, 12),
+                                    day=self.rng.randint(1, 28)
+                                )
+                                
+                                # Token (simulated payment token)
+                                token = f"tok_{tokens.hex(20)}"
+                                
+                                writer.write_row((method_id, user_id, method_type, card_brand,
+                                                  card_last4, expiry_date, token))
+                                method_id += 1
+                
+                progress.update(user_ids.stop - first_user_id)
         
-        print(f"Generated {method_id - 1} payment methods")
+        print(f"Generated {method_id - self.first_method_id} payment methods")
     
     def generate_subscriptions_file(self):
         """Write subscription data to file"""
-        with open(self.subscriptions_file, 'w') as file:
-            for subscription in self.subscriptions:
-                date_finish_sql = f"'{subscription['date_finish']}'" if subscription['date_finish'] else "NULL"
-                
-                insert_statement = (
-                    f"INSERT INTO subscriptions (sub_id, date_start, date_finish, "
-                    f"recorrency, status, plan_id) VALUES ("
-                    f"{subscription['sub_id']}, '{subscription['date_start']}', {date_finish_sql}, "
-                    f"{1 if subscription['recorrency'] else 0}, '{subscription['status']}', {subscription['plan_id']});\n"
+        with self.context.open_sink(self.subscriptions_file, 'subscriptions', self.SUBSCRIPTION_COLUMNS) as writer:
+            # Converted to Python objects a block at a time
+            for start in range(0, self.num_subscriptions, RNG_BLOCK_SIZE):
+                block = slice(start, start + RNG_BLOCK_SIZE)
+                first_sub_id = self.sub_offset + start + 1
+                rows = zip(
+                    range(first_sub_id, first_sub_id + RNG_BLOCK_SIZE),
+                    self.subscription_starts[block].tolist(),
+                    self.subscription_finishes[block].tolist(),
+                    self.subscription_recorrency[block].tolist(),
+                    self.subscription_plan_ids[block].tolist()
                 )
-                
-                file.write(insert_statement)
+                for sub_id, date_start, date_finish, recorrency, plan_id in rows:
+                    status = 'active' if date_finish is None else 'disabled'
+                    writer.write_row((sub_id, date_start, date_finish, recorrency, status, plan_id))
     
     def generate_member_subscriptions(self):
         """Generate member_subscription relationships and write to file"""
-        with open(self.member_subscription_file, 'w') as file:
+        with self.context.open_sink(self.member_subscription_file, 'member_subscription', self.MEMBER_SUBSCRIPTION_COLUMNS) as writer:
             relationship_count = 0
+            offsets = self.subscription_offsets.tolist()
+            users = self.subscription_users
             
-            for subscription in self.subscriptions:
-                # Add the owner
-                owner_id = subscription['owner_id']
-                sub_id = subscription['sub_id']
-                
-                insert_statement = (
-                    f"INSERT INTO member_subscription (user_id, sub_id, role) VALUES ("
-                    f"{owner_id}, {sub_id}, 'owner');\n"
-                )
-                file.write(insert_statement)
-                relationship_count += 1
-                
-                # Add the members
-                for member_id in subscription['member_ids']:
-                    insert_statement = (
-                        f"INSERT INTO member_subscription (user_id, sub_id, role) VALUES ("
-                        f"{member_id}, {sub_id}, 'member');\n"
-                    )
-                    file.write(insert_statement)
-                    relationship_count += 1
+            for index in range(self.num_subscriptions):
+                # The first user of the group is the owner, the rest are members
+                sub_id = self.sub_offset + index + 1
+                group = users[offsets[index]:offsets[index + 1]].tolist()
+                writer.write_row((group[0], sub_id, 'owner'))
+                for member_id in group[1:]:
+                    writer.write_row((member_id, sub_id, 'member'))
+                relationship_count += len(group)
         
         print(f"Generated {relationship_count} member_subscription relationships")
     
+    @staticmethod
+    def charge_dates(months, billing_days):
+        """
+        Billing date of a cycle: the subscription's day of the month, or the
+        last day of the month when the month is shorter.
+        
+        Args:
+            months (numpy.ndarray): Months of the cycles, as datetime64[M]
+            billing_days (numpy.ndarray): Zero-based day of the month each subscription is billed on
+            
+        Returns:
+            numpy.ndarray: Charge dates, as datetime64[D]
+        """
+        first_days = months.astype('datetime64[D]')
+        month_lengths = ((months + 1).astype('datetime64[D]') - first_days).astype(numpy.int64)
+        return first_days + numpy.minimum(billing_days, month_lengths - 1)
+    
     def generate_orders(self):
-        """Generate order data and write to file"""
-        with open(self.orders_file, 'w') as file:
-            order_id = 1
+        """
+        Generate order data and write to file.
+        
+        Recurring subscriptions are charged every month from date_start until
+        date_finish, or today while active; other subscriptions are charged
+        once. Charges are worked out one calendar month at a time for all
+        subscriptions together and written in created_at order.
+        """
+        today = numpy.datetime64(self.context.today, 'D')
+        
+        # Only paid subscriptions whose owner has a payment method are billed
+        plan_prices = self.plan_prices()
+        owner_indexes = self.subscription_owners - self.user_offset
+        billed = (plan_prices[self.subscription_plan_ids] > 0) & (self.method_counts[owner_indexes] > 0)
+        owners = self.subscription_owners[billed]
+        owner_indexes = owner_indexes[billed]
+        plan_ids = self.subscription_plan_ids[billed]
+        
+        # Each subscription pays with one of its owner's payment methods
+        numbers = self.context.numpy_rng('order_methods', *self.stream_keys)
+        method_ids = self.method_first[owner_indexes] + numbers.integers(0, self.method_counts[owner_indexes])
+        
+        # Billing cycles run from the start month to the month of the end date
+        starts = self.subscription_starts[billed]
+        finishes = self.subscription_finishes[billed]
+        ends = numpy.where(numpy.isnat(finishes), today, finishes)
+        start_months = starts.astype('datetime64[M]')
+        end_months = ends.astype('datetime64[M]')
+        billing_days = (starts - start_months.astype('datetime64[D]')).astype(numpy.int64)
+        
+        num_charges = (end_months - start_months).astype(numpy.int64) + 1
+        num_charges -= self.charge_dates(end_months, billing_days) > ends
+        num_charges = numpy.where(self.subscription_recorrency[billed], num_charges, numpy.minimum(num_charges, 1))
+        num_charges = numpy.maximum(num_charges, 0)
+        
+        statuses = self.ORDER_STATUSES.values
+        # Transaction IDs start with the permuted order ID, which keeps them
+        # unique across months and across runs appending to a dataset
+        
+        with self.context.open_sink(self.orders_file, 'orders', self.ORDER_COLUMNS) as writer:
+            order_id = self.first_order_id
+            month = start_months.min() if len(start_months) else today.astype('datetime64[M]')
+            last_month = today.astype('datetime64[M]')
+            progress = self.context.progress("Orders", max(0, int((last_month - month).astype(int)) + 1), unit='months')
+            months_done = 0
             
-            for subscription in self.subscriptions:
-                # Skip free plans for orders
-                plan = next((p for p in self.plans_data if p['plan_id'] == subscription['plan_id']), None)
-                if plan['price'] == 0.00:
-                    continue
-                
-                owner_id = subscription['owner_id']
-                
-                # Find payment methods for this user
-                user_payment_methods = [pm for pm in self.payment_methods if pm['user_id'] == owner_id]
-                
-                # Skip if user has no payment method
-                if not user_payment_methods:
-                    continue
-                
-                # Select a payment method
-                payment_method = random.choice(user_payment_methods)
-                
-                # Calculate number of months since subscription started
-                start_date = subscription['date_start']
-                end_date = subscription['date_finish'] or datetime.datetime.now().date()
-                
-                # For each month of subscription, create an order
-                current_date = start_date
+            while month <= last_month:
+                cycles = (month - start_months).astype(numpy.int64)
+                due = numpy.flatnonzero((cycles >= 0) & (cycles < num_charges))
                 
-                # Limit the number of orders per subscription
-                max_orders_per_subscription = 6
-                order_count = 0
-                
-                # Generate orders until we reach end date or max limit
-                while current_date <= end_date and order_count < max_orders_per_subscription:
-                    # Order amount (plan price)
-                    amount = plan['price']
-                    
-                    # Order status (mostly completed, some pending/failed)
-                    status_weights = [0.03, 0.95, 0.015, 0.005]  # pending, completed, failed, refunded
-                    status = random.choices(['pending', 'completed', 'failed', 'refunded'], weights=status_weights)[0]
-                    
-                    # Transaction ID
-                    transaction_id = f"txn_{uuid.uuid4().hex[:24]}"
+                if len(due):
+                    # Every month has its own stream, so a month's orders do not depend on earlier months
+                    numbers = self.context.numpy_rng('orders', str(month), *self.stream_keys)
                     
-                    # Create timestamp (a random time on the current_date)
-                    hour = random.randint(0, 23)
-                    minute = random.randint(0, 59)
-                    second = random.randint(0, 59)
-                    timestamp = datetime.datetime.combine(
-                        current_date, 
-                        datetime.time(hour, minute, second)
+                    # A random time on the charge date
+                    created_at = (
+                        self.charge_dates(month, billing_days[due]).astype('datetime64[s]')
+                        + numbers.integers(0, 24 * 60 * 60, size=len(due))
                     )
+                    by_time = numpy.argsort(created_at, kind='stable')
+                    due = due[by_time]
+                    created_at = created_at[by_time]
                     
-                    # Order data
-                    order = {
-                        'order_id': order_id,
-                        'user_id': owner_id,
-                        'plan_id': subscription['plan_id'],
-                        'method_id': payment_method['method_id'],
-                        'amount': amount,
-                        'status': status,
-                        'transaction_id': transaction_id,
-                        'created_at': timestamp
-                    }
+                    status_choices = self.ORDER_STATUSES.draw_indices(numbers, len(due))
+                    tokens = TokenFactory(numbers, key=self.TRANSACTION_ID_KEY)
+                    transaction_ids = tokens.unique_hex(range(order_id, order_id + len(due)), 24)
                     
-                    insert_statement = (
-                        f"INSERT INTO orders (order_id, user_id, plan_id, method_id, "
-                        f"amount, status, transaction_id, created_at) VALUES ("
-                        f"{order_id}, {owner_id}, {subscription['plan_id']}, "
-                        f"{payment_method['method_id']}, {amount}, '{status}', '{transaction_id}', "
-                        f"'{timestamp}');\n"
+                    rows = zip(
+                        owners[due].tolist(),
+                        plan_ids[due].tolist(),
+                        method_ids[due].tolist(),
+                        plan_prices[plan_ids[due]].tolist(),
+                        status_choices.tolist(),
+                        created_at.tolist(),
+                        transaction_ids
                     )
-                    
-                    file.write(insert_statement)
-                    self.orders.append(order)
-                    order_id += 1
-                    order_count += 1
-                    
-                    # Move to next month using the safe method
-                    current_date = self.add_months(current_date, 1)
+                    for owner_id, plan_id, method_id, amount, status, timestamp, transaction_id in rows:
+                        writer.write_row((order_id, owner_id, plan_id, method_id, amount,
+                                          statuses[status], f"txn_{transaction_id}", timestamp))
+                        order_id += 1
+                
+                month += 1
+                months_done += 1
+                progress.update(months_done)
         
-        print(f"Generated {order_id - 1} orders")
+        print(f"Generated {order_id - self.first_order_id} orders")
     
     def run(self):
         """Execute the payment data generation process"""
@@ -421,17 +413,19 @@ class PaymentDataGenerator:
         print("PAYMENT DATA GENERATION")
         print(f"{'-'*50}")
         
-        # Generate data in the correct sequence
-        self.generate_plans()
-        
-        # First, assign users to subscription groups (this is the core logic change)
-        self.assign_users_to_subscriptions()
-        
-        # Then generate files in the correct order
-        self.generate_subscriptions_file()
-        self.generate_member_subscriptions()
-        self.generate_payment_methods()
-        self.generate_orders()
+        with self.context.profile('payments'):
+            # Generate data in the correct sequence
+            if self.include_plans:
+                self.generate_plans()
+            
+            # First, assign users to subscription groups (this is the core logic change)
+            self.assign_users_to_subscriptions()
+            
+            # Then generate files in the correct order
+            self.generate_subscriptions_file()
+            self.generate_member_subscriptions()
+            self.generate_payment_methods()
+            self.generate_orders()
         
         print(f"{'-'*50}")
         print("PAYMENT DATA GENERATION COMPLETE")
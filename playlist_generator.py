@@ -1,8 +1,12 @@
 # Current Date and Time (UTC): 2025-03-22 19:22:34
 # Current User's Login: eduardoconde-bit
 
-from faker import Faker
 import random
+from generator_context import get_context
+from sql_writer import format_insert_statement
+from weighted_sampler import AliasSampler
+from relationship_sampler import expand_sources
+from popularity_model import DEFAULT_SKEW
 
 class PlaylistGenerator:
     """
@@ -10,9 +14,15 @@ class PlaylistGenerator:
     Creates data for both playlists table and playlist_songs table.
     """
     
+    PLAYLIST_COLUMNS = ('name', 'user_id', 'visibility')
+    PLAYLIST_SONG_COLUMNS = ('playlist_id', 'song_id')
+    SONG_COUNT_CHOICES = AliasSampler((5, 10, 15, 20))
+    VISIBILITIES = AliasSampler(('public', 'private'))
+    
     def __init__(self, num_users=100, num_songs=33454, 
                  playlist_file='insert_playlist.txt', 
-                 playlist_songs_file='insert_playlist_songs.txt'):
+                 playlist_songs_file='insert_playlist_songs.txt', context=None,
+                 first_user_id=1, first_playlist_id=1, skew=DEFAULT_SKEW):
         """
         Initialize the PlaylistGenerator with configuration parameters.
         
@@ -21,113 +31,112 @@ class PlaylistGenerator:
             num_songs (int): Total number of songs available in the database
             playlist_file (str): File path to save playlist INSERT statements
             playlist_songs_file (str): File path to save playlist_songs INSERT statements
+            context (GeneratorContext, optional): Shared generator context
+            first_user_id (int): ID of the first user to generate playlists for
+            first_playlist_id (int): ID the database will give the first playlist (AUTO_INCREMENT)
+            skew (float): Zipf exponent of song popularity; 0 picks songs uniformly
         """
-        self.fake = Faker()
+        self.context = context or get_context()
+        self.fake = self.context.faker
+        # Random stream of the current block of users
+        self.rng = random
         self.num_users = num_users
+        self.first_user_id = first_user_id
         self.num_songs = num_songs
+        # Popular songs turn up in most playlists
+        self.popularity = self.context.popularity('songs', num_songs, skew)
         self.playlist_file = playlist_file
         self.playlist_songs_file = playlist_songs_file
-        self.playlist_count = 1  # Counter for playlist IDs
+        self.first_playlist_id = first_playlist_id
+        self.playlist_count = first_playlist_id  # Counter for playlist IDs
+        
+        # Sinks for both tables, open while generate_all_playlists runs
+        self.playlist_writer = None
+        self.playlist_song_writer = None
     
     def generate_playlist_name(self):
         """Generate a random playlist name based on colors or languages"""
-        return random.choice([self.fake.color_name(), self.fake.language_name()])
+        return self.rng.choice([self.fake.color_name(), self.fake.language_name()])
     
     def create_playlist_insert(self, name, user_id, visibility):
         """Create SQL INSERT statement for a playlist"""
-        return f"INSERT INTO playlists (name, user_id, visibility) VALUES ('{name}', {user_id}, '{visibility}');\n"
+        return format_insert_statement('playlists', self.PLAYLIST_COLUMNS, (name, user_id, visibility))
     
     def create_playlist_song_insert(self, playlist_id, song_id):
         """Create SQL INSERT statement for a playlist-song relationship"""
-        return f"INSERT INTO playlist_songs (playlist_id, song_id) VALUES ({playlist_id}, {song_id});\n"
+        return format_insert_statement('playlist_songs', self.PLAYLIST_SONG_COLUMNS, (playlist_id, song_id))
     
-    def generate_playlist_songs(self, playlist_id):
+    def generate_playlist_songs(self, playlist_ids, numbers):
         """
-        Generate a set of songs to be included in a playlist.
+        Generate the songs of a batch of playlists.
         
         Args:
-            playlist_id (int): The ID of the playlist
+            playlist_ids (range): IDs of the playlists
+            numbers (numpy.random.Generator): Random stream of the batch
             
         Returns:
-            set: A set of song IDs for this playlist
+            tuple: (playlist IDs, song IDs) arrays, one entry per playlist song
         """
-        # Determine number of songs in this playlist
-        num_playlist_songs = random.choice([5, 10, 15, 20])
-        
-        # Generate a set of unique song IDs
-        songs = set()
-        while len(songs) < num_playlist_songs:
-            songs.add(random.randint(1, self.num_songs))
-        
-        return songs
+        # Every playlist holds 5, 10, 15 or 20 distinct songs (fewer if there are fewer songs)
+        num_songs = self.SONG_COUNT_CHOICES.draw_many(numbers, len(playlist_ids))
+        num_songs, song_ids = self.popularity.sample(numbers, num_songs)
+        return expand_sources(playlist_ids, num_songs), song_ids
     
-    def generate_user_playlists(self, user_id):
+    def generate_block_playlists(self, user_ids, numbers):
         """
-        Generate playlists for a specific user.
+        Generate the playlists of a block of users and write them out.
         
         Args:
-            user_id (int): The ID of the user
+            user_ids (range): IDs of the users in the block
+            numbers (numpy.random.Generator): Random stream of the block
             
         Returns:
-            list: List of playlist IDs created for this user
+            range: IDs of the playlists created for the block
         """
-        # Determine number of playlists for this user (1 to 5)
-        num_playlists = random.randint(1, 5)
-        playlist_ids = []
+        # Every user has 1 to 5 playlists
+        num_playlists = numbers.integers(1, 6, size=len(user_ids))
+        owners = expand_sources(user_ids, num_playlists).tolist()
+        visibilities = self.VISIBILITIES.draw_indices(numbers, len(owners)).tolist()
+        playlist_ids = range(self.playlist_count, self.playlist_count + len(owners))
         
-        for _ in range(num_playlists):
-            # Generate playlist data
+        # Names are text, so they still come from Faker one at a time
+        for user_id, visibility in zip(owners, visibilities):
             name = self.generate_playlist_name()
-            visibility = random.choice(["public", "private"])
-            
-            # Record the current playlist ID
-            current_playlist_id = self.playlist_count
-            playlist_ids.append(current_playlist_id)
-            
-            # Create playlist INSERT statement
-            with open(self.playlist_file, 'a') as file:
-                insert_statement = self.create_playlist_insert(name, user_id, visibility)
-                file.write(insert_statement)
-            
-            # Generate songs for this playlist
-            songs = self.generate_playlist_songs(current_playlist_id)
-            
-            # Create playlist_songs INSERT statements
-            with open(self.playlist_songs_file, 'a') as file:
-                for song_id in songs:
-                    insert_statement = self.create_playlist_song_insert(current_playlist_id, song_id)
-                    file.write(insert_statement)
-            
-            # Increment playlist counter for next playlist
-            self.playlist_count += 1
+            self.playlist_writer.write_row((name, user_id, self.VISIBILITIES.values[visibility]))
         
+        playlists, song_ids = self.generate_playlist_songs(playlist_ids, numbers)
+        self.playlist_song_writer.write_columns(playlists, song_ids)
+        
+        self.playlist_count += len(owners)
         return playlist_ids
     
-    def initialize_files(self):
-        """Initialize output files by creating them empty"""
-        with open(self.playlist_file, 'w') as file:
-            pass
-        with open(self.playlist_songs_file, 'w') as file:
-            pass
-    
     def generate_all_playlists(self):
         """Generate playlists for all users"""
-        # Initialize files
-        self.initialize_files()
-        
-        # Generate playlists for each user
-        for user_id in range(1, self.num_users + 1):
-            playlist_ids = self.generate_user_playlists(user_id)
+        # Both sinks are opened once for the whole run
+        with self.context.open_sink(self.playlist_file, 'playlists', self.PLAYLIST_COLUMNS) as playlist_writer, \
+                self.context.open_sink(self.playlist_songs_file, 'playlist_songs',
+                                       self.PLAYLIST_SONG_COLUMNS) as playlist_song_writer:
+            self.playlist_writer = playlist_writer
+            self.playlist_song_writer = playlist_song_writer
             
-            # Print progress periodically
-            if user_id % 10 == 0 or user_id == self.num_users:
-                print(f"Generated playlists for {user_id}/{self.num_users} users...")
+            # Generate playlists for each block of users, with its own random streams
+            last_user_id = self.first_user_id + self.num_users - 1
+            progress = self.context.progress("Playlists", self.num_users, unit='users')
+            for user_ids, rng in self.context.iter_blocks('playlists', self.first_user_id, last_user_id):
+                # Playlist names draw from the block's own stream
+                self.rng = rng
+                numbers = self.context.block_numpy_rng('playlists', user_ids.start)
+                self.generate_block_playlists(user_ids, numbers)
+                
+                # Print progress periodically
+                progress.update(user_ids.stop - self.first_user_id)
     
     def run(self):
         """Execute the playlist generation process"""
         print(f"Starting playlist generation for {self.num_users} users...")
-        self.generate_all_playlists()
-        print(f"Completed! Generated {self.playlist_count - 1} playlists.")
+        with self.context.profile('playlists'):
+            self.generate_all_playlists()
+        print(f"Completed! Generated {self.playlist_count - self.first_playlist_id} playlists.")
         print(f"Playlist data saved to '{self.playlist_file}'")
         print(f"Playlist-song relationships saved to '{self.playlist_songs_file}'")
 
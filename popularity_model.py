@@ -0,0 +1,159 @@
+import numpy
+from unique_identity import FeistelPermutation
+from relationship_sampler import sample_without_replacement, sample_weighted_without_replacement
+
+# Zipf exponent used when none is configured; 0 makes every ID equally popular
+DEFAULT_SKEW = 1.0
+
+# Standard deviation of the log of the noise around drawn amounts
+DEFAULT_SPREAD = 0.5
+
+
+class PopularityModel:
+    """
+    Zipf-like popularity of a population of IDs, such as artists or songs.
+
+    Every ID gets a popularity rank from a keyed FeistelPermutation, so
+    popularity does not follow ID order, and the ID of rank r scores
+    r ** -skew. The ranks depend only on the key, so every relationship
+    drawing from the same population agrees on which IDs are popular; the
+    skew only sets how steeply popularity falls off.
+
+    Nothing is stored per ID: ranks and scores are computed for the IDs
+    asked about, and draws pick Zipf ranks by rejection-inversion
+    (Hörmann and Derflinger), then map them back to IDs through the
+    inverse permutation. The model takes the same small memory and set-up
+    time for a thousand IDs as for millions. A skew of 0 draws uniformly.
+    """
+
+    def __init__(self, key, population, skew=DEFAULT_SKEW):
+        """
+        Initialize the PopularityModel.
+
+        Args:
+            key (int): Seed of the permutation the IDs are ranked with
+            population (int): Number of IDs, which run from 1 to population
+            skew (float): Zipf exponent; 0 makes every ID equally popular
+
+        Raises:
+            ValueError: If skew is negative
+        """
+        if skew < 0:
+            raise ValueError(f"Popularity skew must not be negative, got {skew}")
+        self.population = population
+        self.skew = skew
+        # Maps the index of an ID, from 0, to its rank minus 1
+        self.permutation = FeistelPermutation(population, key)
+        if skew > 0:
+            # Constants of the rejection-inversion sampler
+            self._h_integral_first = self._h_integral(1.5) - 1.0
+            self._h_integral_last = self._h_integral(population + 0.5)
+            self._squeeze = 2.0 - self._h_integral_inverse(self._h_integral(2.5) - self._h(2.0))
+
+    def __len__(self):
+        return self.population
+
+    def rank(self, ids):
+        """Popularity rank of every ID, 1 being the most popular"""
+        indices = numpy.asarray(ids, dtype=numpy.int64) - 1
+        return self.permutation.permute_many(indices).astype(numpy.int64) + 1
+
+    def score(self, ids):
+        """Score of every ID: its rank to the power -skew, 1 for the most popular"""
+        return self.rank(ids).astype(numpy.float64) ** -self.skew
+
+    def draw_indices(self, numbers, size):
+        """
+        Draw the indices of many IDs at once, in proportion to their scores.
+
+        Args:
+            numbers (numpy.random.Generator): Stream to draw from
+            size (int or tuple): Number of draws, or shape of the array of draws
+
+        Returns:
+            numpy.ndarray: Indices of the IDs, from 0 to population - 1
+        """
+        if self.skew == 0:
+            return numbers.integers(0, self.population, size=size)
+        ranks = self._draw_ranks(numbers, int(numpy.prod(size)))
+        indices = self.permutation.invert_many(ranks - 1).astype(numpy.int64)
+        return indices.reshape(size)
+
+    def _draw_ranks(self, numbers, count):
+        # Rejection-inversion: invert the integral of x ** -skew, round to the
+        # nearest rank and redraw only the ranks that fail the acceptance test
+        ranks = numpy.empty(count, dtype=numpy.int64)
+        pending = numpy.arange(count)
+        while len(pending):
+            u = self._h_integral_last + numbers.random(len(pending)) * (self._h_integral_first - self._h_integral_last)
+            x = self._h_integral_inverse(u)
+            k = numpy.clip(numpy.floor(x + 0.5), 1, self.population)
+            accepted = (k - x <= self._squeeze) | (u >= self._h_integral(k + 0.5) - self._h(k))
+            ranks[pending[accepted]] = k[accepted]
+            pending = pending[~accepted]
+        return ranks
+
+    def _h(self, x):
+        return numpy.exp(-self.skew * numpy.log(x))
+
+    def _h_integral(self, x):
+        log_x = numpy.log(x)
+        return _expm1_ratio((1.0 - self.skew) * log_x) * log_x
+
+    def _h_integral_inverse(self, x):
+        t = numpy.maximum(x * (1.0 - self.skew), -1.0)
+        return numpy.exp(_log1p_ratio(t) * x)
+
+    def sample(self, numbers, counts):
+        """
+        Draw, for many rows at once, a set of distinct IDs per row, popular IDs first.
+
+        Args:
+            numbers (numpy.random.Generator): Stream to draw from
+            counts (numpy.ndarray): Number of IDs wanted by each row
+
+        Returns:
+            tuple: (actual counts, flat array of IDs grouped by row, in row order)
+        """
+        if self.skew == 0:
+            return sample_without_replacement(numbers, counts, self.population)
+        return sample_weighted_without_replacement(numbers, counts, self)
+
+    def draw_amounts(self, numbers, ids, maximum, baseline=0, spread=DEFAULT_SPREAD):
+        """
+        Draw a quantity per ID around its popularity, e.g. streams per song.
+
+        Each ID expects baseline plus maximum times its score. The draw
+        multiplies that by lognormal noise with mean 1 and then takes a
+        Poisson count, so IDs of nearby ranks get different values while
+        the skew of the expectations stays the same.
+
+        Args:
+            numbers (numpy.random.Generator): Stream to draw from
+            ids (sequence): IDs to draw for
+            maximum (int): Expectation of the most popular ID, above the baseline
+            baseline (int): Expectation shared by every ID, however unpopular
+            spread (float): Standard deviation of the log of the noise; 0 leaves only the Poisson draw
+
+        Returns:
+            numpy.ndarray: One count per ID
+        """
+        expected = baseline + maximum * self.score(ids)
+        noise = numbers.lognormal(-spread * spread / 2, spread, size=len(expected))
+        return numbers.poisson(expected * noise)
+
+
+def _log1p_ratio(t):
+    # log(1 + t) / t, continuous at t = 0
+    t = numpy.asarray(t, dtype=numpy.float64)
+    small = numpy.abs(t) < 1e-8
+    safe = numpy.where(small, 1.0, t)
+    return numpy.where(small, 1.0 - t / 2.0 + t * t / 3.0, numpy.log1p(safe) / safe)
+
+
+def _expm1_ratio(t):
+    # (exp(t) - 1) / t, continuous at t = 0
+    t = numpy.asarray(t, dtype=numpy.float64)
+    small = numpy.abs(t) < 1e-8
+    safe = numpy.where(small, 1.0, t)
+    return numpy.where(small, 1.0 + t / 2.0 + t * t / 6.0, numpy.expm1(safe) / safe)
@@ -0,0 +1,178 @@
+import numpy
+from weighted_sampler import AliasSampler
+
+# Redraws of repeated IDs before sample_weighted_without_replacement gives up on them
+MAX_REJECTION_ROUNDS = 64
+
+def sample_without_replacement(numbers, counts, population, first_id=1):
+    """
+    Draw, for many rows at once, a set of distinct IDs per row.
+
+    Uses Floyd's algorithm, vectorised over every row that wants the same
+    number of IDs: step i draws t from [0, population - k + i] and keeps it
+    unless the row already holds it, in which case it keeps the upper bound
+    instead. Each row's IDs are a uniform sample without replacement, with
+    a fixed k draws per row however close k is to the population size.
+
+    Args:
+        numbers (numpy.random.Generator): Stream to draw from
+        counts (numpy.ndarray): Number of IDs wanted by each row; counts above
+            the population size are capped at it
+        population (int): Number of IDs to pick from
+        first_id (int): Smallest ID
+
+    Returns:
+        tuple: (capped counts, flat array of IDs grouped by row, in row order)
+    """
+    counts = numpy.minimum(numpy.asarray(counts, dtype=numpy.int64), max(population, 0))
+    ends = numpy.cumsum(counts)
+    starts = ends - counts
+    ids = numpy.empty(int(ends[-1]) if len(ends) else 0, dtype=numpy.int64)
+
+    for k in numpy.unique(counts):
+        k = int(k)
+        if k == 0:
+            continue
+        rows = numpy.flatnonzero(counts == k)
+        chosen = numpy.empty((len(rows), k), dtype=numpy.int64)
+        for i in range(k):
+            upper = population - k + i
+            draws = numbers.integers(0, upper + 1, size=len(rows))
+            taken = (chosen[:, :i] == draws[:, None]).any(axis=1)
+            chosen[:, i] = numpy.where(taken, upper, draws)
+        ids[starts[rows][:, None] + numpy.arange(k)] = chosen + first_id
+
+    return counts, ids
+
+def _repeated_ids(chosen):
+    # Flag every ID that already appears earlier in its row. Sorting each row
+    # puts the copies next to each other; the first one is kept.
+    order = numpy.argsort(chosen, axis=1, kind='stable')
+    ordered = numpy.take_along_axis(chosen, order, axis=1)
+    repeated = numpy.zeros(chosen.shape, dtype=bool)
+    repeated[:, 1:] = ordered[:, 1:] == ordered[:, :-1]
+    flags = numpy.zeros(chosen.shape, dtype=bool)
+    numpy.put_along_axis(flags, order, repeated, axis=1)
+    return flags
+
+def sample_weighted_without_replacement(numbers, counts, sampler, first_id=1, max_rounds=MAX_REJECTION_ROUNDS):
+    """
+    Draw, for many rows at once, a set of distinct weighted IDs per row.
+
+    Every row that wants the same number of IDs draws them all from the
+    sampler in one batch; IDs a row already holds are then redrawn, for the
+    whole batch at once, until no row holds an ID twice. Rows wanting most
+    of a heavily skewed population could take many rounds, so after
+    max_rounds their remaining duplicates are dropped and they end up with
+    fewer IDs.
+
+    Args:
+        numbers (numpy.random.Generator): Stream to draw from
+        counts (numpy.ndarray): Number of IDs wanted by each row; counts above
+            the population size are capped at it
+        sampler (AliasSampler or PopularityModel): Distribution over the indices 0 to population - 1
+        first_id (int): ID of index 0
+        max_rounds (int): Redraws before duplicates are dropped
+
+    Returns:
+        tuple: (actual counts, flat array of IDs grouped by row, in row order)
+    """
+    counts = numpy.minimum(numpy.asarray(counts, dtype=numpy.int64), len(sampler))
+    batches = []
+
+    for k in numpy.unique(counts):
+        k = int(k)
+        if k == 0:
+            continue
+        rows = numpy.flatnonzero(counts == k)
+        chosen = sampler.draw_indices(numbers, (len(rows), k))
+        # Only rows that held a repeated ID in the last round are checked again
+        pending = numpy.arange(len(rows))
+        duplicates = numpy.zeros(chosen.shape, dtype=bool)
+        for round_index in range(max_rounds + 1):
+            repeated = _repeated_ids(chosen[pending])
+            has_repeats = repeated.any(axis=1)
+            pending, repeated = pending[has_repeats], repeated[has_repeats]
+            if len(pending) == 0:
+                break
+            if round_index == max_rounds:
+                duplicates[pending] = repeated
+                break
+            redrawn = chosen[pending]
+            redrawn[repeated] = sampler.draw_indices(numbers, int(repeated.sum()))
+            chosen[pending] = redrawn
+        counts[rows] = k - duplicates.sum(axis=1)
+        batches.append((rows, chosen, duplicates))
+
+    ends = numpy.cumsum(counts)
+    starts = ends - counts
+    ids = numpy.empty(int(ends[-1]) if len(ends) else 0, dtype=numpy.int64)
+    for rows, chosen, duplicates in batches:
+        k = chosen.shape[1]
+        if not duplicates.any():
+            ids[starts[rows][:, None] + numpy.arange(k)] = chosen + first_id
+            continue
+        # Rows that gave up keep their distinct IDs, in draw order
+        kept = ~duplicates
+        positions = starts[rows][:, None] + numpy.cumsum(kept, axis=1) - 1
+        ids[positions[kept]] = chosen[kept] + first_id
+
+    return counts, ids
+
+def expand_sources(source_ids, counts):
+    """
+    Repeat each source ID once per edge, to pair with sample_without_replacement's IDs.
+
+    Args:
+        source_ids (range or numpy.ndarray): ID of every row
+        counts (numpy.ndarray): Number of edges of every row
+
+    Returns:
+        numpy.ndarray: Source ID of every edge
+    """
+    return numpy.repeat(numpy.asarray(source_ids, dtype=numpy.int64), counts)
+
+def partition_population(numbers, population, group_sizes, weights, fallback=0):
+    """
+    Split a shuffled population into consecutive groups of randomly chosen kinds.
+
+    The kinds of all groups are drawn in one batch and the group boundaries
+    come from a cumulative sum of their sizes. A group bigger than the members
+    left over at the end becomes the fallback kind instead, so every member
+    ends up in exactly one group.
+
+    Args:
+        numbers (numpy.random.Generator): Stream to draw from
+        population (int): Number of members, with IDs 1 to population
+        group_sizes (sequence): Members per group of each kind
+        weights (sequence): Relative weight of each kind
+        fallback (int): Kind given to groups that do not fit; its size must be 1
+
+    Returns:
+        tuple: (kind of every group, shuffled member IDs, group offsets);
+            group g holds members[offsets[g]:offsets[g + 1]]
+    """
+    members = numbers.permutation(population) + 1
+    sizes_by_kind = numpy.asarray(group_sizes, dtype=numpy.int64)
+
+    # Every group holds at least one member, so one draw per member is enough
+    kinds = AliasSampler(range(len(sizes_by_kind)), weights).draw_indices(numbers, population)
+    sizes = sizes_by_kind[kinds]
+    ends = numpy.cumsum(sizes)
+
+    # Groups up to the first one reaching the population size fit as drawn
+    count = int(numpy.searchsorted(ends, population))
+    if count < population and ends[count] == population:
+        count += 1
+    elif count < population:
+        start = int(ends[count - 1]) if count else 0
+        while start < population:
+            if sizes[count] > population - start:
+                kinds[count] = fallback
+                sizes[count] = sizes_by_kind[fallback]
+            start += int(sizes[count])
+            count += 1
+
+    offsets = numpy.zeros(count + 1, dtype=numpy.int64)
+    numpy.cumsum(sizes[:count], out=offsets[1:])
+    return kinds[:count], members, offsets
@@ -0,0 +1,104 @@
+import os
+import json
+import hashlib
+from output_sinks import file_checksum
+
+# Name of the manifest file in the output directory
+MANIFEST_NAME = 'run_manifest.json'
+
+def settings_fingerprint(settings):
+    """
+    Hash the settings a stage's output depends on.
+
+    Args:
+        settings (dict): JSON-serialisable settings
+
+    Returns:
+        str: Hex digest, equal for equal settings whatever their key order
+    """
+    text = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class RunManifest:
+    """
+    Record of the completed stages of a generation run.
+
+    Every stage entry holds the settings the stage ran with and their
+    fingerprint, the rows written to each table and the checksum of each
+    output file. The manifest is rewritten after every stage, so a run that
+    dies part way still records everything it finished.
+    """
+
+    def __init__(self, directory, name=MANIFEST_NAME):
+        """
+        Initialize the RunManifest, loading the existing manifest if there is one.
+
+        Args:
+            directory (str): Output directory of the run
+            name (str): Name of the manifest file
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, name)
+        self.stages = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.stages = json.load(file).get('stages', {})
+
+    def completed_stage(self, name, fingerprint, verify_checksums=True):
+        """
+        Look up a stage that completed with the same settings.
+
+        Args:
+            name (str): Stage name
+            fingerprint (str): Fingerprint of the stage's current settings
+            verify_checksums (bool): Also re-hash the stage's files; otherwise
+                they only have to exist
+
+        Returns:
+            dict: The stage entry, or None if the stage has to run again
+        """
+        entry = self.stages.get(name)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return None
+        for filename, checksum in entry['files'].items():
+            path = os.path.join(self.directory, filename)
+            if not os.path.exists(path):
+                return None
+            if verify_checksums and file_checksum(path) != checksum:
+                return None
+        return entry
+
+    def record_stage(self, name, fingerprint, settings, rows, files):
+        """
+        Record a completed stage and save the manifest.
+
+        Args:
+            name (str): Stage name
+            fingerprint (str): Fingerprint of settings
+            settings (dict): Settings the stage ran with
+            rows (dict): Rows written to each table
+            files (dict): SHA-256 checksum of each output file, by file name
+        """
+        self.stages[name] = {
+            'fingerprint': fingerprint,
+            'settings': settings,
+            'rows': rows,
+            'files': files,
+        }
+        self.save()
+
+    def save(self):
+        """Write the manifest, replacing the previous one atomically"""
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump({'stages': self.stages}, file, indent=2, sort_keys=True, default=str)
+            file.write("\n")
+        os.replace(temporary_path, self.path)
+
+    def checksums(self):
+        """SHA-256 checksum of every recorded output file, by file name"""
+        checksums = {}
+        for entry in self.stages.values():
+            checksums.update(entry['files'])
+        return checksums
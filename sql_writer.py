@@ -0,0 +1,214 @@
+import datetime
+from decimal import Decimal
+
+# Rows per INSERT statement
+DEFAULT_BATCH_SIZE = 1000
+
+# Byte budget per statement, kept well below MariaDB's default max_allowed_packet (16 MB)
+DEFAULT_MAX_STATEMENT_BYTES = 1024 * 1024
+
+# Characters that must be escaped inside a MariaDB string literal
+_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    "'": "\\'",
+    '\n': '\\n',
+    '\r': '\\r',
+    '\0': '\\0',
+    '\x1a': '\\Z',
+})
+
+def sql_literal(value):
+    """
+    Convert a Python value into a MariaDB literal.
+
+    Args:
+        value: None, bool, number, date/datetime or string
+
+    Returns:
+        str: SQL literal for the value
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return f"'{value}'"
+    return "'" + str(value).translate(_ESCAPES) + "'"
+
+def format_insert_statement(table, columns, values):
+    """
+    Create a single-row SQL INSERT statement.
+
+    Args:
+        table (str): Target table name
+        columns (tuple): Column names
+        values (tuple): Values in the same order as columns
+
+    Returns:
+        str: SQL INSERT statement
+    """
+    row = ", ".join(sql_literal(value) for value in values)
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({row});\n"
+
+
+class InsertOptions:
+    """Settings controlling how INSERT scripts are written"""
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, max_statement_bytes=DEFAULT_MAX_STATEMENT_BYTES,
+                 use_transaction=True, disable_foreign_key_checks=False):
+        """
+        Initialize the InsertOptions.
+
+        Args:
+            batch_size (int): Maximum number of rows per INSERT statement (1 disables batching)
+            max_statement_bytes (int): Maximum size of a single INSERT statement in bytes
+            use_transaction (bool): Wrap each file in START TRANSACTION / COMMIT
+            disable_foreign_key_checks (bool): Turn off foreign key checks while the file loads
+        """
+        self.batch_size = max(1, batch_size)
+        self.max_statement_bytes = max_statement_bytes
+        self.use_transaction = use_transaction
+        self.disable_foreign_key_checks = disable_foreign_key_checks
+
+    def file_header(self):
+        """Statements written at the start of every INSERT script"""
+        header = ""
+        if self.disable_foreign_key_checks:
+            header += "SET foreign_key_checks=0;\n"
+        if self.use_transaction:
+            header += "START TRANSACTION;\n"
+        return header
+
+    def file_footer(self):
+        """Statements written at the end of every INSERT script"""
+        footer = ""
+        if self.use_transaction:
+            footer += "COMMIT;\n"
+        if self.disable_foreign_key_checks:
+            footer += "SET foreign_key_checks=1;\n"
+        return footer
+
+
+class BatchedInsertWriter:
+    """
+    Groups rows into multi-row INSERT statements:
+
+        INSERT INTO table (cols) VALUES (...),
+        (...),
+        (...);
+
+    A statement is emitted once it holds batch_size rows or the next row
+    would push it over max_statement_bytes. Each row stays on its own line.
+    """
+
+    def __init__(self, file, table, columns, options=None):
+        """
+        Initialize the BatchedInsertWriter.
+
+        Args:
+            file: Open text file the statements are written to
+            table (str): Target table name
+            columns (tuple): Column names, in the order rows are given
+            options (InsertOptions, optional): Batching settings
+        """
+        self.file = file
+        self.table = table
+        self.columns = columns
+        self.options = options or InsertOptions()
+        self.prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        self.prefix_bytes = len(self.prefix.encode('utf-8'))
+        self.pending = []
+        self.pending_bytes = 0
+        self.rows_written = 0
+
+    def format_row(self, values):
+        """
+        Format a row as a parenthesised list of SQL literals.
+
+        Args:
+            values (tuple): Values in the same order as the writer's columns
+
+        Returns:
+            str: The formatted row
+        """
+        return "(" + ", ".join(sql_literal(value) for value in values) + ")"
+
+    def write_row(self, values):
+        """
+        Add a row to the current statement, emitting it first if it is full.
+
+        Args:
+            values (tuple): Values in the same order as the writer's columns
+        """
+        self.write_formatted_row(self.format_row(values))
+
+    def write_formatted_row(self, row):
+        """
+        Add a row that is already formatted by format_row.
+
+        Args:
+            row (str): Formatted row
+        """
+        row_bytes = len(row) if row.isascii() else len(row.encode('utf-8'))
+        # ",\n" separator, or ";\n" terminator for the last row
+        row_bytes += 2
+
+        if self.pending and (
+            len(self.pending) >= self.options.batch_size
+            or self.prefix_bytes + self.pending_bytes + row_bytes > self.options.max_statement_bytes
+        ):
+            self.flush()
+
+        self.pending.append(row)
+        self.pending_bytes += row_bytes
+
+    def write_formatted_rows(self, rows):
+        """
+        Add many formatted rows; same result as write_formatted_row on each.
+
+        Args:
+            rows (iterable): Formatted rows
+        """
+        batch_size = self.options.batch_size
+        # Room left for rows once the INSERT prefix is counted
+        max_bytes = self.options.max_statement_bytes - self.prefix_bytes
+        pending = self.pending
+        pending_bytes = self.pending_bytes
+        
+        for row in rows:
+            row_bytes = (len(row) if row.isascii() else len(row.encode('utf-8'))) + 2
+            if pending and (len(pending) >= batch_size or pending_bytes + row_bytes > max_bytes):
+                self.pending_bytes = pending_bytes
+                self.flush()
+                pending = self.pending
+                pending_bytes = 0
+            pending.append(row)
+            pending_bytes += row_bytes
+        
+        self.pending_bytes = pending_bytes
+
+    def write_rows(self, rows):
+        """Add several rows to the writer"""
+        for values in rows:
+            self.write_row(values)
+
+    def flush(self):
+        """Write the pending rows as a single INSERT statement"""
+        if not self.pending:
+            return
+
+        self.file.write(self.prefix + ",\n".join(self.pending) + ";\n")
+        self.rows_written += len(self.pending)
+        self.pending = []
+        self.pending_bytes = 0
+
+    def write_header(self):
+        """Write the transaction / foreign key preamble"""
+        self.file.write(self.options.file_header())
+
+    def write_footer(self):
+        """Flush pending rows and write the closing statements"""
+        self.flush()
+        self.file.write(self.options.file_footer())
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import resource
+
+# Seconds between two progress lines of the same loop
+DEFAULT_PROGRESS_INTERVAL = 5.0
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def current_rss_mb():
+    """Current resident set size of this process in MB, or None where /proc is missing"""
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class ProgressReporter:
+    """
+    Prints the progress of a long loop at most once per interval.
+
+    Printing from a hot loop costs a measurable share of the run time at
+    millions of rows, so updates in between are only counted. The final
+    update, with done equal to total, is always printed.
+    """
+
+    def __init__(self, label, total, unit='rows', interval=DEFAULT_PROGRESS_INTERVAL, clock=time.monotonic):
+        """
+        Initialize the ProgressReporter.
+
+        Args:
+            label (str): What is being generated, e.g. 'Users'
+            total (int): Units the loop will process
+            unit (str): Name of the units
+            interval (float): Minimum seconds between two printed lines; 0 prints every update
+            clock (callable): Time source, in seconds
+        """
+        self.label = label
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.clock = clock
+        self.started = clock()
+        self.last_printed = self.started
+        self.done = 0
+
+    def update(self, done):
+        """
+        Record progress, printing it if the interval has passed.
+
+        Args:
+            done (int): Units processed so far
+        """
+        self.done = done
+        now = self.clock()
+        if done < self.total and now - self.last_printed < self.interval:
+            return
+        self.last_printed = now
+        elapsed = now - self.started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        percent = 100.0 * done / self.total if self.total else 100.0
+        print(f"{self.label}: {done:,}/{self.total:,} {self.unit} ({percent:.0f}%), "
+              f"{rate:,.0f} {self.unit}/s")
+
+
+class StageMetrics:
+    """Rows, bytes, time and memory of a single stage run"""
+
+    def __init__(self, name):
+        """
+        Initialize the StageMetrics and start its clock.
+
+        Args:
+            name (str): Stage name
+        """
+        self.name = name
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.rows = {}
+        self.bytes_written = 0
+        self.peak_rss_mb = 0.0
+        self.rss_mb = None
+
+    def finish(self, rows, bytes_written):
+        """
+        Stop the clock and record the stage's output.
+
+        Args:
+            rows (dict): Rows written to each table
+            bytes_written (int): Bytes of the stage's output files
+        """
+        self.elapsed = time.perf_counter() - self.started
+        self.rows = dict(rows)
+        self.bytes_written = bytes_written
+        self.peak_rss_mb = peak_rss_mb()
+        self.rss_mb = current_rss_mb()
+
+    def to_dict(self):
+        """Metrics as a JSON-serialisable dict"""
+        total_rows = sum(self.rows.values())
+        return {
+            'rows': self.rows,
+            'total_rows': total_rows,
+            'bytes': self.bytes_written,
+            'elapsed_seconds': round(self.elapsed, 4),
+            'rows_per_second': round(total_rows / self.elapsed, 1) if self.elapsed else 0.0,
+            'bytes_per_second': round(self.bytes_written / self.elapsed, 1) if self.elapsed else 0.0,
+            'peak_rss_mb': round(self.peak_rss_mb, 1),
+            'rss_mb': round(self.rss_mb, 1) if self.rss_mb is not None else None,
+        }
+
+def print_metrics(stages):
+    """
+    Print one line of metrics per stage.
+
+    Args:
+        stages (dict): Metrics dicts (StageMetrics.to_dict) by stage name; None for skipped stages
+    """
+    print("Stage metrics:")
+    for name, metrics in stages.items():
+        if metrics is None:
+            print(f"  - {name:<15} skipped")
+            continue
+        print(f"  - {name:<15} {metrics['total_rows']:>12,} rows  {metrics['bytes'] / 1e6:9.1f} MB  "
+              f"{metrics['elapsed_seconds']:8.2f} s  {metrics['rows_per_second']:>12,.0f} rows/s  "
+              f"{metrics['peak_rss_mb']:7.1f} MB peak RSS")
+
+def write_metrics(directory, run, stages, metrics_name='metrics.json'):
+    """
+    Write the metrics of a generation run as JSON.
+
+    Args:
+        directory (str): Output directory of the run
+        run (dict): Run-wide values (wall time, workers, critical path, ...)
+        stages (dict): Metrics dicts by stage name; None for skipped stages
+        metrics_name (str): Name of the metrics file
+
+    Returns:
+        str: Path of the metrics file
+    """
+    metrics_path = os.path.join(directory, metrics_name)
+    with open(metrics_path, 'w', encoding='utf-8') as file:
+        json.dump({'run': run, 'stages': stages}, file, indent=2, default=str)
+        file.write("\n")
+    return metrics_path
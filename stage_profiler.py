@@ -0,0 +1,253 @@
+import io
+import os
+import sys
+import time
+import marshal
+import pstats
+import cProfile
+import threading
+from collections import Counter
+
+# Values accepted for the profile setting
+PROFILE_MODES = ('cprofile', 'sampling')
+
+# Seconds between two stack samples of the sampling profiler
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Functions listed in a profile summary
+DEFAULT_TOP_N = 20
+
+def frame_key(code):
+    """Function of a frame as pstats identifies it: (file name, first line, function name)"""
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+def frame_label(key):
+    """Name of a function in collapsed stacks and summaries, e.g. generate_user (user_generator.py:41)"""
+    filename, line, name = key
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class SamplingProfiler:
+    """
+    Samples the call stack of one thread from a background thread.
+
+    Unlike cProfile it adds no cost to every call, so hot loops of small
+    calls (Faker providers, string formatting) keep their real proportions.
+    Samples are stacks of frame_key tuples, root first, counted by occurrence.
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        """
+        Initialize the SamplingProfiler.
+
+        Args:
+            interval (float): Seconds between two samples
+        """
+        self.interval = interval
+        self.samples = Counter()
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.thread_id = None
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def start(self):
+        """Start sampling the calling thread"""
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.stopped.clear()
+        self.sampler = threading.Thread(target=self._sample, name='stack-sampler', daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        """Stop sampling"""
+        self.stopped.set()
+        self.sampler.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def sample_seconds(self):
+        """
+        Seconds each sample stands for.
+
+        Walking the stack takes time of its own, and more so under
+        cProfile, so samples come less often than interval asks for; the
+        achieved spacing is used to turn samples into times.
+        """
+        total = sum(self.samples.values())
+        return self.elapsed / total if total and self.elapsed else self.interval
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_key(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def write_collapsed(self, path):
+        """
+        Write the samples as collapsed stacks, one 'root;...;leaf count' line per stack.
+
+        flamegraph.pl, speedscope and inferno read this format.
+        """
+        with open(path, 'w', encoding='utf-8') as file:
+            lines = sorted(";".join(map(frame_label, stack)) + f" {count}\n"
+                           for stack, count in self.samples.items())
+            file.writelines(lines)
+
+    def write_pstats(self, path):
+        """
+        Write the samples as a pstats file, readable by pstats.Stats and snakeviz.
+
+        Times are samples multiplied by sample_seconds, and call counts are
+        sample counts: a sampler sees where time goes, not how often
+        functions are called.
+        """
+        own = Counter()
+        inclusive = Counter()
+        edges = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            for key in set(stack):
+                inclusive[key] += count
+            for edge in set(zip(stack, stack[1:])):
+                edges[edge] += count
+
+        seconds = self.sample_seconds
+        callers = {key: {} for key in inclusive}
+        for (caller, callee), count in edges.items():
+            callers[callee][caller] = (count, count, 0.0, count * seconds)
+        stats = {
+            key: (count, count, own[key] * seconds, count * seconds, callers[key])
+            for key, count in inclusive.items()
+        }
+        with open(path, 'wb') as file:
+            marshal.dump(stats, file)
+
+    def summary(self, top_n=DEFAULT_TOP_N):
+        """
+        Hot functions by samples spent in them (self) and under them (total).
+
+        Returns:
+            str: Text table
+        """
+        total = sum(self.samples.values())
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in self.samples.items():
+            own[frame_label(stack[-1])] += count
+            for label in set(map(frame_label, stack)):
+                inclusive[label] += count
+
+        lines = [f"{total} samples, one every {self.sample_seconds * 1000:.1f} ms "
+                 f"({self.interval * 1000:.1f} ms requested)", ""]
+        for title, counts in (("Self", own), ("Total (including callees)", inclusive)):
+            lines.append(f"{title}:")
+            for label, count in counts.most_common(top_n):
+                lines.append(f"  {100.0 * count / total if total else 0.0:6.2f}%  {count:>8}  {label}")
+            lines.append("")
+        return "\n".join(lines)
+
+
+class StageProfiler:
+    """
+    Profiles a block of code and writes the results to a directory.
+
+    As a context manager it profiles its body and, on exit, writes
+    profile_<name>.pstats, profile_<name>.collapsed (collapsed stacks for
+    flame graphs) and a profile_<name>.txt summary of the top functions,
+    and prints the first lines of the summary.
+
+    In 'cprofile' mode cProfile records the .pstats file and the
+    SamplingProfiler runs alongside it for the collapsed stacks. Those
+    stacks then include cProfile's own per-call overhead, which inflates
+    functions making many small calls, and samples come less often than
+    the interval asks for; use 'sampling' mode for a faithful flame graph.
+    In 'sampling' mode only the sampler runs, and the .pstats file is
+    built from its samples.
+
+    Only the process that enters it is profiled; catalog shards generated
+    in worker processes show up as time spent waiting for them.
+    """
+
+    def __init__(self, name, directory, mode='cprofile', top_n=DEFAULT_TOP_N,
+                 interval=DEFAULT_SAMPLE_INTERVAL):
+        """
+        Initialize the StageProfiler.
+
+        Args:
+            name (str): Stage or generator name, used in the file names
+            directory (str): Directory the profiles are written to
+            mode (str): 'cprofile' or 'sampling'
+            top_n (int): Functions listed in the summary
+            interval (float): Seconds between two stack samples, in either mode
+
+        Raises:
+            ValueError: If the mode is unknown
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'")
+        self.name = name
+        self.directory = directory
+        self.mode = mode
+        self.top_n = top_n
+        self.interval = interval
+        self.profiler = None
+        self.sampler = None
+        self.started = 0.0
+        self.paths = []
+
+    def path(self, extension):
+        """Path of one of the profile files"""
+        return os.path.join(self.directory, f"profile_{self.name}.{extension}")
+
+    def __enter__(self):
+        self.sampler = SamplingProfiler(self.interval)
+        if self.mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.sampler.start()
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.sampler.stop()
+        elapsed = time.perf_counter() - self.started
+        self.write(elapsed)
+        return False
+
+    def write(self, elapsed):
+        """Write the profile files and print the head of the summary"""
+        os.makedirs(self.directory, exist_ok=True)
+        if self.mode == 'cprofile':
+            self.profiler.dump_stats(self.path('pstats'))
+            summary = self.cprofile_summary()
+        else:
+            self.sampler.write_pstats(self.path('pstats'))
+            summary = self.sampler.summary(self.top_n)
+        self.sampler.write_collapsed(self.path('collapsed'))
+        self.paths.extend([self.path('pstats'), self.path('collapsed')])
+
+        header = f"Profile of '{self.name}' ({self.mode}, {elapsed:.2f} s)\n\n"
+        with open(self.path('txt'), 'w', encoding='utf-8') as file:
+            file.write(header + summary)
+        self.paths.append(self.path('txt'))
+
+        print(header.rstrip())
+        print("\n".join(summary.splitlines()[:12]))
+        print(f"Profile saved to {', '.join(repr(path) for path in self.paths)}")
+
+    def cprofile_summary(self):
+        """Top functions by own time and by cumulative time, as printed by pstats"""
+        output = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=output).strip_dirs()
+        for sort_key, title in (('tottime', "Own time"), ('cumulative', "Cumulative time")):
+            output.write(f"{title}:\n")
+            stats.sort_stats(sort_key).print_stats(self.top_n)
+        return output.getvalue()
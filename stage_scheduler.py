@@ -0,0 +1,194 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Stage:
+    """A step of the generation run and the stages it needs to have finished first"""
+
+    def __init__(self, name, function, depends_on=()):
+        """
+        Initialize the Stage.
+
+        Args:
+            name (str): Unique stage name
+            function (callable): Picklable callable taking a dict with the results
+                of the stages in depends_on, keyed by stage name
+            depends_on (tuple): Names of the stages that must finish first
+        """
+        self.name = name
+        self.function = function
+        self.depends_on = tuple(depends_on)
+
+
+class StageScheduler:
+    """
+    Runs a dependency graph of stages, each as soon as all of its parents are done.
+
+    With more than one worker, ready stages run concurrently in a process
+    pool, so the wall time approaches that of the longest dependency chain.
+    With a single worker they run one by one in this process, in
+    declaration order where the graph allows it.
+    """
+
+    def __init__(self, stages, workers=1, initializer=None, initargs=()):
+        """
+        Initialize the StageScheduler.
+
+        Args:
+            stages (list): Stage objects; a stage may be declared before its parents
+            workers (int): Number of processes; 1 runs every stage in this process
+            initializer (callable, optional): Run once in every worker process
+            initargs (tuple): Arguments of the initializer
+        """
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage '{stage.name}'")
+            self.stages[stage.name] = stage
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.order = self.topological_order()
+
+        # Start and end of every finished stage, in seconds since the run started
+        self.timings = {}
+        self.skipped = set()
+        self.wall_time = 0.0
+        self.on_complete = None
+
+    def topological_order(self):
+        """
+        Order the stages so that every stage comes after its parents.
+
+        Returns:
+            list: Stage names
+
+        Raises:
+            ValueError: If a stage depends on an unknown stage or the graph has a cycle
+        """
+        order = []
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Stage dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for parent in self.stages[name].depends_on:
+                if parent not in self.stages:
+                    raise ValueError(f"Stage '{name}' depends on unknown stage '{parent}'")
+                visit(parent, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def inputs(self, name, results):
+        """Results of a stage's parents, keyed by stage name"""
+        return {parent: results[parent] for parent in self.stages[name].depends_on}
+
+    def run(self, completed=None, on_complete=None):
+        """
+        Run every stage.
+
+        Args:
+            completed (dict, optional): Results of stages that are already done
+                and are skipped, keyed by stage name
+            on_complete (callable, optional): Called in this process with the
+                name and result of each stage as soon as it finishes
+
+        Returns:
+            dict: Result of every stage, keyed by stage name
+        """
+        started = time.perf_counter()
+        results = dict(completed or {})
+        self.skipped = set(results)
+        self.timings = {name: (0.0, 0.0) for name in results}
+        self.on_complete = on_complete
+        if self.workers == 1:
+            self._run_serial(started, results)
+        else:
+            self._run_parallel(started, results)
+        self.wall_time = time.perf_counter() - started
+        return results
+
+    def _finish(self, name, result, start, started, results):
+        results[name] = result
+        self.timings[name] = (start, time.perf_counter() - started)
+        if self.on_complete is not None:
+            self.on_complete(name, result)
+
+    def _run_serial(self, started, results):
+        for name in self.order:
+            if name in results:
+                continue
+            start = time.perf_counter() - started
+            result = self.stages[name].function(self.inputs(name, results))
+            self._finish(name, result, start, started, results)
+
+    def _run_parallel(self, started, results):
+        waiting = [name for name in self.order if name not in results]
+        running = {}
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer,
+                                 initargs=self.initargs) as pool:
+            while waiting or running:
+                # Submit every stage whose parents are all done
+                for name in list(waiting):
+                    if all(parent in results for parent in self.stages[name].depends_on):
+                        waiting.remove(name)
+                        future = pool.submit(self.stages[name].function, self.inputs(name, results))
+                        running[future] = (name, time.perf_counter() - started)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, start = running.pop(future)
+                    try:
+                        result = future.result()
+                    except BaseException:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    self._finish(name, result, start, started, results)
+
+    def critical_path(self):
+        """
+        Longest chain of dependent stages of the last run, by stage duration.
+
+        Returns:
+            tuple: (stage names along the chain, total seconds of the chain)
+        """
+        finish = {}
+        previous = {}
+        for name in self.order:
+            start, end = self.timings[name]
+            parents = self.stages[name].depends_on
+            longest = max(parents, key=lambda parent: finish[parent], default=None)
+            previous[name] = longest
+            finish[name] = (end - start) + (finish[longest] if longest else 0.0)
+
+        if not finish:
+            return [], 0.0
+        name = max(finish, key=finish.get)
+        total = finish[name]
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1], total
+
+    def print_report(self):
+        """Print the wall time of every stage and the critical path of the last run"""
+        print("Stage timings:")
+        for name in self.order:
+            start, end = self.timings[name]
+            if name in self.skipped:
+                print(f"  - {name:<15} skipped, unchanged since the last run")
+            else:
+                print(f"  - {name:<15} {end - start:8.2f} s  (from {start:.2f} s to {end:.2f} s)")
+        path, seconds = self.critical_path()
+        print(f"Critical path: {' -> '.join(path)} ({seconds:.2f} s)")
+        print(f"Total wall time: {self.wall_time:.2f} s on {self.workers} worker(s)")
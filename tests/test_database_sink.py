@@ -0,0 +1,106 @@
+import time
+import sqlite3
+import pytest
+from database_sink import ConnectionPool, DatabaseLoader
+
+SCHEMA = """
+CREATE TABLE genres (genre_id INTEGER PRIMARY KEY, name TEXT, description TEXT);
+CREATE TABLE artists (artist_id INTEGER PRIMARY KEY, name TEXT, genre_id INTEGER REFERENCES genres(genre_id));
+"""
+GENRE_COLUMNS = ('genre_id', 'name', 'description')
+ARTIST_COLUMNS = ('artist_id', 'name', 'genre_id')
+
+
+class RecordingCursor(sqlite3.Cursor):
+    """Cursor that records its executemany batches, slowing down parent tables"""
+
+    def executemany(self, statement, rows):
+        table = statement.split()[2]
+        self.connection.calls.append(('executemany', table, len(rows)))
+        if table in self.connection.slow_tables:
+            time.sleep(0.05)
+        return super().executemany(statement, rows)
+
+
+class RecordingConnection(sqlite3.Connection):
+    """Connection that records its commits and how many rows each made visible"""
+
+    def cursor(self, factory=RecordingCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        super().commit()
+        with sqlite3.connect(self.path) as reader:
+            counts = {table: reader.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ('genres', 'artists')}
+        self.calls.append(('commit', counts))
+
+
+def make_loader(tmp_path, calls, slow_tables=(), **options):
+    path = str(tmp_path / 'test.db')
+    with sqlite3.connect(path) as connection:
+        connection.executescript(SCHEMA)
+
+    def connect():
+        connection = sqlite3.connect(path, timeout=30, check_same_thread=False, factory=RecordingConnection)
+        connection.path, connection.calls, connection.slow_tables = path, calls, slow_tables
+        return connection
+
+    pool = ConnectionPool(connect, size=2, init_statements=('PRAGMA foreign_keys=ON',))
+    return DatabaseLoader(pool, paramstyle='qmark', **options), path
+
+def test_rows_are_inserted_in_batches_and_committed_every_commit_rows(tmp_path):
+    calls = []
+    loader, path = make_loader(tmp_path, calls, batch_size=2, commit_rows=5)
+    with loader.open_sink('genres', GENRE_COLUMNS) as sink:
+        sink.write_rows((genre_id, f"Genre {genre_id}", None) for genre_id in range(1, 12))
+    loader.close()
+
+    assert [call[2] for call in calls if call[0] == 'executemany'] == [2, 2, 2, 2, 2, 1]
+    # A commit once 5 or more rows are pending: after the third and the sixth batch
+    assert [call[1]['genres'] for call in calls if call[0] == 'commit'] == [6, 11]
+    assert sink.rows_committed == 11
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM genres").fetchone()[0] == 11
+
+def test_child_rows_wait_for_their_parents_to_commit(tmp_path):
+    calls = []
+    # The parent table loads slowly, so a child batch would get ahead of it without watermarks
+    loader, path = make_loader(tmp_path, calls, slow_tables=('genres',), batch_size=3, commit_rows=1)
+    with loader.open_sink('genres', GENRE_COLUMNS) as genres, \
+            loader.open_sink('artists', ARTIST_COLUMNS) as artists:
+        for entity_id in range(1, 31):
+            genres.write_row((entity_id, f"Genre {entity_id}", None))
+            artists.write_row((entity_id, f"Artist {entity_id}", entity_id))
+    loader.close()
+
+    for call in calls:
+        if call[0] == 'commit':
+            assert call[1]['artists'] <= call[1]['genres']
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM artists").fetchone()[0] == 30
+        assert connection.execute("PRAGMA foreign_key_check").fetchall() == []
+
+def test_loader_errors_are_raised_in_the_generating_thread(tmp_path):
+    calls = []
+    loader, path = make_loader(tmp_path, calls, batch_size=10, commit_rows=10, queue_batches=2)
+    with pytest.raises(sqlite3.IntegrityError):
+        with loader.open_sink('genres', GENRE_COLUMNS) as sink:
+            # Every genre ID is used twice; the generator keeps writing after the loader fails
+            sink.write_rows((genre_id % 50, "Duplicate", None) for genre_id in range(10000))
+    loader.close()
+
+    # The batches committed before the first duplicate stay, the failed transaction is rolled back
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM genres").fetchone()[0] == 50
+
+def test_a_failed_parent_fails_its_children(tmp_path):
+    calls = []
+    loader, _ = make_loader(tmp_path, calls, batch_size=2, commit_rows=1)
+    with pytest.raises((sqlite3.IntegrityError, RuntimeError)):
+        with loader.open_sink('genres', GENRE_COLUMNS) as genres, \
+                loader.open_sink('artists', ARTIST_COLUMNS) as artists:
+            for entity_id in range(1, 21):
+                genres.write_row((1, "Duplicate", None))
+                artists.write_row((entity_id, f"Artist {entity_id}", 1))
+    loader.close()
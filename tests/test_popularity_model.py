@@ -0,0 +1,32 @@
+import numpy
+from popularity_model import PopularityModel
+from unique_identity import FeistelPermutation
+
+def test_invert_many_undoes_permute_many():
+    for size in (1, 3, 1000, 5000):
+        permutation = FeistelPermutation(size, key=5)
+        values = numpy.arange(size, dtype=numpy.uint64)
+        assert numpy.array_equal(permutation.invert_many(permutation.permute_many(values)), values)
+
+def test_ranks_are_a_permutation_of_the_population():
+    model = PopularityModel(key=11, population=2000, skew=1.0)
+    ranks = model.rank(range(1, 2001))
+    assert sorted(ranks.tolist()) == list(range(1, 2001))
+    assert numpy.allclose(model.score(range(1, 2001)), ranks.astype(float) ** -1.0)
+
+def test_draws_follow_the_zipf_distribution():
+    for skew in (0.5, 1.0, 2.0):
+        model = PopularityModel(key=3, population=50, skew=skew)
+        indices = model.draw_indices(numpy.random.default_rng(0), (100000,))
+        frequencies = numpy.bincount(model.rank(indices + 1), minlength=51)[1:] / len(indices)
+        expected = numpy.arange(1, 51) ** -skew
+        assert numpy.abs(frequencies - expected / expected.sum()).max() < 0.01
+
+def test_sample_returns_distinct_ids_per_row():
+    model = PopularityModel(key=3, population=100, skew=1.2)
+    counts, ids = model.sample(numpy.random.default_rng(1), numpy.array([0, 5, 40, 100]))
+    starts = numpy.concatenate(([0], numpy.cumsum(counts)))
+    for start, stop in zip(starts[:-1], starts[1:]):
+        row = ids[start:stop]
+        assert len(set(row.tolist())) == len(row)
+        assert row.min(initial=1) >= 1 and row.max(initial=100) <= 100
@@ -0,0 +1,11 @@
+import numpy
+from payment_generator import PaymentDataGenerator
+from token_factory import TokenFactory, UNIQUE_HEX_DIGITS
+
+def test_unique_hex_stays_unique_across_streams():
+    key = PaymentDataGenerator.TRANSACTION_ID_KEY
+    base = TokenFactory(numpy.random.default_rng(1), key=key).unique_hex(range(1, 20001), 24)
+    delta = TokenFactory(numpy.random.default_rng(2), key=key).unique_hex(range(20001, 40001), 24)
+    prefixes = {token[:UNIQUE_HEX_DIGITS] for token in base + delta}
+    assert len(prefixes) == 40000
+    assert all(len(token) == 24 for token in base + delta)
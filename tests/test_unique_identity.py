@@ -0,0 +1,41 @@
+import re
+import datetime
+from generator_context import GeneratorContext
+from user_generator import UserGenerator
+from unique_identity import FeistelPermutation, UniqueIdentity, CODE_ALPHABET, CODE_WIDTH
+
+EMAIL_CODE = re.compile(r"'[^']*_([0-9a-z]{6})', '[^'@]*\.([0-9a-z]{6})@")
+
+def generate_codes(tmp_path, seed, num_users, first_user_id):
+    """Codes of the usernames and emails of a UserGenerator run"""
+    context = GeneratorContext(seed=seed, today=datetime.date(2025, 3, 22))
+    output_file = str(tmp_path / f"users_{seed}_{first_user_id}.txt")
+    UserGenerator(num_users=num_users, output_file=output_file, context=context,
+                  first_user_id=first_user_id).run()
+    with open(output_file, encoding='utf-8') as file:
+        matches = EMAIL_CODE.findall(file.read())
+    assert len(matches) == num_users
+    for username_code, email_code in matches:
+        assert username_code == email_code
+    return [username_code for username_code, _ in matches]
+
+def test_feistel_permutation_is_a_bijection():
+    for size in (1, 2, 7, 1000, 4097):
+        permutation = FeistelPermutation(size, key=99)
+        assert sorted(permutation[value] for value in range(size)) == list(range(size))
+        assert permutation.permute_many(list(range(size))).tolist() == [permutation[value] for value in range(size)]
+
+def test_codes_are_distinct_over_an_id_range():
+    identity = UniqueIdentity()
+    codes = [identity.code(entity_id) for entity_id in range(1, 100001)]
+    assert len(set(codes)) == len(codes)
+    assert all(len(code) == CODE_WIDTH and set(code) <= set(CODE_ALPHABET) for code in codes)
+
+def test_codes_stay_disjoint_across_a_delta_with_another_seed(tmp_path):
+    base = generate_codes(tmp_path, seed=1, num_users=300, first_user_id=1)
+    delta = generate_codes(tmp_path, seed=2, num_users=300, first_user_id=301)
+    assert len(set(base)) == 300
+    assert len(set(delta)) == 300
+    assert not set(base) & set(delta)
+    # Codes depend on the ID only, never on the seed
+    assert generate_codes(tmp_path, seed=3, num_users=300, first_user_id=1) == base
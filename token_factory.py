@@ -0,0 +1,123 @@
+import numpy
+from unique_identity import FeistelPermutation
+
+# Random bytes drawn whenever a pool runs dry
+DEFAULT_BLOCK_BYTES = 64 * 1024
+
+# Leading hex digits of a unique token that encode its permuted ID; 40 bits
+# cover more than a trillion IDs
+UNIQUE_HEX_DIGITS = 10
+
+
+class _CharacterPool:
+    """Characters drawn in large blocks and handed out as slices"""
+
+    def __init__(self, draw):
+        # draw() returns the next block of characters as a str
+        self.draw = draw
+        self.characters = ''
+        self.position = 0
+
+    def take(self, length):
+        end = self.position + length
+        if end > len(self.characters):
+            self.characters = self.characters[self.position:] + self.draw()
+            while len(self.characters) < length:
+                self.characters += self.draw()
+            self.position, end = 0, length
+        text = self.characters[self.position:end]
+        self.position = end
+        return text
+
+
+class TokenFactory:
+    """
+    Random hex tokens and digit strings cut from large pre-drawn blocks.
+
+    Generating tokens row by row, with uuid4 or random.choices, pays for a
+    call, an entropy read or a small string per row. The factory draws
+    block_bytes random bytes at a time from a seeded NumPy stream, encodes
+    them to text in one call, and hands out slices, so the tokens are
+    reproducible under the seed.
+
+    Tokens that must be unique, such as orders.transaction_id, start with
+    their ID put through a keyed FeistelPermutation: two IDs never share
+    those digits, and the random digits after them only add variety. Only
+    factories with the same key agree, so callers pass a fixed key, not one
+    derived from the seed, to keep tokens unique across runs.
+    """
+
+    def __init__(self, numbers, key=None, block_bytes=DEFAULT_BLOCK_BYTES):
+        """
+        Initialize the TokenFactory.
+
+        Args:
+            numbers (numpy.random.Generator): Stream the tokens are drawn from
+            key (int, optional): Seed of the permutation behind unique_hex
+            block_bytes (int): Random bytes drawn at a time
+        """
+        self.numbers = numbers
+        self.block_bytes = block_bytes
+        self.permutation = None
+        if key is not None:
+            self.permutation = FeistelPermutation(1 << (4 * UNIQUE_HEX_DIGITS), key)
+        self._hex = _CharacterPool(lambda: self.numbers.bytes(self.block_bytes).hex())
+        self._digits = _CharacterPool(self._draw_digits)
+
+    def _draw_digits(self):
+        digits = self.numbers.integers(0, 10, size=self.block_bytes, dtype=numpy.uint8)
+        return (digits + ord('0')).tobytes().decode('ascii')
+
+    def hex(self, length):
+        """
+        Random hex token.
+
+        Args:
+            length (int): Number of hex digits
+
+        Returns:
+            str: The token
+        """
+        return self._hex.take(length)
+
+    def digits(self, length):
+        """
+        Random string of decimal digits, e.g. the last four digits of a card.
+
+        Args:
+            length (int): Number of digits
+
+        Returns:
+            str: The digits
+        """
+        return self._digits.take(length)
+
+    def unique_hex(self, entity_ids, length):
+        """
+        Hex tokens unique to their IDs, for a whole batch at once.
+
+        Args:
+            entity_ids (sequence): IDs, from 1 up to 16 ** UNIQUE_HEX_DIGITS
+            length (int): Number of hex digits; even and at least UNIQUE_HEX_DIGITS
+
+        Returns:
+            list: One token per ID
+
+        Raises:
+            ValueError: If the factory has no key or length is not usable
+        """
+        if self.permutation is None:
+            raise ValueError("Unique tokens need a TokenFactory created with a key")
+        if length < UNIQUE_HEX_DIGITS or length % 2:
+            raise ValueError(f"Unique tokens need an even length of at least {UNIQUE_HEX_DIGITS}, got {length}")
+
+        codes = self.permutation.permute_many(numpy.asarray(entity_ids, dtype=numpy.uint64) - 1)
+        count = len(codes)
+        # Big-endian bytes of the codes, then random bytes, hex-encoded together
+        code_bytes = UNIQUE_HEX_DIGITS // 2
+        code_columns = codes.astype('>u8').view(numpy.uint8).reshape(count, 8)[:, 8 - code_bytes:]
+        random_bytes = length // 2 - code_bytes
+        random_columns = numpy.frombuffer(self.numbers.bytes(count * random_bytes),
+                                          dtype=numpy.uint8).reshape(count, random_bytes)
+        text = numpy.hstack((code_columns, random_columns)).tobytes().hex()
+        return [text[start:start + length] for start in range(0, count * length, length)]
@@ -0,0 +1,206 @@
+import string
+import numpy
+
+# Characters of identity codes, and their fixed width: 36 ** 6 codes cover
+# more than two billion IDs
+CODE_ALPHABET = string.digits + string.ascii_lowercase
+CODE_WIDTH = 6
+
+# Feistel rounds; four make every output bit depend on every input bit
+FEISTEL_ROUNDS = 4
+
+# Key of the permutation behind identity codes. It is fixed instead of being
+# derived from the run's seed: a run appending to a dataset made with another
+# seed, or to a dump without a run manifest, must still hand out codes that
+# differ from every existing user's.
+IDENTITY_KEY = 0x1D3A7F5C2B9E4D61
+
+
+class FeistelPermutation:
+    """
+    Keyed bijection of the integers 0 to size - 1.
+
+    A balanced Feistel network scrambles the smallest even number of bits
+    covering size, and cycle walking re-applies it to any result of size or
+    more until it falls back inside the range. Every value has exactly one
+    image, computed in O(1) from the value and the key alone, so no set of
+    values handed out so far is needed and any process can compute any
+    value's image.
+    """
+
+    def __init__(self, size, key, rounds=FEISTEL_ROUNDS):
+        """
+        Initialize the FeistelPermutation.
+
+        Args:
+            size (int): Number of values permuted
+            key (int): Seed of the round keys
+
+        Raises:
+            ValueError: If size is not positive
+        """
+        if size < 1:
+            raise ValueError(f"A permutation needs at least one value, got {size}")
+        self.size = size
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+        # One 32-bit key per round, sliced from the mixed seed
+        self.round_keys = []
+        state = key & 0xFFFFFFFFFFFFFFFF
+        for _ in range(rounds):
+            state = _mix64(state + 0x9E3779B97F4A7C15)
+            self.round_keys.append(state & 0xFFFFFFFF)
+
+    def __len__(self):
+        return self.size
+
+    def _encrypt(self, value):
+        half_bits, half_mask = self.half_bits, self.half_mask
+        left, right = value >> half_bits, value & half_mask
+        for round_key in self.round_keys:
+            # Round function: the 'lowbias32' integer hash of right and the round key
+            mixed = right ^ round_key
+            mixed ^= mixed >> 16
+            mixed = (mixed * 0x7FEB352D) & 0xFFFFFFFF
+            mixed ^= mixed >> 15
+            mixed = (mixed * 0x846CA68B) & 0xFFFFFFFF
+            left, right = right, left ^ ((mixed ^ (mixed >> 16)) & half_mask)
+        return (left << half_bits) | right
+
+    def __getitem__(self, value):
+        """
+        Image of a value.
+
+        Raises:
+            IndexError: If value is outside 0 to size - 1
+        """
+        if not 0 <= value < self.size:
+            raise IndexError(f"{value} is outside the permutation of {self.size} values")
+        value = self._encrypt(value)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def _round_many(self, right, round_key):
+        # The round function of _encrypt; the products fit in 64 bits
+        low32 = numpy.uint64(0xFFFFFFFF)
+        mixed = right ^ numpy.uint64(round_key)
+        mixed ^= mixed >> numpy.uint64(16)
+        mixed = (mixed * numpy.uint64(0x7FEB352D)) & low32
+        mixed ^= mixed >> numpy.uint64(15)
+        mixed = (mixed * numpy.uint64(0x846CA68B)) & low32
+        return (mixed ^ (mixed >> numpy.uint64(16))) & numpy.uint64(self.half_mask)
+
+    def _encrypt_many(self, values):
+        half_bits = numpy.uint64(self.half_bits)
+        left, right = values >> half_bits, values & numpy.uint64(self.half_mask)
+        for round_key in self.round_keys:
+            left, right = right, left ^ self._round_many(right, round_key)
+        return (left << half_bits) | right
+
+    def _decrypt_many(self, values):
+        half_bits = numpy.uint64(self.half_bits)
+        left, right = values >> half_bits, values & numpy.uint64(self.half_mask)
+        for round_key in reversed(self.round_keys):
+            left, right = right ^ self._round_many(left, round_key), left
+        return (left << half_bits) | right
+
+    def _walk_many(self, values, step):
+        values = numpy.asarray(values, dtype=numpy.uint64)
+        if len(values) and int(values.max()) >= self.size:
+            raise IndexError(f"{int(values.max())} is outside the permutation of {self.size} values")
+        values = step(values)
+        outside = numpy.flatnonzero(values >= self.size)
+        while len(outside):
+            values[outside] = step(values[outside])
+            outside = outside[values[outside] >= self.size]
+        return values
+
+    def permute_many(self, values):
+        """
+        Images of a whole array of values at once.
+
+        Args:
+            values (numpy.ndarray): Values from 0 to size - 1
+
+        Returns:
+            numpy.ndarray: Their images, as uint64
+
+        Raises:
+            IndexError: If a value is outside 0 to size - 1
+        """
+        return self._walk_many(values, self._encrypt_many)
+
+    def invert_many(self, images):
+        """
+        Values of a whole array of images at once, undoing permute_many.
+
+        Args:
+            images (numpy.ndarray): Images from 0 to size - 1
+
+        Returns:
+            numpy.ndarray: The values they are the images of, as uint64
+
+        Raises:
+            IndexError: If an image is outside 0 to size - 1
+        """
+        return self._walk_many(images, self._decrypt_many)
+
+
+class UniqueIdentity:
+    """
+    Unique usernames and emails derived from user IDs.
+
+    Each user ID is mapped through a keyed FeistelPermutation to a
+    fixed-width base-36 code, which is appended to a generated name. Two
+    users can share a name but never a code, so the results are unique
+    across blocks, shards and processes, without the ever-growing history
+    and retries of Faker's unique proxy. The key does not depend on the
+    run's seed, so runs appending to a dataset keep them unique too,
+    whatever seed either run used.
+    """
+
+    def __init__(self, key=IDENTITY_KEY, width=CODE_WIDTH):
+        """
+        Initialize the UniqueIdentity.
+
+        Args:
+            key (int): Seed of the permutation; codes from different keys may collide
+            width (int): Characters per code; IDs up to 36 ** width are supported
+        """
+        self.width = width
+        self.permutation = FeistelPermutation(len(CODE_ALPHABET) ** width, key)
+
+    def code(self, entity_id):
+        """
+        Code of an ID, e.g. '4k0x9q'.
+
+        Args:
+            entity_id (int): ID, from 1
+
+        Returns:
+            str: width characters from CODE_ALPHABET
+        """
+        value = self.permutation[entity_id - 1]
+        characters = []
+        for _ in range(self.width):
+            value, digit = divmod(value, len(CODE_ALPHABET))
+            characters.append(CODE_ALPHABET[digit])
+        return ''.join(reversed(characters))
+
+    def username(self, name, code):
+        """Unique username: the name, an underscore and an ID's code"""
+        return f"{name}_{code}"
+
+    def email(self, address, code):
+        """Unique email: the address with an ID's code appended to its local part"""
+        local, _, domain = address.partition('@')
+        return f"{local}.{code}@{domain}"
+
+
+def _mix64(value):
+    # Avalanche of a 64-bit integer (SplitMix64's finaliser)
+    value &= 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return value ^ (value >> 31)
@@ -1,22 +1,33 @@
-from faker import Faker
+from generator_context import get_context
+from sql_writer import format_insert_statement
+from weighted_sampler import AliasSampler
+from unique_identity import UniqueIdentity
 import random
 
 class UserGenerator:
     """Class that generates fake user data and creates SQL INSERT statements."""
     
-    def __init__(self, num_users=100, output_file='insert_users.txt'):
+    COLUMNS = ('username', 'email', 'phone', 'password', 'date_of_birth',
+               'country', 'subscription_type', 'profile_image')
+    
+    def __init__(self, num_users=100, output_file='insert_users.txt', context=None, first_user_id=1):
         """
         Initialize the UserGenerator with configuration parameters.
         
         Args:
             num_users (int): Number of users to generate
             output_file (str): File path to save the SQL insert statements
+            context (GeneratorContext, optional): Shared generator context
+            first_user_id (int): ID the database will give the first user (AUTO_INCREMENT)
         """
-        # Initialize the fake data generator
-        self.fake = Faker()
+        self.context = context or get_context()
+        self.fake = self.context.faker
+        # Random stream of the current block of users
+        self.rng = random
         
         # Configuration
         self.num_users = num_users
+        self.first_user_id = first_user_id
         self.output_file = output_file
         self.country_list = ['BR', 'US', 'FR', 'DE', 'IT', 'AF', 'CA', 'GB', 'ES', 'JP', 'CN', 'IN', 'AU', 'RU', 'MX', 
                             'AR', 'ZA', 'PT', 'NL', 'SE', 'CH', 'KR', 'TR', 'NZ', 'AE', 'SA', 'EG', 'TH', 'SG', 'MY', 
@@ -28,6 +39,10 @@ class UserGenerator:
                             'ER', 'GM', 'LR', 'TG', 'BJ', 'MW', 'MZ', 'BW', 'NA', 'SZ', 'LS', 'ZW', 'ZM', 'AO', 'MZ', 
                             'BW', 'NA', 'SZ', 'LS', 'ZW', 'ZM']
         self.subscription_types = ['Free', 'Premium', 'Premium Family', 'Premium Student']
+        self.country_sampler = AliasSampler(self.country_list)
+        self.subscription_type_sampler = AliasSampler(self.subscription_types)
+        # Usernames and emails end in a code unique to the user ID, whatever the seed
+        self.identity = UniqueIdentity()
     
     def generate_spotify_image_url(self, value=""):
         """
@@ -41,22 +56,27 @@ class UserGenerator:
         """
         return f"https://source.unsplash.com/featured/?spotify_{value}.jpeg"
     
-    def generate_user(self):
+    def generate_user(self, user_id):
         """
         Generate a single user's data.
         
+        Args:
+            user_id (int): ID the database will give the user, which makes its
+                username and email unique
+            
         Returns:
             dict: Dictionary containing user data
         """
-        username = self.fake.user_name()
+        code = self.identity.code(user_id)
+        username = self.identity.username(self.fake.user_name(), code)
         return {
             'username': username,
-            'email': self.fake.unique.email(),
+            'email': self.identity.email(self.fake.email(), code),
             'phone': self.fake.phone_number(),
             'password': self.fake.password(),
-            'date_of_birth': self.fake.date_of_birth(minimum_age=18, maximum_age=99),
-            'country': random.choice(self.country_list),
-            'subscription_type': random.choice(self.subscription_types),
+            'date_of_birth': self.context.date_of_birth(self.rng, minimum_age=18, maximum_age=99),
+            'country': self.country_sampler.draw(self.rng),
+            'subscription_type': self.subscription_type_sampler.draw(self.rng),
             'profile_image': self.generate_spotify_image_url(username)
         }
     
@@ -70,27 +90,40 @@ class UserGenerator:
         Returns:
             str: SQL INSERT statement
         """
-        return (
-            f"INSERT INTO users (username, email, phone, password, date_of_birth, "
-            f"country, subscription_type, profile_image) VALUES ("
-            f"'{user_data['username']}', '{user_data['email']}', '{user_data['phone']}', "
-            f"'{user_data['password']}', '{user_data['date_of_birth']}', "
-            f"'{user_data['country']}', '{user_data['subscription_type']}', '{user_data['profile_image']}');\n"
-        )
+        return format_insert_statement('users', self.COLUMNS, self.to_row(user_data))
+    
+    def to_row(self, user_data):
+        """
+        Convert a user's data into a row for the users table.
+        
+        Args:
+            user_data (dict): Dictionary containing user data
+            
+        Returns:
+            tuple: Values in COLUMNS order
+        """
+        return tuple(user_data[column] for column in self.COLUMNS)
     
     def generate_all_users(self):
         """Generate all users and write INSERT statements to a file."""
-        with open(self.output_file, 'w') as file:
-            for _ in range(self.num_users):
-                user_data = self.generate_user()
-                insert_statement = self.create_insert_statement(user_data)
-                file.write(insert_statement)
+        progress = self.context.progress("Users", self.num_users, unit='users')
+        
+        with self.context.open_sink(self.output_file, 'users', self.COLUMNS) as writer:
+            last_user_id = self.first_user_id + self.num_users - 1
+            for user_ids, rng in self.context.iter_blocks('users', self.first_user_id, last_user_id):
+                # generate_user draws from the block's own stream
+                self.rng = rng
+                for user_id in user_ids:
+                    user_data = self.generate_user(user_id)
+                    writer.write_row(self.to_row(user_data))
+                progress.update(user_ids.stop - self.first_user_id)
         
         print(f"{self.num_users} usuários foram gerados e salvos em '{self.output_file}'.")
     
     def run(self):
         """Execute the user generation process."""
-        self.generate_all_users()
+        with self.context.profile('users'):
+            self.generate_all_users()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+import numpy
+
+
+class AliasSampler:
+    """
+    Weighted categorical distribution with O(1) draws (Walker's alias method).
+
+    The alias table is built once, in O(n) with Vose's method: every one of
+    the n columns holds the probability of keeping its own value and the
+    value it otherwise hands over to. A draw picks a column uniformly and
+    flips one biased coin, so its cost does not depend on n, unlike
+    random.choices, which rebuilds the cumulative weights on every call and
+    then bisects them.
+
+    Draws come either one at a time from a random.Random or as whole NumPy
+    batches from a numpy.random.Generator.
+    """
+
+    def __init__(self, values, weights=None):
+        """
+        Initialize the AliasSampler, building its alias table.
+
+        Args:
+            values (sequence): Values to draw
+            weights (sequence, optional): Relative weight of each value; uniform if omitted
+
+        Raises:
+            ValueError: If there are no values, the weights do not match them,
+                or the weights are negative or all zero
+        """
+        # A range stands for itself, so an ID population needs no tuple of its own
+        self.values = values if isinstance(values, range) else tuple(values)
+        size = len(self.values)
+        if size == 0:
+            raise ValueError("AliasSampler needs at least one value")
+        if weights is None:
+            weights = numpy.ones(size)
+        weights = numpy.asarray(weights, dtype=numpy.float64)
+        if weights.shape != (size,):
+            raise ValueError(f"Expected {size} weights, got {weights.shape[0] if weights.ndim else 0}")
+        if (weights < 0).any() or not weights.sum() > 0:
+            raise ValueError("Weights must be non-negative and not all zero")
+
+        # Scale so that the average column holds exactly 1. The loop works on
+        # plain lists: indexing them is several times faster than indexing
+        # arrays, which matters for tables over whole ID populations.
+        scaled = (weights * (size / weights.sum())).tolist()
+        keep = [1.0] * size
+        alias = list(range(size))
+        small = [index for index, weight in enumerate(scaled) if weight < 1.0]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1.0]
+
+        # Fill every short column with the excess of a tall one
+        while small and large:
+            short, tall = small.pop(), large.pop()
+            keep[short] = scaled[short]
+            alias[short] = tall
+            scaled[tall] -= 1.0 - scaled[short]
+            (small if scaled[tall] < 1.0 else large).append(tall)
+        # Whatever is left keeps 1, up to rounding errors
+
+        self.keep = numpy.asarray(keep)
+        self.alias = numpy.asarray(alias)
+        # Every column keeps its own value, so a draw needs no coin
+        self.uniform = bool((self.keep == 1.0).all())
+        # Plain lists are faster than arrays for one draw at a time, but are
+        # only made on the first single draw: batch-only tables over large
+        # populations would hold every column twice
+        self._keep = None
+        self._alias = None
+        self._values = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def draw_index(self, rng):
+        """
+        Draw the index of one value.
+
+        A single uniform number picks the column (its integer part) and
+        flips the column's coin (its fractional part).
+
+        Args:
+            rng (random.Random): Stream to draw from
+
+        Returns:
+            int: Index into values
+        """
+        if self._keep is None:
+            self._keep, self._alias = self.keep.tolist(), self.alias.tolist()
+        size = len(self._keep)
+        position = rng.random() * size
+        column = int(position)
+        if column == size:  # rng.random() * size can round up to size
+            column -= 1
+        if self.uniform or position - column < self._keep[column]:
+            return column
+        return self._alias[column]
+
+    def draw(self, rng):
+        """
+        Draw one value.
+
+        Args:
+            rng (random.Random): Stream to draw from
+
+        Returns:
+            The value
+        """
+        return self.values[self.draw_index(rng)]
+
+    def draw_indices(self, numbers, size):
+        """
+        Draw the indices of many values at once.
+
+        Args:
+            numbers (numpy.random.Generator): Stream to draw from
+            size (int or tuple): Number of draws, or shape of the array of draws
+
+        Returns:
+            numpy.ndarray: Indices into values
+        """
+        columns = numbers.integers(0, len(self.values), size=size)
+        if self.uniform:
+            return columns
+        coins = numbers.random(size)
+        return numpy.where(coins < self.keep[columns], columns, self.alias[columns])
+
+    def draw_many(self, numbers, size):
+        """
+        Draw many values at once.
+
+        Args:
+            numbers (numpy.random.Generator): Stream to draw from
+            size (int): Number of draws
+
+        Returns:
+            numpy.ndarray: The values
+        """
+        if self._values is None:
+            self._values = numpy.asarray(self.values)
+        return self._values[self.draw_indices(numbers, size)]
+
+    def probabilities(self):
+        """Probability of every value, as encoded by the alias table"""
+        size = len(self.values)
+        probabilities = self.keep / size
+        numpy.add.at(probabilities, self.alias, (1.0 - self.keep) / size)
+        return probabilities